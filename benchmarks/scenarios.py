@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+Standard scenarios for the benchmark suite.
+
+Each scenario is a function returning a freshly populated Island, so a
+benchmark can rebuild the state before every round with
+``benchmark.pedantic(..., setup=...)``. Phases mutate the island (breeding
+grows the population, death shrinks it), which means one island must never
+be reused between rounds.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import random
+import textwrap
+
+from biosim.animals import Animals
+from biosim.island import Island
+
+CHECK_SIM_MAP = textwrap.dedent("""\
+    OOOOOOOOOOOOOOOOOOOOO
+    OOOOOOOOSMMMMJJJJJJJO
+    OSSSSSJJJJMMJJJJJJJOO
+    OSSSSSSSSSMMJJJJJJOOO
+    OSSSSSJJJJJJJJJJJJOOO
+    OSSSSSJJJDDJJJSJJJOOO
+    OSSJJJJJDDDJJJSSSSOOO
+    OOSSSSJJJDDJJJSOOOOOO
+    OSSSJJJJJDDJJJJJJJOOO
+    OSSSSJJJJDDJJJJOOOOOO
+    OOSSSSJJJJJJJJOOOOOOO
+    OOOSSSSJJJJJJJOOOOOOO
+    OOOOOOOOOOOOOOOOOOOOO""")
+
+SINGLE_JUNGLE_MAP = "OOO\nOJO\nOOO"
+
+
+def synthetic_map(size=200, seed=200):
+    """
+    :param size: int, number of rows and columns of the map
+    :param seed: int, seed for the landscape draw
+    :return: multi-line string map
+
+    Creates a square map with an ocean border and an interior drawn from
+    the accessible landscapes, with some mountains sprinkled in.
+    """
+    rng = random.Random(seed)
+    interior = "JJJSSSDM"
+    rows = ["O" * size]
+    for _ in range(size - 2):
+        rows.append(
+            "O" + "".join(rng.choice(interior)
+                          for _ in range(size - 2)) + "O")
+    rows.append("O" * size)
+    return "\n".join(rows)
+
+
+def _spread_population(island, num_animals, seed):
+    """
+    :param island: instance of Island
+    :param num_animals: int, total number of herbivores to place
+    :param seed: int, seed for ages and weights
+
+    Spreads num_animals herbivores and a tenth as many carnivores evenly
+    over all accessible cells of the island.
+    """
+    rng = random.Random(seed)
+    cells = [loc for loc, cell in island.raster_model.items()
+             if cell.is_accessible]
+    population = [{"loc": loc, "pop": []} for loc in cells]
+    for n in range(num_animals):
+        population[n % len(cells)]["pop"].append(
+            {"species": "Herbivore", "age": rng.randint(0, 20),
+             "weight": rng.uniform(5, 40)})
+    for n in range(num_animals // 10):
+        population[n % len(cells)]["pop"].append(
+            {"species": "Carnivore", "age": rng.randint(0, 10),
+             "weight": rng.uniform(5, 40)})
+    island.populate_island(population)
+
+
+def build_scenario(island_map, num_animals, seed=1, island_class=Island):
+    """
+    :param island_map: multi-line string map
+    :param num_animals: int, number of herbivores to place on the island
+    :param seed: int, seed for the population and the simulation
+    :param island_class: the island class of the engine to build
+    :return: a populated island instance
+
+    Builds a populated island from scratch. The global animal registry is
+    emptied first so earlier rounds do not leak into the timings.
+    """
+    Animals.instances.clear()
+    random.seed(seed)
+    island = island_class(island_map)
+    _spread_population(island, num_animals, seed)
+    return island
+
+
+SCENARIOS = {
+    "check_sim": CHECK_SIM_MAP,
+    "synthetic_200": synthetic_map(),
+    "single_jungle": SINGLE_JUNGLE_MAP,
+}
+
+POPULATION_SIZES = {
+    "check_sim": (100, 1000, 10000),
+    "synthetic_200": (1000, 10000, 50000),
+    "single_jungle": (100, 1000, 3000),
+}
+
+SCENARIO_CASES = [(name, size) for name in SCENARIOS
+                  for size in POPULATION_SIZES[name]]
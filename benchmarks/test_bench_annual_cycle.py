@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for the annual cycle and each of its phases.
+
+Run with::
+
+    pytest benchmarks --benchmark-autosave
+
+Results are stored under ``.benchmarks/`` keyed by commit, and two runs can
+be compared with ``pytest-benchmark compare``. Every round rebuilds its
+scenario in the (untimed) setup step, since the phases mutate the island.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import pytest
+
+from scenarios import SCENARIOS, SCENARIO_CASES, build_scenario
+
+PHASES = ["annual_cycle",
+          "_feed_all_animals",
+          "_breed_in_all_cells",
+          "_migrate_all_cells",
+          "_annual_death_all_cells"]
+
+
+@pytest.mark.parametrize("phase", PHASES)
+@pytest.mark.parametrize("scenario, num_animals", SCENARIO_CASES)
+def test_phase(benchmark, scenario, num_animals, phase):
+    """Times one phase of the annual cycle on a freshly built scenario"""
+    benchmark.group = f"{scenario}-{num_animals}"
+    island_map = SCENARIOS[scenario]
+
+    def setup():
+        island = build_scenario(island_map, num_animals)
+        return (getattr(island, phase),), {}
+
+    benchmark.pedantic(lambda method: method(), setup=setup, rounds=3,
+                       iterations=1)
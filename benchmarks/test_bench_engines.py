@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks comparing the annual cycle of the simulation engines.
+
+The array engine is compiled with numba when it is installed; the first
+round includes the compilation unless the numba cache is already filled.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import pytest
+
+from biosim.array_engine import ArrayIsland, CompactArrayIsland
+from biosim.cohort_engine import CohortIsland
+from biosim.island import Island
+from scenarios import SCENARIOS, SCENARIO_CASES, build_scenario
+
+ENGINES = {"object": Island, "array": ArrayIsland,
+           "compact": CompactArrayIsland, "cohort": CohortIsland}
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("scenario, num_animals", SCENARIO_CASES)
+def test_engine_annual_cycle(benchmark, scenario, num_animals, engine):
+    """Times one annual cycle of an engine on a freshly built scenario"""
+    benchmark.group = f"engines-{scenario}-{num_animals}"
+    island_map = SCENARIOS[scenario]
+
+    def setup():
+        island = build_scenario(island_map, num_animals,
+                                island_class=ENGINES[engine])
+        return (island,), {}
+
+    benchmark.pedantic(lambda island: island.annual_cycle(), setup=setup,
+                       rounds=3, iterations=1)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks of the table driven fitness against the exact formula, for
+single animals and for whole arrays of animals.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import numpy as np
+import pytest
+
+from biosim.animals import Herbivores
+from biosim.fitness_table import FitnessTable
+
+NUM_ANIMALS = 100000
+
+
+@pytest.fixture
+def population():
+    """Ages and weights of a herbivore population"""
+    rng = np.random.default_rng(1)
+    return rng.integers(0, 40, NUM_ANIMALS), rng.gamma(4, 8, NUM_ANIMALS)
+
+
+@pytest.mark.parametrize("evaluator", ["exact", "table"])
+def test_fitness_property(benchmark, population, evaluator):
+    """Times Animals.fitness for a thousand herbivores"""
+    benchmark.group = "fitness-scalar"
+    ages, weights = population
+    herbivores = [Herbivores(int(age), float(weight), potential_newborn=True)
+                  for age, weight in zip(ages[:1000], weights[:1000])]
+    Herbivores.use_fitness_table(1e-6 if evaluator == "table" else None)
+    try:
+        benchmark(lambda: [herbivore.fitness for herbivore in herbivores])
+    finally:
+        Herbivores.use_fitness_table(None)
+
+
+@pytest.mark.parametrize("evaluator", ["exact", "table"])
+def test_fitness_arrays(benchmark, population, evaluator):
+    """Times the fitness of a whole population of herbivores"""
+    benchmark.group = "fitness-vectorized"
+    ages, weights = population
+    parameters = Herbivores.parameters
+
+    def exact():
+        return 1 / (1 + np.exp(parameters["phi_age"] *
+                               (ages - parameters["a_half"]))) / \
+            (1 + np.exp(-parameters["phi_weight"] *
+                        (weights - parameters["w_half"])))
+
+    table = FitnessTable(Herbivores, 1e-6)
+    benchmark(exact if evaluator == "exact"
+              else lambda: table.evaluate(ages, weights))
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+"""
+Import-time benchmark.
+
+Every round imports the module in a fresh interpreter, so the timing covers
+the whole import chain. Compare with the 'python -c pass' baseline to see
+what the package itself costs.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize("statement", ["pass",
+                                       "import biosim.island",
+                                       "import biosim.simulation"])
+def test_import_time(benchmark, statement):
+    """Times starting an interpreter and running one import statement"""
+    benchmark.group = "import"
+    benchmark.pedantic(subprocess.run, args=([sys.executable, "-c",
+                                              statement],),
+                       kwargs={"check": True}, rounds=5, iterations=1)
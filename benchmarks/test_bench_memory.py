@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Memory benchmark for the animal representation.
+
+The number of bytes allocated per animal is measured with tracemalloc and
+stored in the benchmark's extra_info, so it is saved and compared alongside
+the timings by ``pytest benchmarks --benchmark-autosave``.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import tracemalloc
+
+import pytest
+
+from biosim.animals import Animals, Herbivores, Carnivores
+
+NUM_ANIMALS = 100000
+
+
+def bytes_per_animal(species, num_animals=NUM_ANIMALS):
+    """
+    :param species: animal class to instantiate
+    :param num_animals: int, number of animals to create
+    :return: float, the number of bytes allocated per animal
+
+    Measures the memory allocated by creating num_animals animals of a
+    species, including their entry in the animal registry.
+    """
+    Animals.instances.clear()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    population = [species(age=5, weight=20.5) for _ in range(num_animals)]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del population
+    Animals.instances.clear()
+    return (end - start) / num_animals
+
+
+@pytest.mark.parametrize("species", [Herbivores, Carnivores])
+def test_bytes_per_animal(benchmark, species):
+    """Records bytes per animal and times creating a population"""
+    benchmark.group = "animal-memory"
+    benchmark.extra_info["bytes_per_animal"] = bytes_per_animal(species)
+
+    def create_population():
+        Animals.instances.clear()
+        return [species(age=5, weight=20.5) for _ in range(NUM_ANIMALS)]
+
+    benchmark.pedantic(create_population, rounds=3, iterations=1)
+    Animals.instances.clear()
@@ -4,16 +4,109 @@ __author__ = "Kåre Johnsen & Anders Karlsen"
 __email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
 
 from math import exp
+from biosim import event_log
+from biosim.lineage import Lineage
+from biosim.parameters import Parameters, constants_record
+from biosim.fitness_table import FitnessTable
 import numpy as np
 import random
 import copy
-import functools
+import math
+
+SPECIES = {}
+SPECIES_BY_CODE = []
+_parameter_arrays = {}
+
+
+def register_species(species_class):
+    """
+    :param species_class: subclass of Animals to register
+    :return: the registered class
+
+    Class decorator which gives a species the next integer species code and
+    makes it available by name in SPECIES, so the island can create and
+    store it without knowing the class.
+    """
+    species_class.species_code = len(SPECIES_BY_CODE)
+    SPECIES_BY_CODE.append(species_class)
+    SPECIES[species_class.species_name] = species_class
+    return species_class
+
+
+def species_of(species):
+    """
+    :param species: a registered species class, its species name or its
+        class name
+    :return: the registered species class
+
+    Lets the cells accept the species names used in the parameters as
+    well as the class names used by the original interface.
+    """
+    if isinstance(species, type):
+        return species
+    if species in SPECIES:
+        return SPECIES[species]
+    for species_class in SPECIES_BY_CODE:
+        if species_class.__name__ == species:
+            return species_class
+    raise ValueError(f"{species} is not a species in this simulation")
+
+
+def animal_constants(parameters):
+    """
+    :param parameters: dictionary with the parameters of a species
+    :return: immutable record with the parameters and the derived
+        constants breeding_threshold, the weight below which an animal
+        cannot give birth, and inverse_delta_phi_max, 1 / DeltaPhiMax
+
+    The inverse is nan for a species without DeltaPhiMax, and infinite for
+    a DeltaPhiMax of 0.
+    """
+    delta_phi_max = parameters["DeltaPhiMax"]
+    if delta_phi_max is None:
+        inverse_delta_phi_max = math.nan
+    elif delta_phi_max == 0:
+        inverse_delta_phi_max = math.inf
+    else:
+        inverse_delta_phi_max = 1 / delta_phi_max
+    return constants_record(
+        parameters,
+        breeding_threshold=parameters["zeta"] * (parameters["w_birth"] +
+                                                 parameters["sigma_birth"]),
+        inverse_delta_phi_max=inverse_delta_phi_max)
+
+
+def parameter_array(name):
+    """
+    :param name: String, name of a parameter or derived constant
+    :return: read-only numpy array with the value for every species,
+        indexed by species code, nan where the value is None
+
+    Used by the vectorized engines. The arrays are kept until the
+    parameters of a species change.
+    """
+    versions = tuple(species.parameters.version
+                     for species in SPECIES_BY_CODE)
+    cached = _parameter_arrays.get(name)
+    if cached is None or cached[0] != versions:
+        values = [getattr(species.parameters.constants, name)
+                  for species in SPECIES_BY_CODE]
+        array = np.array([np.nan if value is None else value
+                          for value in values], dtype=float)
+        array.flags.writeable = False
+        cached = _parameter_arrays[name] = (versions, array)
+    return cached[1]
 
 
 class Animals:
     """The overall class for the animals which lives on the island"""
+    __slots__ = ("age", "weight", "id")
     instances = []
     parameters = {}
+    lineage = Lineage()
+    fitness_table = None
+    # species_name of the species it hunts, None for grazing species
+    prey = None
 
     @classmethod
     def age_up(cls):
@@ -33,12 +126,16 @@ class Animals:
             instance.weight -= instance.parameters["eta"] * instance.weight
 
     @classmethod
-    def reset_migration_attempt(cls):
+    def use_fitness_table(cls, tolerance=1e-6):
         """
-        Resets an animals migration attempts attribute
+        :param tolerance: float, the largest error allowed in the fitness,
+            or None to go back to the exact formula
+
+        Makes the species evaluate its fitness from a FitnessTable instead
+        of computing the exponentials of the exact formula.
         """
-        for instance in cls.instances:
-            instance.has_tried_migration_this_year = False
+        cls.fitness_table = None if tolerance is None else \
+            FitnessTable(cls, tolerance)
 
     def __init__(self, age, weight, potential_newborn):
         """
@@ -47,13 +144,15 @@ class Animals:
         :param potential_newborn: boolean, if True the instance is not added
             to class instance list
 
-        Constructor for the Animal class
+        Constructor for the Animal class. Every animal added to the class
+        instance list gets a unique integer id from the lineage, a potential
+        newborn gets its id, with its parent, when it is born.
         """
         self.age = age
         self.weight = self._birth_weight() if weight is None else weight
         if not potential_newborn:
+            self.id = Animals.lineage.register()
             Animals.instances.append(self)
-        self.has_tried_migration_this_year = False
 
     def _birth_weight(self):
         """
@@ -69,23 +168,24 @@ class Animals:
         )
 
     @property
-    @functools.lru_cache(maxsize=256)
     def fitness(self):
         """
         :return: float: the fitness of the animal
 
         Computes the fitness of an animal based on the weight and age of the
         animal along with some species specific parameters. The animal has zero
-        fitness if is has zero weight.
+        fitness if is has zero weight. Species using a fitness table look the
+        fitness up instead.
         """
         if self.weight <= 0:
             return 0
-        else:
-            return (1 + exp(
-                self.parameters["phi_age"] * (
-                        self.age - self.parameters["a_half"]))) ** -1 * (
-                    1 + exp(-self.parameters["phi_weight"] * (
-                        self.weight - self.parameters["w_half"]))) ** -1
+        if self.fitness_table is not None:
+            return self.fitness_table.value(self.age, self.weight)
+        constants = self.parameters.constants
+        return (1 + exp(constants.phi_age * (
+            self.age - constants.a_half))) ** -1 * (
+            1 + exp(-constants.phi_weight * (
+                self.weight - constants.w_half))) ** -1
 
     def _eat_increase_weight(self, food):
         """
@@ -102,22 +202,26 @@ class Animals:
         :param cell_population: The amount of animals in the respective
             location of the same species
 
-        Makes an animal try to breed.
+        Makes an animal try to breed. Animals below the breeding weight
+        threshold are turned down before their fitness is computed.
         """
-        breeding_probability = min(1, self.parameters["gamma"] *
-                                   self.fitness * (cell_population - 1))
-        if self.weight < self.parameters["zeta"] * \
-                (self.parameters["w_birth"] +
-                 (self.parameters["sigma_birth"])):
+        constants = self.parameters.constants
+        if self.weight < constants.breeding_threshold:
             return
+        breeding_probability = min(1, constants.gamma * self.fitness *
+                                   (cell_population - 1))
         if random.random() > breeding_probability:
             return
         potential_newborn = self.__class__(potential_newborn=True)
-        if self.parameters["xi"]*potential_newborn.weight > self.weight:
+        if constants.xi * potential_newborn.weight > self.weight:
             return
-        self.weight -= self.parameters["xi"]*potential_newborn.weight
+        self.weight -= constants.xi * potential_newborn.weight
+        potential_newborn.id = Animals.lineage.register(parent_id=self.id)
         cell.add_animal(potential_newborn)
         Animals.instances.append(potential_newborn)
+        if cell.event_log is not None:
+            cell.event_log.record(event_log.BIRTH, potential_newborn,
+                                  cell.location, other_id=self.id)
 
     def will_die_natural_death(self):
         """
@@ -157,7 +261,6 @@ class Animals:
         based on it's current cell and the neighbouring cells abundance of
         fodder(ek)
         """
-        self.has_tried_migration_this_year = True
         if self._will_migrate():
             sum_ek_neighbours = 0
             cell_probability = []
@@ -195,27 +298,30 @@ class Animals:
         return neighbouring_cells
 
 
+@register_species
 class Herbivores(Animals):
     """
     The class for the plant eating herbivores which lives on the island
     """
-    parameters = {"w_birth": 8.0,
-                  "sigma_birth": 1.5,
-                  "beta": 0.9,
-                  "eta": 0.05,
-                  "a_half": 40.0,
-                  "phi_age": 0.2,
-                  "w_half": 10,
-                  "phi_weight": 0.1,
-                  "mu": 0.25,
-                  "lambda": 1.0,
-                  "gamma": 0.2,
-                  "zeta": 3.5,
-                  "xi": 1.2,
-                  "omega": 0.4,
-                  "F": 10,
-                  "DeltaPhiMax": None
-                  }
+    __slots__ = ()
+    species_name = "Herbivore"
+    parameters = Parameters({"w_birth": 8.0,
+                             "sigma_birth": 1.5,
+                             "beta": 0.9,
+                             "eta": 0.05,
+                             "a_half": 40.0,
+                             "phi_age": 0.2,
+                             "w_half": 10,
+                             "phi_weight": 0.1,
+                             "mu": 0.25,
+                             "lambda": 1.0,
+                             "gamma": 0.2,
+                             "zeta": 3.5,
+                             "xi": 1.2,
+                             "omega": 0.4,
+                             "F": 10,
+                             "DeltaPhiMax": None},
+                            animal_constants)
 
     def __init__(self, age=0, weight=None, potential_newborn=False):
         """
@@ -248,7 +354,8 @@ class Herbivores(Animals):
             change preexisting parameters only.
 
         Sets the parameters of all herbivore instances to the provided
-        new_parameters.
+        new_parameters. All values are checked before any is set, so the
+        derived constants are rebuilt once, from a valid set of parameters.
         """
         for parameter, value in new_parameters.items():
             if parameter in cls.parameters.keys():
@@ -261,32 +368,37 @@ class Herbivores(Animals):
                 if parameter == "eta" and value > 1:
                     raise ValueError(
                         f"{parameter} value must be 0, 1 or in between")
-                cls.parameters[parameter] = value
             else:
                 raise ValueError(f"{parameter} is not an accepted parameter")
+        cls.parameters.update(new_parameters)
 
 
+@register_species
 class Carnivores(Animals):
     """
     This is the class for the meat eating carnivores which lives on
     the island
     """
-    parameters = {"w_birth": 6.0,
-                  "sigma_birth": 1.0,
-                  "beta": 0.75,
-                  "eta": 0.125,
-                  "a_half": 60.0,
-                  "phi_age": 0.4,
-                  "w_half": 4,
-                  "phi_weight": 0.4,
-                  "mu": 0.4,
-                  "lambda": 1.0,
-                  "gamma": 0.8,
-                  "zeta": 3.5,
-                  "xi": 1.1,
-                  "omega": 0.9,
-                  "F": 50,
-                  "DeltaPhiMax": 10}
+    __slots__ = ()
+    species_name = "Carnivore"
+    prey = "Herbivore"
+    parameters = Parameters({"w_birth": 6.0,
+                             "sigma_birth": 1.0,
+                             "beta": 0.75,
+                             "eta": 0.125,
+                             "a_half": 60.0,
+                             "phi_age": 0.4,
+                             "w_half": 4,
+                             "phi_weight": 0.4,
+                             "mu": 0.4,
+                             "lambda": 1.0,
+                             "gamma": 0.8,
+                             "zeta": 3.5,
+                             "xi": 1.1,
+                             "omega": 0.9,
+                             "F": 50,
+                             "DeltaPhiMax": 10},
+                            animal_constants)
 
     def __init__(self, age=0, weight=None, potential_newborn=False):
         """
@@ -300,39 +412,47 @@ class Carnivores(Animals):
         as the expectation and 'sigma_birth' as the standard deviation.
         """
         super().__init__(age, weight, potential_newborn)
-        self.eaten_this_year = 0
 
-    def kills_herbivore(self, herbivore):
+    def kills_herbivore(self, herbivore, eaten_this_year=0):
+        """
+        :param herbivore: The herbivore the carnivore will attempt to kill
+        :param eaten_this_year: float, the amount the carnivore already has
+            eaten this year, kept track of by the feeding phase
+        :return: boolean, True if the killing was successful, False if not
+
+        This function makes the carnivores try to kill and eat a herbivore.
+        The fitness of both animals is computed once per attempt.
+        """
+        if eaten_this_year >= self.parameters.constants.F:
+            return False
+        return self.attempt_kill(herbivore, self.fitness - herbivore.fitness)
+
+    def attempt_kill(self, herbivore, fitness_difference):
         """
         :param herbivore: The herbivore the carnivore will attempt to kill
+        :param fitness_difference: float, the fitness of the carnivore minus
+            the fitness of the herbivore
         :return: boolean, True if the killing was successful, False if not
 
-        This function makes the carnivores try to kill and eat a herbivore
+        The killing rule of kills_herbivore for a fitness difference known
+        by the caller, so the feeding phase can keep the fitness of the
+        herbivores instead of computing it for every attempt.
         """
-        if self.fitness < herbivore.fitness or self.eaten_this_year >= \
-                self.parameters["F"]:
+        constants = self.parameters.constants
+        if fitness_difference < 0:
             return False
-        elif (self.fitness - herbivore.fitness) <\
-                self.parameters["DeltaPhiMax"]:
-            killing_prop = (self.fitness - herbivore.fitness) / \
-                           self.parameters["DeltaPhiMax"]
+        elif fitness_difference < constants.DeltaPhiMax:
+            killing_prop = fitness_difference * \
+                constants.inverse_delta_phi_max
             if random.random() < killing_prop:
-                self.eaten_this_year += herbivore.weight
                 self._eat_increase_weight(herbivore.weight)
                 return True
             else:
                 return False
         else:
-            self.eaten_this_year += herbivore.weight
             self._eat_increase_weight(herbivore.weight)
             return True
 
-    def reset_amount_eaten_this_year(self):
-        """
-        Resets the amount of food a carnivore has eaten for one year
-        """
-        self.eaten_this_year = 0
-
     @classmethod
     def set_parameters(cls, new_parameters):
         """
@@ -341,7 +461,8 @@ class Carnivores(Animals):
             change preexisting parameters only.
 
         Sets the parameters of all carnivore instances to the provided
-        new_parameters.
+        new_parameters. All values are checked before any is set, so the
+        derived constants are rebuilt once, from a valid set of parameters.
         """
         for parameter, value in new_parameters.items():
             if parameter in cls.parameters.keys():
@@ -353,6 +474,6 @@ class Carnivores(Animals):
                 if parameter == "eta" and value > 1:
                     raise ValueError(
                         "{parameter} value must be 0, 1 or in between")
-                cls.parameters[parameter] = value
             else:
                 raise ValueError(f"{parameter} is not an accepted parameter")
+        cls.parameters.update(new_parameters)
@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+
+"""
+Array engine for the island.
+
+The animals are not Python objects here, but rows in a PopulationStore of
+NumPy arrays. The ordered phases of the annual cycle are run by the loops
+in biosim.kernels, compiled with numba when it is installed, while aging,
+metabolism and the census are whole-array operations. The engine follows
+the same rules as the object engine, but draws its random numbers
+differently, so it agrees with it statistically and not year by year.
+
+CompactArrayIsland keeps the weights and fitness in 32 bit floats, the ages
+in 16 bit and the cells in 32 bit unsigned integers, which nearly halves
+the memory read and written by every phase.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.island import Island
+from biosim.animals import (SPECIES_BY_CODE, Animals, Herbivores, Carnivores,
+                            parameter_array)
+from biosim import event_log, kernels
+import numpy as np
+import random
+import time
+
+
+class PopulationStore:
+    """
+    The animals of an island as one array per attribute, with one row per
+    animal.
+
+    The arrays are views of buffers with room for more rows than are in
+    use. The capacity grows geometrically when the buffers are full, so a
+    wave of births seldom reallocates them. Removed animals leave dead rows,
+    marked in the array alive, and their rows are reused by the next
+    animals added. The dead rows are only compacted away when they are more
+    than compaction_threshold of the rows in use, or when the rows are
+    grouped by cell, which moves all the rows anyway.
+
+    The rows can be grouped by species and cell, in the order of the key
+    species code * number of cells + flat cell index, with the array
+    offsets giving the first row of every group and the number of rows at
+    the end (a CSR layout). The animals of a species, and of a species in a
+    cell, are then contiguous rows, and the number of animals in every cell
+    is np.diff(offsets). Adding animals or moving them to other cells drops
+    the grouping until group_by_cell is called again.
+    """
+    fields = ("species", "age", "weight", "cell", "id")
+    dtypes = {"species": np.int64, "age": np.int64, "weight": np.float64,
+              "cell": np.int64, "id": np.int64}
+    compact_dtypes = {"species": np.int64, "age": np.uint16,
+                      "weight": np.float32, "cell": np.uint32,
+                      "id": np.int64}
+    growth_factor = 2
+    compaction_threshold = 0.25
+    initial_capacity = 64
+
+    def __init__(self, num_cells=0, dtypes=None):
+        """
+        :param num_cells: int, the number of cells of the map
+        :param dtypes: dictionary with the dtype of every field, e.g.
+            compact_dtypes, or None for the default dtypes
+
+        Constructor for the PopulationStore class, creating an empty store
+        """
+        if dtypes is not None:
+            self.dtypes = dtypes
+        self.num_cells = num_cells
+        self.capacity = 0
+        self.num_rows = 0
+        self.num_dead = 0
+        self._buffers = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._free = np.zeros(0, dtype=np.int64)
+        self.growths = 0
+        self.compactions = 0
+        self.compaction_time = 0.0
+        self._reallocate(0)
+        self.offsets = np.zeros(len(SPECIES_BY_CODE) * num_cells + 1,
+                                dtype=np.int64)
+
+    def __len__(self):
+        return self.num_rows - self.num_dead
+
+    @property
+    def grouped(self):
+        """True if the rows are grouped by species and cell"""
+        return self.offsets is not None
+
+    def _reallocate(self, capacity):
+        """
+        :param capacity: int, the new number of rows of the buffers
+
+        Moves the rows in use to new buffers of the given capacity.
+        """
+        for field in self.fields:
+            buffer = np.zeros(capacity, dtype=self.dtypes[field])
+            buffer[:self.num_rows] = getattr(self, field, ())
+            self._buffers[field] = buffer
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.num_rows] = self._alive[:self.num_rows]
+        self._alive = alive
+        self.capacity = capacity
+        self._update_views()
+
+    def _update_views(self):
+        """
+        Points the field arrays and alive at the rows in use
+        """
+        for field in self.fields:
+            setattr(self, field, self._buffers[field][:self.num_rows])
+        self.alive = self._alive[:self.num_rows]
+
+    def _keys(self):
+        """
+        :return: array with the group key of every row
+        """
+        return self.species * self.num_cells + self.cell
+
+    def add(self, species, age, weight, cell, parent_ids=None):
+        """
+        :param species: array with the species code of the new animals
+        :param age: array with their ages
+        :param weight: array with their weights
+        :param cell: array with their flat cell indices
+        :param parent_ids: array with the id of their parents, or None for
+            animals without parents
+        :return: array with the rows of the new animals
+
+        Adds animals to the store, in dead rows first and then after the
+        rows in use, and registers them in the lineage.
+        """
+        num_new = len(species)
+        if num_new == 0:
+            return np.zeros(0, dtype=np.int64)
+        if parent_ids is None:
+            parent_ids = np.full(num_new, -1, dtype=np.int64)
+        new_columns = {"species": species, "age": age, "weight": weight,
+                       "cell": cell,
+                       "id": Animals.lineage.register_many(parent_ids)}
+        reused = min(num_new, len(self._free))
+        rows = self._free[len(self._free) - reused:]
+        self._free = self._free[:len(self._free) - reused]
+        self.num_dead -= reused
+        appended = num_new - reused
+        if self.num_rows + appended > self.capacity:
+            capacity = max(self.capacity, self.initial_capacity)
+            while capacity < self.num_rows + appended:
+                capacity *= self.growth_factor
+            self._reallocate(capacity)
+            self.growths += 1
+        rows = np.concatenate([rows, np.arange(self.num_rows,
+                                               self.num_rows + appended)])
+        self.num_rows += appended
+        self._update_views()
+        for field in self.fields:
+            getattr(self, field)[rows] = new_columns[field]
+        self.alive[rows] = True
+        self.offsets = None
+        return rows
+
+    def remove(self, mask):
+        """
+        :param mask: boolean array, True for the animals to remove
+
+        Marks the rows of the animals as dead and free for reuse, and
+        compacts the store if too many of its rows are dead.
+        """
+        rows = np.flatnonzero(mask & self.alive)
+        if len(rows) == 0:
+            return
+        self.alive[rows] = False
+        self._free = np.concatenate([self._free, rows[::-1]])
+        self.num_dead += len(rows)
+        if self.num_dead > self.compaction_threshold * self.num_rows:
+            self.compact()
+
+    def _gather(self, rows):
+        """
+        :param rows: array with the rows to keep, in their new order
+
+        Moves the given rows to the start of the buffers and drops the rest.
+        """
+        for field in self.fields:
+            buffer = self._buffers[field]
+            buffer[:len(rows)] = buffer[rows]
+        self._alive[:len(rows)] = True
+        self._alive[len(rows):self.num_rows] = False
+        self.num_rows = len(rows)
+        self.num_dead = 0
+        self._free = np.zeros(0, dtype=np.int64)
+        self._update_views()
+
+    def compact(self):
+        """
+        Moves the living animals to the first rows, keeping their order and
+        so the grouping by cell, and drops the dead rows.
+        """
+        start = time.perf_counter()
+        if self.grouped:
+            self.offsets[1:] = np.cumsum(self.cell_counts().ravel())
+        self._gather(np.flatnonzero(self.alive))
+        self.compactions += 1
+        self.compaction_time += time.perf_counter() - start
+
+    def cells_changed(self):
+        """
+        Drops the grouping after the cells of the animals have been changed
+        in place
+        """
+        self.offsets = None
+
+    def group_by_cell(self):
+        """
+        Groups the living animals by species and cell with a counting sort,
+        keeping their order within every group, and drops the dead rows.
+        If the rows are grouped already, the dead rows are only compacted
+        away.
+        """
+        if self.grouped:
+            if self.num_dead:
+                self.compact()
+            return
+        living = np.flatnonzero(self.alive)
+        keys = self._keys()[living]
+        offsets = np.zeros(len(SPECIES_BY_CODE) * self.num_cells + 1,
+                           dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=len(offsets) - 1),
+                  out=offsets[1:])
+        if kernels.JIT_AVAILABLE:
+            order = kernels.counting_sort(keys, offsets)
+        else:
+            order = np.argsort(keys, kind="stable")
+        self._gather(living[order])
+        self.offsets = offsets
+
+    def cell_counts(self):
+        """
+        :return: 2D array with the number of animals of every species in
+            every cell
+        """
+        if self.grouped and self.num_dead == 0:
+            counts = np.diff(self.offsets)
+        else:
+            counts = np.bincount(self._keys()[self.alive], minlength=len(
+                SPECIES_BY_CODE) * self.num_cells)
+        return counts.reshape(len(SPECIES_BY_CODE), self.num_cells)
+
+    def of_species(self, species_code):
+        """
+        :param species_code: int, the species code
+        :return: array with the rows of the living animals of the species,
+            ordered by cell if the rows are grouped
+        """
+        if self.grouped and self.num_dead == 0:
+            return np.arange(self.offsets[species_code * self.num_cells],
+                             self.offsets[(species_code + 1) *
+                                          self.num_cells])
+        return np.flatnonzero((self.species == species_code) & self.alive)
+
+    def metrics(self):
+        """
+        :return: dictionary with the capacity of the buffers, the number of
+            rows in use, living animals and free rows, the number of times
+            the buffers have grown and been compacted, and the time spent
+            compacting in seconds
+        """
+        return {"capacity": self.capacity, "rows": self.num_rows,
+                "live": len(self), "free": len(self._free),
+                "growths": self.growths, "compactions": self.compactions,
+                "compaction_time": self.compaction_time}
+
+
+class ArrayIsland(Island):
+    """
+    Island running the annual cycle on a PopulationStore. The reporting
+    methods of Island work as before, as they use the density grids and the
+    fodder array, while the animal lists of the cells stay empty.
+    """
+    store_dtypes = PopulationStore.dtypes
+    fitness_dtype = np.float64
+
+    def __init__(self, island_map, seed=None):
+        """
+        :param island_map: multi-line string specifying island geography
+        :param seed: int, seed for the random numbers of the engine, drawn
+            from the random module if None
+
+        Constructor for the ArrayIsland class
+        """
+        super().__init__(island_map)
+        self.num_cells = self.shape[0] * self.shape[1]
+        self.store = PopulationStore(self.num_cells, self.store_dtypes)
+        self._accessible_flat = self._accessible_mask.ravel().copy()
+        self._fodder_index = np.full(self.num_cells, -1, dtype=np.int64)
+        for index, cell in enumerate(self._fodder_cells):
+            self._fodder_index[self._flat_index(cell.location)] = index
+        self._neighbours = np.array([self.shape[1], -self.shape[1], 1, -1])
+        kernels.seed(random.getrandbits(32) if seed is None else seed)
+
+    def _flat_index(self, location):
+        """
+        :param location: tuple, the location (x,y) of a cell
+        :return: int, the index of the cell in the flattened map
+        """
+        return location[0] * self.shape[1] + location[1]
+
+    @staticmethod
+    def _species_parameter(name):
+        """
+        :param name: String, name of an animal parameter or derived
+            constant
+        :return: read-only array with the value for every species
+        """
+        return parameter_array(name)
+
+    def _fitness(self, rows=None):
+        """
+        :param rows: array with the rows of the animals, all if None
+        :return: array with the fitness of the animals
+
+        The fitness tables are used when every species has one.
+        """
+        store = self.store
+        if rows is None:
+            rows = slice(None)
+        species = store.species[rows]
+        age = store.age[rows]
+        weight = store.weight[rows]
+        if all(cls.fitness_table is not None for cls in SPECIES_BY_CODE):
+            fitness = np.empty(len(species), dtype=self.fitness_dtype)
+            for code, cls in enumerate(SPECIES_BY_CODE):
+                members = species == code
+                fitness[members] = cls.fitness_table.evaluate(
+                    age[members], weight[members])
+            return fitness
+        phi_age = self._species_parameter("phi_age")[species]
+        a_half = self._species_parameter("a_half")[species]
+        phi_weight = self._species_parameter("phi_weight")[species]
+        w_half = self._species_parameter("w_half")[species]
+        with np.errstate(over="ignore"):
+            fitness = 1 / (1 + np.exp(phi_age * (age - a_half))) / \
+                (1 + np.exp(-phi_weight * (weight - w_half)))
+        fitness[weight <= 0] = 0
+        return fitness.astype(self.fitness_dtype, copy=False)
+
+    def populate_island(self, population_list):
+        """
+        :param population_list: list of dictionary {(x,y): instance}
+
+        Adds the animals to the store, with the same checks as
+        Island.populate_island. Missing weights are drawn from the birth
+        weight distribution.
+        """
+        self._activate_lineage()
+        new_animals = list(self._new_animals(population_list))
+        species = np.array([animal[1].species_code for animal in new_animals],
+                           dtype=np.int64)
+        weight = np.array([np.nan if animal[3] is None else animal[3]
+                           for animal in new_animals], dtype=float)
+        missing = np.isnan(weight)
+        if missing.any():
+            w_birth = self._species_parameter("w_birth")[species[missing]]
+            sigma_birth = self._species_parameter(
+                "sigma_birth")[species[missing]]
+            drawn = np.empty(missing.sum())
+            kernels.normal(w_birth, sigma_birth, drawn)
+            weight[missing] = drawn
+        self.store.add(
+            species,
+            np.array([animal[2] for animal in new_animals], dtype=np.int64),
+            weight,
+            np.array([self._flat_index(animal[0]) for animal in new_animals],
+                     dtype=np.int64))
+        self._update_density_grids()
+
+    def _update_density_grids(self):
+        """
+        Groups the store by species and cell again, after the births and
+        migration of the year, and takes the number of animals of each
+        species in every cell from its offsets.
+        """
+        self._density_stale = False
+        self._dataframe_cache.clear()
+        self.store.group_by_cell()
+        self._density[...] = self.store.cell_counts().reshape(
+            self._density.shape)
+
+    def _feed_all_animals(self):
+        """
+        Lets the herbivores graze, the fittest first in every cell, and then
+        the carnivores hunt.
+        """
+        store = self.store
+        herbivores = store.of_species(Herbivores.species_code)
+        grazing = herbivores[self._fodder_index[store.cell[herbivores]] >= 0]
+        fitness = self._fitness(grazing)
+        order = grazing[np.lexsort((-fitness, store.cell[grazing]))]
+        kernels.graze(order, store.cell, store.weight, self._fodder,
+                      self._fodder_index,
+                      self._species_parameter("F")[Herbivores.species_code],
+                      self._species_parameter("beta")[Herbivores.species_code])
+        self._hunt()
+
+    def _hunt(self):
+        """
+        Lets the carnivores hunt in every cell with both species. The store
+        is grouped by species and cell, so the animals of a species are
+        ordered by cell already and only sorted by fitness within their
+        cells. The cells are segments of the sorted arrays, found from the
+        number of animals in every cell.
+        """
+        self._density_stale = True
+        store = self.store
+        store.group_by_cell()
+        herbivores = store.of_species(Herbivores.species_code)
+        carnivores = store.of_species(Carnivores.species_code)
+        if len(herbivores) == 0 or len(carnivores) == 0:
+            return
+        herbivore_fitness = self._fitness(herbivores)
+        herbivore_order = np.lexsort((herbivore_fitness,
+                                      store.cell[herbivores]))
+        herbivores = herbivores[herbivore_order]
+        herbivore_fitness = herbivore_fitness[herbivore_order]
+        carnivore_fitness = self._fitness(carnivores)
+        carnivores = carnivores[np.lexsort((-carnivore_fitness,
+                                            store.cell[carnivores]))]
+        counts = store.cell_counts()
+        herbivore_counts = counts[Herbivores.species_code]
+        carnivore_counts = counts[Carnivores.species_code]
+        cells = np.flatnonzero((herbivore_counts > 0) & (carnivore_counts > 0))
+        herbivore_start = np.cumsum(herbivore_counts)[cells] - \
+            herbivore_counts[cells]
+        carnivore_start = np.cumsum(carnivore_counts)[cells] - \
+            carnivore_counts[cells]
+        killer = np.full(store.num_rows, -1, dtype=np.int64)
+        hunter = Carnivores.species_code
+        parameter = self._species_parameter
+        kernels.hunt(
+            herbivores, herbivore_fitness, herbivore_start,
+            herbivore_start + herbivore_counts[cells], carnivores,
+            carnivore_start, carnivore_start + carnivore_counts[cells],
+            store.age, store.weight, killer, parameter("F")[hunter],
+            parameter("beta")[hunter], parameter("DeltaPhiMax")[hunter],
+            parameter("phi_age")[hunter], parameter("a_half")[hunter],
+            parameter("phi_weight")[hunter], parameter("w_half")[hunter])
+        killed = killer >= 0
+        if self.event_log is not None:
+            victims = np.flatnonzero(killed)
+            self._log_events(event_log.KILL, killer[victims],
+                             cells=store.cell[victims],
+                             other_ids=store.id[victims],
+                             weights=store.weight[victims])
+        store.remove(killed)
+
+    def _breed_in_all_cells(self):
+        """
+        Lets every animal try to give birth, with the number of animals of
+        its species in its cell counted before anyone is born. The newborns
+        are added to the store with their mothers as parents.
+        """
+        self._density_stale = True
+        store = self.store
+        cell_population = store.cell_counts()[store.species, store.cell]
+        birth_weight = np.full(store.num_rows, np.nan)
+        kernels.breed(store.species, store.alive, store.weight,
+                      self._fitness(), cell_population,
+                      self._species_parameter("gamma"),
+                      self._species_parameter("breeding_threshold"),
+                      self._species_parameter("w_birth"),
+                      self._species_parameter("sigma_birth"),
+                      self._species_parameter("xi"), birth_weight)
+        mothers = np.flatnonzero(~np.isnan(birth_weight))
+        newborns = store.add(store.species[mothers], np.zeros(len(mothers)),
+                             birth_weight[mothers], store.cell[mothers],
+                             parent_ids=store.id[mothers])
+        if self.event_log is not None:
+            self._log_events(event_log.BIRTH, newborns,
+                             other_ids=store.id[mothers])
+
+    def _migrate_all_cells(self):
+        """
+        :return: int, the number of animals which moved to another cell
+
+        Computes the relative abundance of food of every cell for both
+        species, and lets every animal try to migrate once. The store is
+        grouped by cell again at the end of the year, by
+        _update_density_grids.
+        """
+        self._density_stale = True
+        store = self.store
+        counts = store.cell_counts()
+        herbivores = (store.species == Herbivores.species_code) & store.alive
+        herbivore_biomass = np.bincount(store.cell[herbivores],
+                                        weights=store.weight[herbivores],
+                                        minlength=self.num_cells)
+        if self.event_log is not None:
+            cells_before = store.cell.copy()
+        moves = kernels.migrate(store.species, store.alive, store.cell,
+                                self._fitness(),
+                                self._species_parameter("mu"),
+                                self._ek(counts, herbivore_biomass),
+                                self._accessible_flat, self._neighbours)
+        if moves:
+            store.cells_changed()
+            if self.event_log is not None:
+                self._log_events(event_log.MIGRATION,
+                                 np.flatnonzero(store.cell != cells_before))
+        return moves
+
+    def _ek(self, counts, herbivore_biomass):
+        """
+        :param counts: 2D array with the number of animals of every species
+            in every cell
+        :param herbivore_biomass: array with the herbivore biomass of every
+            cell
+        :return: 2D array with the relative abundance of food of every cell
+            for every species, as in Topography.ek_for_cell
+        """
+        fodder = np.zeros(self.num_cells)
+        fodder_cells = self._fodder_index >= 0
+        fodder[fodder_cells] = self._fodder[self._fodder_index[fodder_cells]]
+        food = np.zeros(counts.shape)
+        food[Herbivores.species_code] = fodder
+        food[Carnivores.species_code] = herbivore_biomass
+        return food / ((counts + 1) *
+                       self._species_parameter("F")[:, np.newaxis])
+
+    def _age_all_animals(self):
+        """
+        Increases the age of all animals by one year
+        """
+        self.store.age += 1
+
+    def _metabolism_all_animals(self):
+        """
+        Decreases the weight of all animals by their annual metabolism
+        """
+        store = self.store
+        store.weight -= self._species_parameter("eta")[store.species] * \
+            store.weight
+
+    def _annual_death_all_cells(self):
+        """
+        Removes the animals dying a natural death
+        """
+        self._density_stale = True
+        store = self.store
+        dead = np.zeros(store.num_rows, dtype=bool)
+        kernels.die(store.species, store.alive, self._fitness(),
+                    self._species_parameter("omega"), dead)
+        if self.event_log is not None:
+            self._log_events(event_log.NATURAL_DEATH, np.flatnonzero(dead))
+        store.remove(dead)
+
+    def _num_animals(self):
+        """
+        :return: int, the number of living animals
+        """
+        return len(self.store)
+
+    def total_number_per_species(self):
+        """
+        :return: dict {species: individuals}
+        """
+        store = self.store
+        counts = np.bincount(store.species[store.alive],
+                             minlength=len(SPECIES_BY_CODE))
+        return {species.species_name: int(count)
+                for species, count in zip(SPECIES_BY_CODE, counts)}
+
+    def _species_age_and_weight(self, species_code):
+        """
+        :param species_code: int, the species code of the animals
+        :return: two numpy arrays with the ages and weights of all animals of
+            the species on the island
+        """
+        rows = self.store.of_species(species_code)
+        return self.store.age[rows], self.store.weight[rows]
+
+    def biomass_food_chain(self):
+        """
+        :return: dictionary, biomass info for fodder, herbivores and carnivores
+        """
+        biomass = self.species_biomass()
+        return {"biomass_fodder": self._fodder.sum(),
+                "biomass_herbs": biomass[Herbivores.species_code],
+                "biomass_carnivores": biomass[Carnivores.species_code]}
+
+    def species_biomass(self):
+        """
+        :return: array with the total weight of the animals of every
+            species, indexed by species code
+        """
+        store = self.store
+        return np.bincount(store.species[store.alive],
+                           weights=store.weight[store.alive],
+                           minlength=len(SPECIES_BY_CODE))
+
+    def _log_events(self, event, rows, cells=None, other_ids=-1,
+                    weights=None):
+        """
+        :param event: int, event type code
+        :param rows: array with the rows of the animals the events happened
+            to, for kills the killers
+        :param cells: array with the flat cell of every event, defaults to
+            the cells of the animals
+        :param other_ids: array with the id of the parent or victim of every
+            event, or -1 for none
+        :param weights: array with the weight to record for every event,
+            defaults to the weights of the animals
+
+        Records the events in the event log with the ids of the animals in
+        the store, which are the ids of their lineage.
+        """
+        store = self.store
+        if cells is None:
+            cells = store.cell[rows]
+        if weights is None:
+            weights = store.weight[rows]
+        cells = cells.astype(np.int64)
+        self.event_log.record_many(
+            event, store.species[rows], cells // self.shape[1],
+            cells % self.shape[1], store.id[rows], weights,
+            other_ids=other_ids)
+
+
+class CompactArrayIsland(ArrayIsland):
+    """
+    Array island keeping the weights and fitness of the animals in 32 bit
+    floats, their ages in 16 bit and their cells in 32 bit unsigned
+    integers. The rounding of the weights and fitness is far below the
+    randomness of the simulation, so the populations follow the same
+    distribution as with the default dtypes.
+    """
+    store_dtypes = PopulationStore.compact_dtypes
+    fitness_dtype = np.float32
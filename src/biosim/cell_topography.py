@@ -4,22 +4,255 @@ __author__ = "Kåre Johnsen & Anders Karlsen"
 __email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
 
 import biosim.animals as animals
+from biosim import event_log
+from biosim.fodder import FodderStore
+from biosim.parameters import Parameters
+import numpy as np
 import copy
 
+LANDSCAPES = {}
+LANDSCAPES_BY_CODE = []
+
+
+def register_landscape(landscape_class):
+    """
+    :param landscape_class: landscape class to register
+    :return: the registered class
+
+    Class decorator which gives a landscape the next integer type code and
+    makes it available by its map letter in LANDSCAPES, so the island can
+    build and group its cells without knowing the class.
+    """
+    landscape_class.type_code = len(LANDSCAPES_BY_CODE)
+    LANDSCAPES_BY_CODE.append(landscape_class)
+    LANDSCAPES[landscape_class.landscape_code] = landscape_class
+    return landscape_class
+
+
+def feed_carnivores_in_cells(cells, herbivore_fitness=None):
+    """
+    :param cells: list with the cells where the carnivores hunt, in map
+        order
+    :param herbivore_fitness: list with, for every cell, the list with the
+        current fitness of its herbivores in the order of herbivore_list, or
+        None to compute it. None computes it for all cells.
+
+    Lets the carnivores of all the cells hunt in one pass, see hunt_in_cells.
+    """
+    hunt_in_cells(cells, animals.Carnivores, herbivore_fitness)
+
+
+def hunt_in_cells(cells, hunter, prey_fitness=None):
+    """
+    :param cells: list with the cells where the hunters hunt, in map order
+    :param hunter: the species class which hunts, its prey is the species
+        named by its prey attribute
+    :param prey_fitness: list with, for every cell, the list with the
+        current fitness of its prey in the order of the cell's animal list,
+        or None to compute it. None computes it for all cells.
+
+    Lets the hunters of all the cells hunt in one pass. The fittest hunter
+    of a cell tries to kill the least fit prey first, until it has eaten its
+    appetite, and then the next fittest hunter has its turn.
+
+    The animals of all the cells are put in flat arrays and sorted by cell
+    and fitness with one lexsort per species, so every cell is a segment of
+    the sorted arrays. The fitness of the prey does not change during the
+    hunt, and a hunter stops at the first prey fitter than itself. A hunter
+    less fit than the weakest prey of its cell can therefore not kill
+    anything, and these hunters are found for all the cells at once and
+    left out of the loop. Killed prey is skipped by the following hunters,
+    and taken out of the animal lists and the register of animals once at
+    the end.
+    """
+    hunter_code = hunter.species_code
+    prey_code = animals.SPECIES[hunter.prey].species_code
+    if prey_fitness is None:
+        prey_fitness = [None] * len(cells)
+    prey_animals = []
+    fitness = []
+    for cell, cell_fitness in zip(cells, prey_fitness):
+        prey_animals.extend(cell.animal_lists[prey_code])
+        if cell_fitness is None:
+            cell_fitness = [animal.fitness
+                            for animal in cell.animal_lists[prey_code]]
+        fitness.extend(cell_fitness)
+    hunters = [animal for cell in cells
+               for animal in cell.animal_lists[hunter_code]]
+    if not prey_animals or not hunters:
+        return
+    segments = np.arange(len(cells))
+    prey_counts = [len(cell.animal_lists[prey_code]) for cell in cells]
+    prey_cells = np.repeat(segments, prey_counts)
+    hunter_cells = np.repeat(
+        segments, [len(cell.animal_lists[hunter_code]) for cell in cells])
+    prey_fitness = np.array(fitness, dtype=float)
+    hunter_fitness = np.array([animal.fitness for animal in hunters],
+                              dtype=float)
+
+    prey_order = np.lexsort((prey_fitness, prey_cells))
+    prey_fitness = prey_fitness[prey_order]
+    prey_start = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum(prey_counts, out=prey_start[1:])
+    weakest = np.full(len(cells), np.inf)
+    has_prey = prey_start[1:] > prey_start[:-1]
+    weakest[has_prey] = prey_fitness[prey_start[:-1][has_prey]]
+    hunter_order = np.lexsort((-hunter_fitness, hunter_cells))
+    able = hunter_order[hunter_fitness[hunter_order] >=
+                        weakest[hunter_cells[hunter_order]]]
+    if len(able) == 0:
+        return
+
+    prey = [prey_animals[index] for index in prey_order.tolist()]
+    prey_fitness = prey_fitness.tolist()
+    prey_start = prey_start.tolist()
+    able_fitness = hunter_fitness[able].tolist()
+    able_cells = hunter_cells[able].tolist()
+    alive = [True] * len(prey)
+    killed = []
+    appetite = hunter.parameters.constants.F
+    for index, fitness_of_hunter, segment in zip(
+            able.tolist(), able_fitness, able_cells):
+        predator = hunters[index]
+        eaten_this_year = 0
+        for position in range(prey_start[segment], prey_start[segment + 1]):
+            if eaten_this_year >= appetite:
+                break
+            if not alive[position]:
+                continue
+            fitness_difference = fitness_of_hunter - prey_fitness[position]
+            if fitness_difference < 0:
+                break
+            victim = prey[position]
+            if predator.attempt_kill(victim, fitness_difference):
+                eaten_this_year += victim.weight
+                fitness_of_hunter = predator.fitness
+                alive[position] = False
+                killed.append(victim)
+                cell = cells[segment]
+                if cell.event_log is not None:
+                    cell.event_log.record(
+                        event_log.KILL, predator, cell.location,
+                        other_id=victim.id, weight=victim.weight)
+    if not killed:
+        return
+    killed = set(map(id, killed))
+    for segment in set(able_cells):
+        cell = cells[segment]
+        cell.set_animal_list(prey_code, [
+            animal for animal in cell.animal_lists[prey_code]
+            if id(animal) not in killed])
+    animals.Animals.instances[:] = [
+        animal for animal in animals.Animals.instances
+        if id(animal) not in killed]
+
+
+def _species_list(species_name):
+    """
+    :param species_name: String, name of a registered species
+    :return: property giving the list of the animals of the species in a
+        cell
+    """
+    def get_list(cell):
+        return cell.animal_lists[animals.SPECIES[species_name].species_code]
+
+    def set_list(cell, animal_list):
+        cell.set_animal_list(animals.SPECIES[species_name].species_code,
+                             animal_list)
+
+    return property(get_list, set_list,
+                    doc=f"List of the {species_name.lower()}s in the cell")
+
 
 class Topography:
     """
     Topography superclass from where all active cell-types are subclassed.
     Represents a single cell on the map
     """
+    produces_fodder = False
+    event_log = None
+    # Parameters of the landscapes whose parameters can be set
+    parameters = None
+
     def __init__(self):
         """
         Topography superclass constructor
         """
         self.is_accessible = True
-        self.herbivore_list = []
-        self.carnivore_list = []
-        self.fodder = 0.0
+        self.animal_lists = [[] for _ in animals.SPECIES_BY_CODE]
+        self.location = None
+        self.active_cells = None
+        self._fodder = 0.0
+        self._fodder_store = None
+        self._fodder_index = 0
+        self._counts = None
+        self._dataframe_cache = None
+
+    @property
+    def fodder(self):
+        """Current amount of fodder in the cell"""
+        if self._fodder_store is None:
+            return self._fodder
+        return self._fodder_store.get(self._fodder_index)
+
+    @fodder.setter
+    def fodder(self, amount):
+        if self._fodder_store is None:
+            self._fodder = amount
+        else:
+            self._fodder_store.set(self._fodder_index, amount)
+
+    def bind_to_island(self, location, active_cells, fodder_store=None,
+                       fodder_index=0, counts=None, dataframe_cache=None):
+        """
+        :param location: tuple, the location (x,y) of the cell
+        :param active_cells: set of the locations on the island with animals
+        :param fodder_store: FodderStore holding the fodder of the island's
+            fodder producing cells, or None to keep the cell's own fodder
+        :param fodder_index: int, the index of the cell in fodder_store
+        :param counts: numpy array with the island's number of animals of
+            every species in this cell, a view of its density grids
+        :param dataframe_cache: the island's dict of dataframes made from
+            the density grids
+
+        Connects the cell to its island. Adding an animal marks the cell's
+        location as active, and the fodder is kept in the island's store so
+        regrowth is only done for the cells whose fodder is read. Adding and
+        removing animals also updates the island's counts and drops its
+        cached dataframes, so the density grids are never behind the cells.
+        """
+        self.location = location
+        self.active_cells = active_cells
+        self._counts = counts
+        self._dataframe_cache = dataframe_cache
+        if fodder_store is not None:
+            fodder_store.set(fodder_index, self.fodder)
+            self._fodder_store = fodder_store
+            self._fodder_index = fodder_index
+
+    def has_animals(self):
+        """
+        :return: boolean, True if there is at least one animal in the cell
+        """
+        return any(self.animal_lists)
+
+    def set_animal_list(self, species_code, animal_list):
+        """
+        :param species_code: int, the species code of the animals
+        :param animal_list: list with the animals of the species in the cell
+
+        Replaces the list of the animals of one species in the cell, and
+        marks the cell as active on its island if the list has animals.
+        """
+        self.animal_lists[species_code] = animal_list
+        if animal_list and self.active_cells is not None:
+            self.active_cells.add(self.location)
+        if self._counts is not None:
+            self._counts[species_code] = len(animal_list)
+            self._dataframe_cache.clear()
+
+    herbivore_list = _species_list("Herbivore")
+    carnivore_list = _species_list("Carnivore")
 
     def allowed_fodder_to_consume(self, decrease_amount):
         """
@@ -43,26 +276,28 @@ class Topography:
         :param animal: An instance of an animal class.
 
         Removes the instance of an animal from the list of animal instances
-        in the cell.
+        in the cell. Nothing happens if the animal is not in the cell.
         """
-        if animal.__class__.__name__ == "Herbivores":
-            self.herbivore_list = [herbi for herbi in self.herbivore_list
-                                   if animal != herbi]
-        elif animal.__class__.__name__ == "Carnivores":
-            self.carnivore_list = [carni for carni in self.carnivore_list
-                                   if animal != carni]
+        animal_list = self.animal_lists[animal.species_code]
+        if animal in animal_list:
+            animal_list.remove(animal)
+            if self._counts is not None:
+                self._counts[animal.species_code] -= 1
+                self._dataframe_cache.clear()
 
     def add_animal(self, animal):
         """
         :param animal: An instance of an animal class.
 
         Adds the instance of an animal to the list of animal instances
-        in the cell.
+        in the cell, and marks the cell as active on its island.
         """
-        if animal.__class__.__name__ == "Herbivores":
-            self.herbivore_list.append(animal)
-        elif animal.__class__.__name__ == "Carnivores":
-            self.carnivore_list.append(animal)
+        self.animal_lists[animal.species_code].append(animal)
+        if self.active_cells is not None:
+            self.active_cells.add(self.location)
+        if self._counts is not None:
+            self._counts[animal.species_code] += 1
+            self._dataframe_cache.clear()
 
     def current_fodder(self):
         """
@@ -86,55 +321,78 @@ class Topography:
 
     def breed_all_animals_in_cell(self):
         """
-        Makes all animals in a cell breed
+        Makes all animals in a cell breed, one species after the other
         """
-        self.breed_all_herbivores_in_cell()
-        self.breed_all_carnivores_in_cell()
+        for species in animals.SPECIES_BY_CODE:
+            self.breed_species_in_cell(species)
+
+    def breed_species_in_cell(self, species):
+        """
+        :param species: the species class whose animals shall breed
+
+        Makes all the animals of a species in a cell breed
+        """
+        animal_list = self.animal_lists[species.species_code]
+        number_of_animals = len(animal_list)
+        for animal in copy.copy(animal_list):
+            animal.breed(self, number_of_animals)
 
     def breed_all_herbivores_in_cell(self):
         """
         Makes all herbivore in a cell breed
         """
-        number_of_herbivores = len(self.herbivore_list)
-        herbivore_reference_list = copy.copy(self.herbivore_list)
-        for herbivore in herbivore_reference_list:
-            herbivore.breed(self, number_of_herbivores)
+        self.breed_species_in_cell(animals.SPECIES["Herbivore"])
 
     def breed_all_carnivores_in_cell(self):
         """
-        Makes all herbivore in a cell breed
+        Makes all carnivores in a cell breed
         """
-        number_of_carnivores = len(self.carnivore_list)
-        carnivore_reference_list = copy.copy(self.carnivore_list)
-        for carnivore in carnivore_reference_list:
-            carnivore.breed(self, number_of_carnivores)
+        self.breed_species_in_cell(animals.SPECIES["Carnivore"])
 
     def natural_death_all_animals_in_cell(self):
         """
-        All animals which will die a natual death in a cell are removed  
+        All animals which will die a natual death in a cell are removed,
+        one species after the other
         """
-        self.natural_death_all_herbivores_in_cell()
-        self.natural_death_all_carnivores_in_cell()
+        for species in animals.SPECIES_BY_CODE:
+            self.natural_death_species_in_cell(species)
+
+    def natural_death_species_in_cell(self, species):
+        """
+        :param species: the species class whose animals may die
+
+        All the animals of a species which will die a natural death in a
+        cell are removed
+        """
+        for animal in copy.copy(self.animal_lists[species.species_code]):
+            if animal.will_die_natural_death():
+                self.remove_animal(animal)
+                animals.Animals.instances.remove(animal)
+                if self.event_log is not None:
+                    self.event_log.record(event_log.NATURAL_DEATH, animal,
+                                          self.location)
 
     def natural_death_all_carnivores_in_cell(self):
         """
-        All herbivores which will die a natual death  in a cell are removed
+        All carnivores which will die a natual death in a cell are removed
         """
-        carnivores_reference_list = copy.copy(self.carnivore_list)
-        for carnivore in carnivores_reference_list:
-            if carnivore.will_die_natural_death():
-                self.remove_animal(carnivore)
-                animals.Animals.instances.remove(carnivore)
+        self.natural_death_species_in_cell(animals.SPECIES["Carnivore"])
 
     def natural_death_all_herbivores_in_cell(self):
         """
-        All carnivores for which will die natual death in a cell are removed
+        All herbivores which will die natual death in a cell are removed
         """
-        herbivores_reference_list = copy.copy(self.herbivore_list)
-        for herbivore in herbivores_reference_list:
-            if herbivore.will_die_natural_death():
-                self.remove_animal(herbivore)
-                animals.Animals.instances.remove(herbivore)
+        self.natural_death_species_in_cell(animals.SPECIES["Herbivore"])
+
+    def biomass(self, species):
+        """
+        :param species: the species class to weigh
+        :return: Total biomass of the species in the cell
+        """
+        weight_sum = 0
+        for animal in self.animal_lists[species.species_code]:
+            weight_sum += animal.weight
+        return weight_sum
 
     def biomass_herbivores(self):
         """
@@ -142,10 +400,7 @@ class Topography:
 
         Calculates the biomass to all the herbivores in a cell
         """
-        weight_sum = 0
-        for herbivore in self.herbivore_list:
-            weight_sum += herbivore.weight
-        return weight_sum
+        return self.biomass(animals.SPECIES["Herbivore"])
 
     def biomass_carnivores(self):
         """
@@ -153,117 +408,168 @@ class Topography:
 
         Calculates the biomass to all the carnivores in a cell
         """
-        weight_sum = 0
-        for carnivore in self.carnivore_list:
-            weight_sum += carnivore.weight
-        return weight_sum
+        return self.biomass(animals.SPECIES["Carnivore"])
 
-    def feed_herbivores_in_cell(self):
+    def graze_in_cell(self, species):
         """
-        Makes all the herbivores in a cell try to graze
+        :param species: the grazing species class
+        :return: list with the fitness of every animal of the species in the
+            cell after grazing, in the order of its animal list
+
+        Makes all the animals of a grazing species in a cell try to graze,
+        the fittest first. The fitness of every animal is computed once for
+        the ordering, and again only for the animals which have eaten, so
+        the list can be reused by the hunt.
         """
-        herbivore_fitness_sort = sorted(
-            self.herbivore_list, key=lambda herbi: herbi.fitness, reverse=True)
-        for herbivore in herbivore_fitness_sort:
-            if self.fodder <= 0:
+        grazers = self.animal_lists[species.species_code]
+        fitness = [animal.fitness for animal in grazers]
+        order = sorted(range(len(grazers)), key=fitness.__getitem__,
+                       reverse=True)
+        appetite = species.parameters.constants.F
+        fodder = self.fodder
+        for position in order:
+            if fodder <= 0:
                 break
-            herbivore.graze(self)
+            animal = grazers[position]
+            if appetite <= fodder:
+                fodder -= appetite
+                animal._eat_increase_weight(appetite)
+            else:
+                animal._eat_increase_weight(fodder)
+                fodder = 0.0
+            fitness[position] = animal.fitness
+        self.fodder = fodder
+        return fitness
+
+    def feed_herbivores_in_cell(self):
+        """
+        :return: list with the fitness of every herbivore in the cell after
+            grazing, in the order of herbivore_list
 
-    def feed_carnivores_in_cell(self):
+        Makes all the herbivores in a cell try to graze, see graze_in_cell.
         """
+        return self.graze_in_cell(animals.SPECIES["Herbivore"])
+
+    def feed_carnivores_in_cell(self, herbivore_fitness=None):
+        """
+        :param herbivore_fitness: list with the current fitness of every
+            herbivore in the order of herbivore_list, as returned by
+            feed_herbivores_in_cell, or None to compute it
+
         Makes all the carnivore in a cell try to kill a herbivore. First the
         most fit carnivore tries to kill the least fit herbivore and so on,
         until it have reached it yearly eat-limit. Then its the second fittest
-        carnivores turn, etc.
-        """
-        herbivore_fitness_sort = sorted(
-            self.herbivore_list, key=lambda herbi: herbi.fitness)
-        carnivore_fitness_sort = sorted(
-            self.carnivore_list, key=lambda carni: carni.fitness, reverse=True)
-        for carnivore in carnivore_fitness_sort:
-            for herbivore in herbivore_fitness_sort:
-                if carnivore.kills_herbivore(herbivore):
-                    herbivore_fitness_sort.remove(herbivore)
-                    self.remove_animal(herbivore)
-                    animals.Animals.instances.remove(herbivore)
-            carnivore.reset_amount_eaten_this_year()
+        carnivores turn, etc. See feed_carnivores_in_cells.
+        """
+        feed_carnivores_in_cells([self], [herbivore_fitness])
 
     def ek_for_cell(self, species):
         """
-        :param species: What species to calculate ek for.
-        :return: herbivore_ek or carnivore_ek as a float.
+        :param species: What species to calculate ek for, as a species
+            class, species name or class name.
+        :return: the ek of the species as a float.
 
-        Calculates the relative amount of relevant fodder (ek) for the
-        carnivores and the herbivores.
+        Calculates the relative amount of relevant fodder (ek) for a
+        species: the fodder for grazing species and the biomass of its prey
+        for hunting species.
         """
-        if species == "Carnivores":
-            return self.biomass_herbivores() / (
-                        (len(self.carnivore_list) + 1
-                         ) * animals.Carnivores.parameters["F"])
-        elif species == "Herbivores":
-            return self.current_fodder() / (
-                        (len(self.herbivore_list) + 1
-                         ) * animals.Herbivores.parameters["F"])
+        species = animals.species_of(species)
+        if species.prey is None:
+            food = self.current_fodder()
+        else:
+            food = self.biomass(animals.SPECIES[species.prey])
+        return food / ((len(self.animal_lists[species.species_code]) + 1) *
+                       species.parameters.constants.F)
 
     def _migrate_all_herbivores_in_cell(self, island, current_cell,
-                                        herbivore_ek):
+                                        herbivore_ek, herbivores=None):
         """
         :param island: Instance of the island the animal is on
         :param current_cell: tuple, the location (x,y) of the animal
         :param herbivore_ek: dict with ek for all cells
+        :param herbivores: list of the herbivores which shall try to migrate,
+            defaults to all the herbivores in the cell
+        :return: int, the number of herbivores which left the cell
 
         Migrate all the herbivores who haven't already tried to migrate
-        this year.
-        """
-        for herbivore in self.herbivore_list:
-            if not herbivore.has_tried_migration_this_year:
-                new_location = herbivore.what_cell_to_migrate_to(current_cell,
-                                                                 herbivore_ek)
-                if new_location != current_cell:
-                    self.remove_animal(herbivore)
-                    island.raster_model[new_location].add_animal(herbivore)
+        this year. The migration phase passes the herbivores which were in
+        the cell before any animal moved, so animals arriving from other
+        cells do not try again.
+        """
+        if herbivores is None:
+            herbivores = copy.copy(self.herbivore_list)
+        migrations = 0
+        for herbivore in herbivores:
+            new_location = herbivore.what_cell_to_migrate_to(current_cell,
+                                                             herbivore_ek)
+            if new_location != current_cell:
+                self.remove_animal(herbivore)
+                island.raster_model[new_location].add_animal(herbivore)
+                migrations += 1
+                if self.event_log is not None:
+                    self.event_log.record(event_log.MIGRATION, herbivore,
+                                          new_location)
+        return migrations
 
     def _migrate_all_carnivores_in_cell(self, island, current_cell,
-                                        carnivore_ek):
+                                        carnivore_ek, carnivores=None):
         """
         :param island: Class
         :param current_cell: tuple, the location (x,y) of the animal
         :param carnivore_ek: Int
+        :param carnivores: list of the carnivores which shall try to migrate,
+            defaults to all the carnivores in the cell
+        :return: int, the number of carnivores which left the cell
 
         Migrate all the carnivores which dosent already have tried to migrate
         this year.
         """
-        for carnivore in self.carnivore_list:
-            if not carnivore.has_tried_migration_this_year:
-                new_location = carnivore.what_cell_to_migrate_to(current_cell,
-                                                                 carnivore_ek)
-                if new_location != current_cell:
-                    self.remove_animal(carnivore)
-                    island.raster_model[new_location].add_animal(carnivore)
+        if carnivores is None:
+            carnivores = copy.copy(self.carnivore_list)
+        migrations = 0
+        for carnivore in carnivores:
+            new_location = carnivore.what_cell_to_migrate_to(current_cell,
+                                                             carnivore_ek)
+            if new_location != current_cell:
+                self.remove_animal(carnivore)
+                island.raster_model[new_location].add_animal(carnivore)
+                migrations += 1
+                if self.event_log is not None:
+                    self.event_log.record(event_log.MIGRATION, carnivore,
+                                          new_location)
+        return migrations
 
     def migrate_all_animals_in_cell(self, island, current_cell, carnivore_ek,
-                                    herbivore_ek):
+                                    herbivore_ek, herbivores=None,
+                                    carnivores=None):
         """
         :param island: Class
         :param current_cell: tuple, the location (x,y) of the animal
         :param carnivore_ek: Int
         :param herbivore_ek: Int
+        :param herbivores: list of the herbivores which shall try to migrate
+        :param carnivores: list of the carnivores which shall try to migrate
+        :return: int, the number of animals which left the cell
 
         Migrate all the animals which dosent already have tried to migrate
         this year.
         """
-        self._migrate_all_herbivores_in_cell(island, current_cell,
-                                             herbivore_ek)
-        self._migrate_all_carnivores_in_cell(island, current_cell,
-                                             carnivore_ek)
+        return self._migrate_all_herbivores_in_cell(
+            island, current_cell, herbivore_ek, herbivores) + \
+            self._migrate_all_carnivores_in_cell(
+                island, current_cell, carnivore_ek, carnivores)
 
 
+@register_landscape
 class Jungle(Topography):
     """
     Construct the active subclass Jungle, where the primary production are
     large enough to restore it amount of foder to f_max each year.
     """
-    parameters = {"f_max": 800}
+    landscape_code = "J"
+    produces_fodder = True
+    parameters = Parameters({"f_max": 800},
+                            before_change=FodderStore.catch_up_all)
 
     def __init__(self):
         """The constructor for the Jungle subclass, sets the initial fodder based
@@ -279,15 +585,16 @@ class Jungle(Topography):
             change preexisting parameters only.
 
         Sets the parameters of all Jungle instances to the provided
-        new_parameters.
+        new_parameters, once all are checked. The regrowth owed to the cells
+        is done first, with the old parameters.
         """
         for parameter, value in new_parameters.items():
             if parameter in cls.parameters.keys():
                 if value < 0:
                     raise ValueError(f"{parameter} value must be positive")
-                cls.parameters[parameter] = value
             else:
                 raise ValueError(f"{parameter} is not an accepted parameter")
+        cls.parameters.update(new_parameters)
 
     def increase_fodder(self):
         """
@@ -295,14 +602,31 @@ class Jungle(Topography):
         """
         self.fodder = self.parameters["f_max"]
 
+    @classmethod
+    def regrow_fodder(cls, fodder, years=1):
+        """
+        :param fodder: numpy array with the fodder of Jungle cells
+        :param years: int or numpy array, the number of years of regrowth,
+            at least one
+        :return: numpy array with the fodder after the years of regrowth
+
+        Regrows the fodder of many Jungle cells at once, which are full
+        after any number of years
+        """
+        return np.full_like(fodder, cls.parameters.constants.f_max)
+
 
+@register_landscape
 class Savanna(Topography):
     """
     Construct the active subclass 'Savanna'.
     The fodder produced in this topography class has a lower growth rate than
     the jungle and is therefore vulnerable for overgrazing"
     """
-    parameters = {"f_max": 300, "alpha": 0.3}
+    landscape_code = "S"
+    produces_fodder = True
+    parameters = Parameters({"f_max": 300, "alpha": 0.3},
+                            before_change=FodderStore.catch_up_all)
 
     def __init__(self):
         """The constructor for the Savanna subclass, sets the initial fodder based
@@ -318,15 +642,16 @@ class Savanna(Topography):
             change preexisting parameters only.
 
         Sets the parameters of all Savanna instances to the provided
-        new_parameters.
+        new_parameters, once all are checked. The regrowth owed to the cells
+        is done first, with the old parameters.
         """
         for parameter, value in new_parameters.items():
             if parameter in cls.parameters.keys():
                 if value < 0:
                     raise ValueError(f"{parameter} value must be positive")
-                cls.parameters[parameter] = value
             else:
                 raise ValueError(f"{parameter} is not an accepted parameter")
+        cls.parameters.update(new_parameters)
 
     def increase_fodder(self):
         """
@@ -335,28 +660,58 @@ class Savanna(Topography):
         self.fodder += self.parameters["alpha"] * (self.parameters["f_max"]
                                                    - self.fodder)
 
+    @classmethod
+    def regrow_fodder(cls, fodder, years=1):
+        """
+        :param fodder: numpy array with the fodder of Savanna cells
+        :param years: int or numpy array, the number of years of regrowth
+        :return: numpy array with the fodder after the years of regrowth
+
+        Regrows the fodder of many Savanna cells at once, with the closed
+        form f_max - (f_max - fodder) * (1 - alpha)^years of the yearly
+        regrowth
+        """
+        constants = cls.parameters.constants
+        return constants.f_max - (constants.f_max - fodder) * \
+            (1 - constants.alpha) ** years
 
+
+@register_landscape
 class Desert(Topography):
     """
     Construct the active subclass 'Desert', where the primary production = 0.
     Movement and breeding for all animals is allowed.
     """
+    landscape_code = "D"
+
     def __init__(self):
         super().__init__()
         self.fodder = 0
 
 
+@register_landscape
 class Mountain:
     """Construct the passive and non accessible class 'Mountain'
     """
+    landscape_code = "M"
+    produces_fodder = False
+    event_log = None
+    parameters = None
+
     def __init__(self):
         self.is_accessible = False
 
 
+@register_landscape
 class Ocean:
     """
     Construct the passive and non accessible class 'Ocean',
     witch surrounds the island
     """
+    landscape_code = "O"
+    produces_fodder = False
+    event_log = None
+    parameters = None
+
     def __init__(self):
         self.is_accessible = False
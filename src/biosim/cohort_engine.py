@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cohort engine for the island.
+
+For very large populations the animals are not simulated one by one, but
+in cohorts: all animals of a species in a cell with the same age and about
+the same weight are kept as one row with a count. Grazing shares the fodder
+between the cohorts, while death, breeding and migration draw the number of
+animals affected in every cohort from binomial distributions with the
+probabilities of the individual rules. The cost of a year therefore grows
+with the number of cohorts rather than the number of animals.
+
+The engine is an approximation: the animals of a cohort share one weight,
+so the spread of weights within a cohort is lost, and newborn weights are
+drawn from a few fixed points of the birth weight distribution.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.array_engine import ArrayIsland
+from biosim.animals import SPECIES, SPECIES_BY_CODE, Herbivores, Carnivores
+from biosim import kernels
+import numpy as np
+
+
+def _binomial(count, probability):
+    """
+    :param count: int array with the number of animals of every cohort
+    :param probability: array with the probability for every animal
+    :return: int array with the number of animals of every cohort drawn,
+        from the seeded random numbers of the kernels
+    """
+    drawn = np.empty(len(count), dtype=np.int64)
+    kernels.binomial(count, np.asarray(probability, dtype=np.float64), drawn)
+    return drawn
+
+
+class CohortStore:
+    """
+    The cohorts of an island as one array per attribute, with one row per
+    cohort.
+    """
+    fields = ("species", "age", "weight", "cell", "count")
+
+    def __init__(self):
+        """
+        Constructor for the CohortStore class, creating an empty store
+        """
+        self.species = np.zeros(0, dtype=np.int64)
+        self.age = np.zeros(0, dtype=np.int64)
+        self.weight = np.zeros(0, dtype=np.float64)
+        self.cell = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.species)
+
+    @property
+    def num_animals(self):
+        """Total number of animals in the cohorts"""
+        return int(self.count.sum())
+
+    def add(self, species, age, weight, cell, count=None):
+        """
+        :param species: array with the species code of the new cohorts
+        :param age: array with their ages
+        :param weight: array with the weight of their animals
+        :param cell: array with their flat cell indices
+        :param count: array with their number of animals, one each if None
+
+        Appends cohorts to the store.
+        """
+        if count is None:
+            count = np.ones(len(species), dtype=np.int64)
+        new_columns = {"species": species, "age": age, "weight": weight,
+                       "cell": cell, "count": count}
+        for field in self.fields:
+            column = getattr(self, field)
+            setattr(self, field, np.concatenate(
+                [column, np.asarray(new_columns[field], dtype=column.dtype)]))
+
+    def remove(self, mask):
+        """
+        :param mask: boolean array, True for the cohorts to remove
+        """
+        keep = ~mask
+        for field in self.fields:
+            setattr(self, field, getattr(self, field)[keep])
+
+    def of_species(self, species_code):
+        """
+        :param species_code: int, the species code
+        :return: array with the rows of the cohorts of the species
+        """
+        return np.flatnonzero(self.species == species_code)
+
+    def merge(self, weight_resolution):
+        """
+        :param weight_resolution: float, the relative width of the weight
+            bins
+
+        Drops the empty cohorts and merges the cohorts with the same
+        species, cell, age and weight bin into one, with the mean weight of
+        their animals. The weight bins are spaced logarithmically, so the
+        weights within a bin differ by at most the resolution.
+        """
+        self.remove(self.count == 0)
+        if len(self) == 0:
+            return
+        weight_bin = np.floor(
+            np.log(np.maximum(self.weight, np.finfo(float).tiny)) /
+            np.log1p(weight_resolution)).astype(np.int64)
+        order = np.lexsort((weight_bin, self.age, self.cell, self.species))
+        keys = np.stack([self.species[order], self.cell[order],
+                         self.age[order], weight_bin[order]])
+        starts = np.flatnonzero(np.concatenate(
+            [[True], (np.diff(keys, axis=1) != 0).any(axis=0)]))
+        count = self.count[order]
+        biomass = np.add.reduceat(self.weight[order] * count, starts)
+        self.count = np.add.reduceat(count, starts)
+        self.weight = biomass / self.count
+        self.species = keys[0, starts]
+        self.cell = keys[1, starts]
+        self.age = keys[2, starts]
+
+
+class CohortIsland(ArrayIsland):
+    """
+    Island running an approximate annual cycle on a CohortStore. The
+    reporting methods of Island work as before, counting every cohort with
+    its number of animals.
+    """
+    weight_resolution = 0.05
+    birth_weight_nodes = 7
+
+    def __init__(self, island_map, seed=None):
+        """
+        :param island_map: multi-line string specifying island geography
+        :param seed: int, seed for the random numbers of the engine, drawn
+            from the random module if None
+
+        Constructor for the CohortIsland class
+        """
+        super().__init__(island_map, seed)
+        self.store = CohortStore()
+
+    def populate_island(self, population_list):
+        """
+        :param population_list: list of dictionary {(x,y): instance}
+
+        Adds the animals as cohorts of one, with the same checks as
+        Island.populate_island, and merges them into the existing cohorts.
+        """
+        super().populate_island(population_list)
+        self.store.merge(self.weight_resolution)
+
+    def _cell_counts(self):
+        """
+        :return: array with the number of animals of every species in every
+            cell, indexed by species code * number of cells + flat cell index
+        """
+        store = self.store
+        return np.bincount(store.species * self.num_cells + store.cell,
+                           weights=store.count,
+                           minlength=len(SPECIES_BY_CODE) * self.num_cells
+                           ).astype(np.int64)
+
+    def _update_density_grids(self):
+        """
+        Counts the animals of each species in every cell with one bincount
+        over the cohorts.
+        """
+        self._density_stale = False
+        self._dataframe_cache.clear()
+        self._density[...] = self._cell_counts().reshape(self._density.shape)
+
+    def enable_event_log(self, path=None, buffer_size=65536):
+        """
+        The cohorts do not follow individual animals, so there are no
+        events of single animals to record.
+        """
+        raise ValueError("The event log is not available with the cohort "
+                         "engine, which does not follow individual animals")
+
+    def _feed_all_animals(self):
+        """
+        Lets the herbivores graze and then the carnivores hunt.
+
+        In every cell, each herbivore cohort in order of decreasing fitness
+        eats the appetite of all its animals, or what is left in the cell.
+        """
+        store = self.store
+        herbivores = store.of_species(Herbivores.species_code)
+        grazing = herbivores[self._fodder_index[store.cell[herbivores]] >= 0]
+        appetite = self._species_parameter("F")[Herbivores.species_code]
+        if len(grazing):
+            fitness = self._fitness(grazing)
+            order = grazing[np.lexsort((-fitness, store.cell[grazing]))]
+            cells = store.cell[order]
+            demand = appetite * store.count[order]
+            eaten_before = np.cumsum(demand) - demand
+            first = np.concatenate([[True], cells[1:] != cells[:-1]])
+            segment = np.cumsum(first) - 1
+            eaten_before -= eaten_before[first][segment]
+            fodder_index = self._fodder_index[cells]
+            fodder = self._fodder
+            eaten = np.clip(fodder[fodder_index] - eaten_before, 0, demand)
+            fodder -= np.bincount(fodder_index, weights=eaten,
+                                  minlength=len(fodder))
+            self._share_food(
+                order, eaten, appetite,
+                self._species_parameter("beta")[Herbivores.species_code])
+        self._hunt()
+
+    def _share_food(self, rows, eaten, appetite, beta):
+        """
+        :param rows: array with the rows of the cohorts which have eaten
+        :param eaten: array with the food eaten by each of the cohorts
+        :param appetite: float, the 'F' of the species
+        :param beta: float, the 'beta' of the species
+
+        Shares the food of every cohort as if its animals ate one at a time:
+        the cohort is split into the animals eating their appetite, one
+        animal eating the rest and the animals left without food. Food
+        beyond the appetite of the whole cohort is shared equally.
+        """
+        store = self.store
+        count = store.count[rows]
+        weight = store.weight[rows]
+        full = np.minimum(count, np.floor(eaten / appetite).astype(np.int64))
+        rest = eaten - full * appetite
+        partial = (rest > 0) & (full < count)
+        hungry = count - full - partial
+        gain = np.where(full == count,
+                        eaten / np.maximum(count, 1), appetite) * beta
+        store.count[rows] = full
+        store.weight[rows] = weight + gain
+        for mask, new_weight, new_count in (
+                (partial, weight + beta * rest, np.ones(len(rows))),
+                (hungry > 0, weight, hungry)):
+            store.add(store.species[rows][mask], store.age[rows][mask],
+                      new_weight[mask], store.cell[rows][mask],
+                      new_count[mask])
+        store.remove(store.count == 0)
+
+    def _hunt(self):
+        """
+        Lets the carnivore cohorts hunt in every cell with both species,
+        with the cells found as segments of the cohorts sorted by cell and
+        fitness. The weights of the cohorts are copied for the hunt, which
+        only uses them for the fitness, and the prey is shared out
+        afterwards.
+        """
+        self._density_stale = True
+        store = self.store
+        herbivores = store.of_species(Herbivores.species_code)
+        carnivores = store.of_species(Carnivores.species_code)
+        if len(herbivores) == 0 or len(carnivores) == 0:
+            return
+        herbivore_fitness = self._fitness(herbivores)
+        herbivore_order = np.lexsort((herbivore_fitness,
+                                      store.cell[herbivores]))
+        herbivores = herbivores[herbivore_order]
+        herbivore_fitness = herbivore_fitness[herbivore_order]
+        carnivore_fitness = self._fitness(carnivores)
+        carnivores = carnivores[np.lexsort((-carnivore_fitness,
+                                            store.cell[carnivores]))]
+        herbivore_cells = store.cell[herbivores]
+        carnivore_cells = store.cell[carnivores]
+        cells = np.intersect1d(herbivore_cells, carnivore_cells)
+        eaten = np.zeros(len(store))
+        hunter = Carnivores.species_code
+        parameter = self._species_parameter
+        kernels.hunt_cohorts(
+            herbivores, herbivore_fitness,
+            np.searchsorted(herbivore_cells, cells, side="left"),
+            np.searchsorted(herbivore_cells, cells, side="right"),
+            carnivores,
+            np.searchsorted(carnivore_cells, cells, side="left"),
+            np.searchsorted(carnivore_cells, cells, side="right"),
+            store.age, store.weight.copy(), store.count, eaten,
+            parameter("F")[hunter], parameter("beta")[hunter],
+            parameter("DeltaPhiMax")[hunter], parameter("phi_age")[hunter],
+            parameter("a_half")[hunter], parameter("phi_weight")[hunter],
+            parameter("w_half")[hunter])
+        self._share_food(carnivores, eaten[carnivores],
+                         parameter("F")[hunter], parameter("beta")[hunter])
+
+    def _breed_in_all_cells(self):
+        """
+        Draws the number of mothers in every cohort, with the breeding
+        probability of Animals.breed and the number of animals of the
+        species in the cell counted before anyone is born.
+
+        The birth weight is drawn from the Gauss-Hermite points of the
+        normal birth weight distribution, so the births of a cohort are
+        split between the points with one binomial draw per point. A birth
+        fails as in Animals.breed when the mother weighs less than xi times
+        the birth weight. The mothers of every point and the newborns
+        become new cohorts.
+        """
+        self._density_stale = True
+        store = self.store
+        if len(store) == 0:
+            return
+        species = store.species
+        cell_population = self._cell_counts()[species * self.num_cells +
+                                              store.cell]
+        w_birth = self._species_parameter("w_birth")[species]
+        sigma_birth = self._species_parameter("sigma_birth")[species]
+        xi = self._species_parameter("xi")[species]
+        probability = np.minimum(
+            1, self._species_parameter("gamma")[species] * self._fitness() *
+            (cell_population - 1))
+        probability[store.weight < self._species_parameter(
+            "breeding_threshold")[species]] = 0
+        points, point_weights = np.polynomial.hermite_e.hermegauss(
+            self.birth_weight_nodes)
+        point_weights /= point_weights.sum()
+        remaining = store.count.copy()
+        probability_left = np.ones(len(store))
+        new_cohorts = []
+        for point, point_weight in zip(points, point_weights):
+            birth_weight = w_birth + sigma_birth * point
+            point_probability = probability * point_weight
+            possible = xi * birth_weight <= store.weight
+            conditional = np.divide(
+                point_probability * possible, probability_left,
+                out=np.zeros(len(store)), where=probability_left > 0)
+            births = _binomial(remaining, np.clip(conditional, 0, 1))
+            remaining -= births
+            probability_left -= point_probability
+            mothers = np.flatnonzero(births)
+            new_cohorts.append((species[mothers], store.age[mothers],
+                                store.weight[mothers] -
+                                xi[mothers] * birth_weight[mothers],
+                                store.cell[mothers], births[mothers]))
+            new_cohorts.append((species[mothers],
+                                np.zeros(len(mothers), dtype=np.int64),
+                                birth_weight[mothers], store.cell[mothers],
+                                births[mothers]))
+        store.count = remaining
+        for cohorts in new_cohorts:
+            store.add(*cohorts)
+        store.merge(self.weight_resolution)
+
+    def _migrate_all_cells(self):
+        """
+        :return: int, the number of animals which moved to another cell
+
+        Draws the number of animals of every cohort trying to migrate, and
+        splits them between the accessible neighbours with probabilities
+        proportional to their ek, by the rules of
+        Animals.what_cell_to_migrate_to.
+        """
+        self._density_stale = True
+        store = self.store
+        if len(store) == 0:
+            return 0
+        species = store.species
+        herbivores = species == Herbivores.species_code
+        herbivore_biomass = np.bincount(
+            store.cell[herbivores],
+            weights=store.weight[herbivores] * store.count[herbivores],
+            minlength=self.num_cells)
+        ek = self._ek(self._cell_counts().reshape(len(SPECIES_BY_CODE),
+                                                  self.num_cells),
+                      herbivore_biomass)
+        targets = store.cell[:, np.newaxis] + self._neighbours
+        target_ek = ek[species[:, np.newaxis], targets] * \
+            self._accessible_flat[targets]
+        total_ek = target_ek.sum(axis=1)
+        movers = _binomial(store.count, np.clip(
+            self._species_parameter("mu")[species] * self._fitness(), 0, 1))
+        movers[total_ek == 0] = 0
+        target_probability = np.divide(
+            target_ek, total_ek[:, np.newaxis], out=np.zeros(target_ek.shape),
+            where=total_ek[:, np.newaxis] > 0)
+        remaining = movers.copy()
+        probability_left = np.ones(len(store))
+        new_cohorts = []
+        for direction in range(len(self._neighbours)):
+            conditional = np.divide(
+                target_probability[:, direction], probability_left,
+                out=np.zeros(len(store)), where=probability_left > 0)
+            moved = _binomial(remaining, np.clip(conditional, 0, 1))
+            remaining -= moved
+            probability_left -= target_probability[:, direction]
+            arriving = np.flatnonzero(moved)
+            new_cohorts.append((species[arriving], store.age[arriving],
+                                store.weight[arriving],
+                                targets[arriving, direction],
+                                moved[arriving]))
+        store.count = store.count - movers + remaining
+        for cohorts in new_cohorts:
+            store.add(*cohorts)
+        return int(movers.sum() - remaining.sum())
+
+    def _annual_death_all_cells(self):
+        """
+        Draws the number of animals dying a natural death in every cohort,
+        by the rules of Animals.will_die_natural_death, and merges the
+        cohorts which have come together during the year.
+        """
+        self._density_stale = True
+        store = self.store
+        if len(store) == 0:
+            return
+        fitness = self._fitness()
+        probability = np.clip(
+            self._species_parameter("omega")[store.species] * (1 - fitness),
+            0, 1)
+        probability[fitness == 0] = 1
+        store.count = store.count - _binomial(store.count, probability)
+        store.merge(self.weight_resolution)
+
+    def _num_animals(self):
+        """
+        :return: int, the number of living animals
+        """
+        return self.store.num_animals
+
+    def total_number_per_species(self):
+        """
+        :return: dict {species: individuals}
+        """
+        counts = np.bincount(self.store.species, weights=self.store.count,
+                             minlength=len(SPECIES_BY_CODE))
+        return {species.species_name: int(count)
+                for species, count in zip(SPECIES_BY_CODE, counts)}
+
+    def _species_age_and_weight(self, species_code):
+        """
+        :param species_code: int, the species code of the animals
+        :return: two numpy arrays with the ages and weights of all animals of
+            the species on the island, with every cohort repeated by its
+            number of animals
+        """
+        rows = self.store.of_species(species_code)
+        count = self.store.count[rows]
+        return np.repeat(self.store.age[rows], count), \
+            np.repeat(self.store.weight[rows], count)
+
+    def age_group_statistics(self, species, edges=None):
+        """
+        :param species: String, name of the species, e.g. 'Herbivore'
+        :param edges: increasing sequence of ages where a new age group
+            starts, defaults to age_group_edges
+        :return: two numpy arrays with the number of animals and their total
+            biomass in each age group
+
+        Sorts the cohorts into the age groups like Island, counting every
+        cohort with its number of animals.
+        """
+        if edges is None:
+            edges = self.age_group_edges
+        store = self.store
+        rows = store.of_species(SPECIES[species].species_code)
+        groups = np.digitize(store.age[rows], edges)
+        numbers = np.bincount(groups, weights=store.count[rows],
+                              minlength=len(edges) + 1).astype(np.int64)
+        biomass = np.bincount(groups,
+                              weights=store.weight[rows] * store.count[rows],
+                              minlength=len(edges) + 1)
+        return numbers, biomass
+
+    def biomass_food_chain(self):
+        """
+        :return: dictionary, biomass info for fodder, herbivores and carnivores
+        """
+        biomass = self.species_biomass()
+        return {"biomass_fodder": self._fodder.sum(),
+                "biomass_herbs": biomass[Herbivores.species_code],
+                "biomass_carnivores": biomass[Carnivores.species_code]}
+
+    def species_biomass(self):
+        """
+        :return: array with the total weight of the animals of every
+            species, indexed by species code
+        """
+        store = self.store
+        return np.bincount(store.species, weights=store.weight * store.count,
+                           minlength=len(SPECIES_BY_CODE))
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Recording of the individual events of a simulation.
+
+Every event is stored as a fixed width record of the numpy structured type
+EVENT_DTYPE (30 bytes):
+
+=========== ============================================================
+year        the year of the event
+event       event type code, the index in EVENT_TYPES
+species     species code of the animal
+row, col    the cell of the event, for migrations the cell moved to
+animal_id   id of the animal, for births the newborn, for kills the killer
+other_id    id of the parent for births, of the victim for kills, else -1
+weight      weight of the animal, for kills the weight of the victim
+=========== ============================================================
+
+Records are collected in a buffer which is written to a binary file, or
+kept in memory, when full. A file can be read back with read_event_log.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import numpy as np
+
+EVENT_TYPES = ("birth", "natural_death", "kill", "migration")
+BIRTH, NATURAL_DEATH, KILL, MIGRATION = range(len(EVENT_TYPES))
+
+EVENT_DTYPE = np.dtype([("year", "<u4"),
+                        ("event", "u1"),
+                        ("species", "u1"),
+                        ("row", "<u2"),
+                        ("col", "<u2"),
+                        ("animal_id", "<i8"),
+                        ("other_id", "<i8"),
+                        ("weight", "<f4")])
+
+
+def read_event_log(path):
+    """
+    :param path: String, path of a file written by an EventLog
+    :return: numpy structured array with the records of the file
+    """
+    return np.fromfile(path, dtype=EVENT_DTYPE)
+
+
+class EventLog:
+    """
+    Buffered recorder of births, natural deaths, kills and migrations.
+    """
+
+    def __init__(self, path=None, buffer_size=65536):
+        """
+        :param path: String, path of the binary file the records are written
+            to, or None to keep the records in memory
+        :param buffer_size: int, number of records buffered before they are
+            written
+
+        Constructor for the EventLog class
+        """
+        if buffer_size < 1:
+            raise ValueError("The buffer must hold at least one record")
+        self.year = 0
+        self.path = path
+        self._buffer = np.zeros(buffer_size, dtype=EVENT_DTYPE)
+        self._size = 0
+        self._written = 0
+        self._chunks = []
+        self._file = open(path, "wb") if path is not None else None
+
+    def __len__(self):
+        return self._written + self._size
+
+    def record(self, event, animal, location, other_id=-1, weight=None):
+        """
+        :param event: int, event type code
+        :param animal: the animal the event happened to
+        :param location: tuple, the cell of the event
+        :param other_id: int, id of the parent or victim, -1 if none
+        :param weight: float, weight to record, defaults to the weight of
+            the animal
+
+        Adds a record to the buffer, writing the buffer out when it is full.
+        """
+        if weight is None:
+            weight = animal.weight
+        self._buffer[self._size] = (self.year, event, animal.species_code,
+                                    location[0], location[1], animal.id,
+                                    other_id, weight)
+        self._size += 1
+        if self._size == len(self._buffer):
+            self.flush()
+
+    def record_many(self, event, species, rows, cols, animal_ids, weights,
+                    other_ids=-1):
+        """
+        :param event: int, event type code
+        :param species: array with the species code of every animal
+        :param rows: array with the row of the cell of every event
+        :param cols: array with the column of the cell of every event
+        :param animal_ids: array with the id of every animal
+        :param weights: array with the weight to record for every event
+        :param other_ids: array with the id of the parent or victim of every
+            event, or -1 for none
+
+        Adds one record per animal to the buffer, as record does for a
+        single animal, for the engines which keep their animals in arrays.
+        """
+        columns = {"species": species, "row": rows, "col": cols,
+                   "animal_id": animal_ids, "other_id": other_ids,
+                   "weight": weights}
+        count = len(animal_ids)
+        start = 0
+        while start < count:
+            stop = min(count, start + len(self._buffer) - self._size)
+            records = self._buffer[self._size:self._size + stop - start]
+            records["year"] = self.year
+            records["event"] = event
+            for field, values in columns.items():
+                records[field] = values if np.ndim(values) == 0 else \
+                    values[start:stop]
+            self._size += stop - start
+            if self._size == len(self._buffer):
+                self.flush()
+            start = stop
+
+    def flush(self):
+        """
+        Writes the buffered records to the file, or to the in memory store.
+        """
+        if self._size == 0:
+            return
+        records = self._buffer[:self._size]
+        if self._file is None:
+            self._chunks.append(records.copy())
+        else:
+            records.tofile(self._file)
+            self._file.flush()
+        self._written += self._size
+        self._size = 0
+
+    def close(self):
+        """
+        Writes the remaining records and closes the file.
+        """
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+
+    def events(self):
+        """
+        :return: numpy structured array with all records so far, oldest
+            first
+        """
+        self.flush()
+        if self._file is None:
+            if not self._chunks:
+                return np.zeros(0, dtype=EVENT_DTYPE)
+            self._chunks = [np.concatenate(self._chunks)]
+            return self._chunks[0].copy()
+        return read_event_log(self.path)
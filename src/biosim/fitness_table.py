@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Table driven evaluation of the fitness of a species.
+
+The fitness is the product of a sigmoid in the age and a sigmoid in the
+weight. Ages are small integers, so the age term is kept exactly in a table
+with one entry per age. The weight term is kept on a uniform grid of
+weights and interpolated linearly between the grid points. For the weight
+term s(w) = 1 / (1 + exp(-phi_weight (w - w_half))) the error of linear
+interpolation with grid step h is at most
+
+    h^2 / 8 * max |s''(w)| = h^2 phi_weight^2 / (48 sqrt(3)),
+
+and since the age term is at most 1, this also bounds the error of the
+fitness. The grid step is chosen from the tolerance asked for. Ages and
+weights beyond the tables are evaluated with the exact formula.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import math
+import numpy as np
+
+_SECOND_DERIVATIVE_FACTOR = 1 / (6 * math.sqrt(3))
+
+
+class FitnessTable:
+    """
+    Lookup tables for the fitness of one species, rebuilt when its
+    phi_age, a_half, phi_weight or w_half change.
+    """
+
+    def __init__(self, species, tolerance=1e-6, max_age=200):
+        """
+        :param species: the species class, e.g. Herbivores
+        :param tolerance: float, the largest error allowed in the fitness
+        :param max_age: int, the largest age in the age table
+
+        Constructor for the FitnessTable class
+        """
+        if tolerance <= 0:
+            raise ValueError("The tolerance must be positive")
+        self.species = species
+        self.tolerance = tolerance
+        self.max_age = max_age
+        self._version = None
+        self._key = None
+        self._refresh()
+
+    def _refresh(self):
+        """
+        Rebuilds the tables if one of the fitness parameters has changed
+        since they were built
+        """
+        parameters = self.species.parameters
+        if parameters.version == self._version:
+            return
+        self._version = parameters.version
+        constants = parameters.constants
+        key = (constants.phi_age, constants.a_half, constants.phi_weight,
+               constants.w_half)
+        if key != self._key:
+            self._key = key
+            self._build(*key)
+
+    def _build(self, phi_age, a_half, phi_weight, w_half):
+        """
+        Builds the age table and the weight grid for the given parameters
+        """
+        ages = np.arange(self.max_age + 1)
+        with np.errstate(over="ignore"):
+            self._age_array = 1 / (1 + np.exp(phi_age * (ages - a_half)))
+        self._age_terms = self._age_array.tolist()
+        if phi_weight == 0:
+            self.step = 1.0
+            max_weight = 1.0
+        else:
+            self.step = math.sqrt(
+                self.tolerance / _SECOND_DERIVATIVE_FACTOR * 8) / \
+                abs(phi_weight)
+            max_weight = max(w_half, 0) + 40 / abs(phi_weight)
+        self._inverse_step = 1 / self.step
+        grid = np.arange(int(math.ceil(max_weight / self.step)) + 2) * \
+            self.step
+        with np.errstate(over="ignore"):
+            self._weight_array = 1 / (1 + np.exp(-phi_weight *
+                                                 (grid - w_half)))
+        self._weight_terms = self._weight_array.tolist()
+        self._slopes = np.diff(self._weight_array)
+        self._max_weight = (len(self._weight_array) - 1) * self.step
+
+    @property
+    def error_bound(self):
+        """The largest error of the fitness from the tables, from the bound
+        on linear interpolation of the weight term"""
+        self._refresh()
+        return self.step ** 2 / 8 * self._key[2] ** 2 * \
+            _SECOND_DERIVATIVE_FACTOR
+
+    @property
+    def nbytes(self):
+        """The memory used by the tables in bytes"""
+        return self._age_array.nbytes + self._weight_array.nbytes
+
+    def value(self, age, weight):
+        """
+        :param age: int, the age of an animal
+        :param weight: float, the weight of an animal
+        :return: float, the fitness of the animal, 0 if it has no weight
+        """
+        if weight <= 0:
+            return 0
+        if self.species.parameters.version != self._version:
+            self._refresh()
+        if 0 <= age <= self.max_age:
+            age_term = self._age_terms[age]
+        else:
+            age_term = 1 / (1 + math.exp(self._key[0] *
+                                         (age - self._key[1])))
+        position = weight * self._inverse_step
+        index = int(position)
+        if index + 1 < len(self._weight_terms):
+            lower = self._weight_terms[index]
+            return age_term * (lower + (position - index) *
+                               (self._weight_terms[index + 1] - lower))
+        return age_term / (1 + math.exp(-self._key[2] *
+                                        (weight - self._key[3])))
+
+    def evaluate(self, ages, weights):
+        """
+        :param ages: numpy array with the ages of the animals
+        :param weights: numpy array with their weights
+        :return: numpy array with their fitness, 0 for animals without
+            weight
+        """
+        self._refresh()
+        phi_age, a_half, phi_weight, w_half = self._key
+        ages = np.asarray(ages)
+        weights = np.asarray(weights, dtype=float)
+        if len(ages) == 0:
+            return np.zeros(0)
+        age_terms = np.take(self._age_array, ages, mode="clip")
+        if ages.min() < 0 or ages.max() > self.max_age:
+            outside = (ages < 0) | (ages > self.max_age)
+            with np.errstate(over="ignore"):
+                age_terms[outside] = 1 / (1 + np.exp(
+                    phi_age * (ages[outside] - a_half)))
+        position = weights * self._inverse_step
+        index = position.astype(np.int64)
+        np.clip(index, 0, len(self._weight_array) - 2, out=index)
+        position -= index
+        weight_terms = np.take(self._slopes, index)
+        weight_terms *= position
+        weight_terms += np.take(self._weight_array, index)
+        if weights.max() >= self._max_weight:
+            outside = weights >= self._max_weight
+            weight_terms[outside] = 1 / (1 + np.exp(
+                -phi_weight * (weights[outside] - w_half)))
+        age_terms *= weight_terms
+        age_terms[weights <= 0] = 0
+        return age_terms
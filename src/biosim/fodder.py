@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lazy store for the fodder of the fodder producing cells.
+
+The regrowth of a cell only depends on its own fodder, and has a closed
+form over several years, so a cell nobody eats from needs no work until its
+fodder is read. The store counts the years of regrowth owed to the island,
+and remembers for every cell how many of them it has received, catching a
+cell up when its fodder is read or set.
+
+The regrowth is affine in the fodder and the same for every cell of a
+landscape, so the store also keeps the total fodder of the cells of every
+landscape which have not been caught up this year, regrowing it in closed
+form every year. The total of the island is that plus the sum over the few
+cells caught up this year, and is known without catching up any cell.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import weakref
+import numpy as np
+
+
+class FodderStore:
+    """
+    The fodder of a group of cells, with the regrowth of every cell done
+    when it is needed.
+    """
+    _stores = weakref.WeakSet()
+
+    def __init__(self, landscapes):
+        """
+        :param landscapes: list with the landscape class of every cell, each
+            with a regrow_fodder(fodder, years) class method which is affine
+            in the fodder
+
+        Constructor for the FodderStore class, with no fodder in any cell
+        """
+        self._landscapes = list(landscapes)
+        self._values = np.zeros(len(self._landscapes))
+        self._updated = np.zeros(len(self._landscapes), dtype=np.int64)
+        self.year = 0
+        groups = {}
+        for index, landscape in enumerate(self._landscapes):
+            groups.setdefault(landscape, []).append(index)
+        self._groups = [(landscape, np.array(indices))
+                        for landscape, indices in groups.items()]
+        self._group_of = np.zeros(len(self._landscapes), dtype=np.int64)
+        for group, (_, indices) in enumerate(self._groups):
+            self._group_of[indices] = group
+        self._group_sizes = np.array([len(indices)
+                                      for _, indices in self._groups])
+        self._stale_totals = np.zeros(len(self._groups))
+        self._stale_counts = np.zeros(len(self._groups), dtype=np.int64)
+        self._fresh = list(range(len(self._landscapes)))
+        self._array_handed_out = False
+        self._stores.add(self)
+
+    def __len__(self):
+        return len(self._values)
+
+    def regrow(self):
+        """
+        Lets a year of regrowth pass, without visiting any cell. All cells
+        become stale, and the stale total of every landscape grows as
+        n a + b total, where a + b fodder is the regrowth of one cell.
+        """
+        fresh = np.array(self._fresh, dtype=np.int64)
+        totals = self._stale_totals + np.bincount(
+            self._group_of[fresh], weights=self._values[fresh],
+            minlength=len(self._groups))
+        for group, (landscape, _) in enumerate(self._groups):
+            start, step = landscape.regrow_fodder(np.array([0.0, 1.0]))
+            self._stale_totals[group] = self._group_sizes[group] * start + \
+                (step - start) * totals[group]
+        self._stale_counts[:] = self._group_sizes
+        self._fresh = []
+        self.year += 1
+
+    def get(self, index):
+        """
+        :param index: int, the index of a cell
+        :return: float, the fodder of the cell after the regrowth owed to it
+        """
+        if self._updated[index] != self.year:
+            value = self._landscapes[index].regrow_fodder(
+                self._values[index], self.year - self._updated[index])
+            self._values[index] = value
+            self._updated[index] = self.year
+            group = self._group_of[index]
+            self._stale_counts[group] -= 1
+            if self._stale_counts[group]:
+                self._stale_totals[group] -= value
+            else:
+                self._stale_totals[group] = 0.0
+            self._fresh.append(index)
+        return self._values.item(index)
+
+    def set(self, index, amount):
+        """
+        :param index: int, the index of a cell
+        :param amount: float, the new fodder of the cell, which has had all
+            regrowth owed to it
+        """
+        self.get(index)
+        self._values[index] = amount
+
+    def catch_up(self):
+        """
+        Does the regrowth owed to every cell, one vectorized step per
+        landscape type.
+        """
+        for landscape, indices in self._groups:
+            stale = indices[self._updated[indices] != self.year]
+            if len(stale):
+                self._values[stale] = landscape.regrow_fodder(
+                    self._values[stale], self.year - self._updated[stale])
+        self._updated.fill(self.year)
+        self._stale_totals.fill(0.0)
+        self._stale_counts.fill(0)
+        self._fresh = list(range(len(self._values)))
+
+    def array(self):
+        """
+        :return: numpy array with the fodder of every cell, caught up
+
+        The array is the store's own, so changes to it stay until the next
+        year of regrowth. This catches up every cell, and is meant for the
+        array engines, which work on all the cells at once.
+        """
+        self.catch_up()
+        self._array_handed_out = True
+        return self._values
+
+    def total(self):
+        """
+        :return: float, the fodder of all cells, caught up
+
+        The total is the stale total plus the fodder of the cells caught up
+        this year, so no cell is caught up. Once the array has been handed
+        out it may have been changed in place, and the total is then summed
+        from the array instead.
+        """
+        if self._array_handed_out:
+            return float(self.array().sum())
+        return float(self._stale_totals.sum() +
+                     self._values[self._fresh].sum())
+
+    @classmethod
+    def catch_up_all(cls):
+        """
+        Catches up every store in use, so the regrowth of the years before a
+        parameter change is done with the parameters of those years.
+        """
+        for store in list(cls._stores):
+            store.catch_up()
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import numpy as np
+
+
+class _BucketRing:
+    """
+    Fixed size ring buffer of aggregated buckets, each holding the first
+    year, the year after the last, the number of recorded years and the
+    min, mean and max of every series over those years.
+    """
+
+    def __init__(self, capacity, num_series):
+        """
+        :param capacity: int, the maximum number of buckets
+        :param num_series: int, the number of series in every bucket
+
+        Constructor for the _BucketRing class
+        """
+        self.capacity = capacity
+        self.start = np.zeros(capacity, dtype=np.int64)
+        self.stop = np.zeros(capacity, dtype=np.int64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.min = np.zeros((capacity, num_series))
+        self.mean = np.zeros((capacity, num_series))
+        self.max = np.zeros((capacity, num_series))
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def is_full(self):
+        """
+        :return: boolean, True if no more buckets fit in the ring
+        """
+        return self._size == self.capacity
+
+    def push(self, start, stop, count, minimum, mean, maximum):
+        """
+        Adds a bucket after the newest bucket in the ring.
+        """
+        index = (self._head + self._size) % self.capacity
+        self.start[index] = start
+        self.stop[index] = stop
+        self.count[index] = count
+        self.min[index] = minimum
+        self.mean[index] = mean
+        self.max[index] = maximum
+        self._size += 1
+
+    def pop_oldest(self, num_buckets):
+        """
+        :param num_buckets: int, the number of buckets to remove
+        :return: tuple (start, stop, count, min, mean, max) of the removed
+            buckets merged into one
+        """
+        index = (self._head + np.arange(num_buckets)) % self.capacity
+        count = self.count[index]
+        merged = (self.start[index[0]], self.stop[index[-1]], count.sum(),
+                  self.min[index].min(axis=0),
+                  count @ self.mean[index] / count.sum(),
+                  self.max[index].max(axis=0))
+        self._head = (self._head + num_buckets) % self.capacity
+        self._size -= num_buckets
+        return merged
+
+    def ordered(self, array):
+        """
+        :param array: one of the bucket arrays of the ring
+        :return: the filled part of the array, oldest bucket first
+        """
+        return array[(self._head + np.arange(self._size)) % self.capacity]
+
+
+class HistoryStore:
+    """
+    Yearly history of a set of series kept within a fixed memory budget.
+
+    The most recent years are stored at full resolution. Older years are
+    moved into levels of min/mean/max buckets, where every level covers
+    twice as many years per bucket as the level before it, so the
+    resolution decreases with age. When the last level is full, its
+    buckets are merged pairwise.
+    """
+
+    def __init__(self, series, recent_years=1000, buckets_per_level=250,
+                 levels=4):
+        """
+        :param series: list with the names of the recorded series
+        :param recent_years: int, number of years kept at full resolution
+        :param buckets_per_level: int, number of buckets in every level
+        :param levels: int, number of downsampled levels
+
+        Constructor for the HistoryStore class
+        """
+        if recent_years < 2 or buckets_per_level < 2 or levels < 1:
+            raise ValueError("The history needs at least two recent years, "
+                             "two buckets per level and one level")
+        self.series = list(series)
+        self._series_index = {name: index
+                              for index, name in enumerate(self.series)}
+        num_series = len(self.series)
+        self._recent_years = np.zeros(recent_years, dtype=np.int64)
+        self._recent = np.zeros((recent_years, num_series))
+        self._recent_head = 0
+        self._recent_size = 0
+        self._levels = [_BucketRing(buckets_per_level, num_series)
+                        for _ in range(levels)]
+
+        # running totals over every recorded year
+        self.num_years = 0
+        self._sum = np.zeros(num_series)
+        self._min = np.full(num_series, np.inf)
+        self._max = np.full(num_series, -np.inf)
+
+    @property
+    def nbytes(self):
+        """Number of bytes used by the stored arrays, which is fixed when
+        the store is created."""
+        return (self._recent_years.nbytes + self._recent.nbytes +
+                sum(level.start.nbytes + level.stop.nbytes +
+                    level.count.nbytes + level.min.nbytes +
+                    level.mean.nbytes + level.max.nbytes
+                    for level in self._levels))
+
+    def append(self, year, values):
+        """
+        :param year: int, the year of the values
+        :param values: sequence with one value per series
+
+        Records the values of a year, moving the two oldest full resolution
+        years into the downsampled levels when there is no room left.
+        """
+        values = np.asarray(values, dtype=float)
+        capacity = len(self._recent_years)
+        if self._recent_size == capacity:
+            self._evict_recent()
+        index = (self._recent_head + self._recent_size) % capacity
+        self._recent_years[index] = year
+        self._recent[index] = values
+        self._recent_size += 1
+
+        self.num_years += 1
+        self._sum += values
+        np.minimum(self._min, values, out=self._min)
+        np.maximum(self._max, values, out=self._max)
+
+    def _evict_recent(self):
+        """
+        Merges the two oldest full resolution years into a bucket of the
+        first level.
+        """
+        capacity = len(self._recent_years)
+        index = (self._recent_head + np.arange(2)) % capacity
+        years = self._recent_years[index]
+        values = self._recent[index]
+        self._push_bucket(0, (years[0], years[1] + 1, 2, values.min(axis=0),
+                              values.mean(axis=0), values.max(axis=0)))
+        self._recent_head = (self._recent_head + 2) % capacity
+        self._recent_size -= 2
+
+    def _push_bucket(self, level, bucket):
+        """
+        :param level: int, index of the level receiving the bucket
+        :param bucket: tuple (start, stop, count, min, mean, max)
+
+        Adds a bucket to a level, first making room by merging the two
+        oldest buckets of the level into the next level, or by merging all
+        buckets pairwise in the last level.
+        """
+        ring = self._levels[level]
+        if ring.is_full():
+            if level + 1 < len(self._levels):
+                self._push_bucket(level + 1, ring.pop_oldest(2))
+            else:
+                merged = [ring.pop_oldest(2) for _ in range(len(ring) // 2)]
+                if len(ring):
+                    merged.append(ring.pop_oldest(len(ring)))
+                for old_bucket in merged:
+                    ring.push(*old_bucket)
+        ring.push(*bucket)
+
+    def aggregates(self, name):
+        """
+        :param name: String, name of the series
+        :return: tuple (years, min, mean, max) of numpy arrays, oldest first
+
+        Gives the whole history of a series. A downsampled bucket is placed
+        at the middle of the years it covers, the full resolution years have
+        the same min, mean and max.
+        """
+        column = self._series_index[name]
+        years, minimum, mean, maximum = [], [], [], []
+        for ring in reversed(self._levels):
+            years.append((ring.ordered(ring.start) +
+                          ring.ordered(ring.stop) - 1) / 2)
+            minimum.append(ring.ordered(ring.min)[:, column])
+            mean.append(ring.ordered(ring.mean)[:, column])
+            maximum.append(ring.ordered(ring.max)[:, column])
+        recent_years, recent = self.recent(name)
+        years.append(recent_years)
+        minimum.append(recent)
+        mean.append(recent)
+        maximum.append(recent)
+        return (np.concatenate(years), np.concatenate(minimum),
+                np.concatenate(mean), np.concatenate(maximum))
+
+    def recent(self, name):
+        """
+        :param name: String, name of the series
+        :return: tuple (years, values) of the full resolution part of the
+            history, oldest first
+        """
+        index = (self._recent_head + np.arange(self._recent_size)) % \
+            len(self._recent_years)
+        return (self._recent_years[index],
+                self._recent[index, self._series_index[name]])
+
+    def latest(self):
+        """
+        :return: dictionary {series: value} of the last recorded year, or
+            None if nothing is recorded
+        """
+        if self._recent_size == 0:
+            return None
+        index = (self._recent_head + self._recent_size - 1) % \
+            len(self._recent_years)
+        return dict(zip(self.series, self._recent[index].tolist()))
+
+    def summary(self):
+        """
+        :return: dictionary {series: {'min': , 'mean': , 'max': }} over every
+            recorded year
+
+        The summary is exact even for years that have been downsampled.
+        """
+        if self.num_years == 0:
+            return {}
+        mean = self._sum / self.num_years
+        return {name: {'min': self._min[index], 'mean': mean[index],
+                       'max': self._max[index]}
+                for index, name in enumerate(self.series)}
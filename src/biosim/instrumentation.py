@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from contextlib import contextmanager
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CycleStatistics:
+    """
+    Collects the wall time of every phase in the annual cycle together with
+    event counters for each simulated year.
+    """
+    phases = ["fodder", "feeding", "breeding", "migration", "aging",
+              "metabolism", "death", "census"]
+    counters = ["births", "natural_deaths", "kills", "migrations",
+                "fodder_consumed"]
+
+    def __init__(self, stats_file=None, log=False):
+        """
+        :param stats_file: String, path of a csv file the yearly records are
+            written to, or None for no file
+        :param log: boolean, if True every yearly record is emitted to the
+            'biosim.instrumentation' logger
+
+        Constructor for the CycleStatistics class
+        """
+        self.records = []
+        self._current = None
+        self._stats_file = stats_file
+        self._log = log
+        if stats_file is not None:
+            with open(stats_file, "w") as file:
+                file.write(",".join(self._columns()) + "\n")
+
+    def _columns(self):
+        """
+        :return: list with the column names of a yearly record
+        """
+        return ["year"] + [f"time_{phase}" for phase in self.phases] + \
+            self.counters
+
+    def start_year(self, year):
+        """
+        :param year: int, the year about to be simulated
+
+        Starts a new yearly record with all timings and counters at zero.
+        """
+        self._current = dict.fromkeys(self._columns(), 0)
+        self._current["year"] = year
+
+    @contextmanager
+    def phase(self, name):
+        """
+        :param name: String, name of the phase being timed
+
+        Context manager adding the wall time spent inside it to the phase
+        timing of the current year.
+        """
+        start = time.perf_counter()
+        yield
+        self._current[f"time_{name}"] += time.perf_counter() - start
+
+    def count(self, counter, amount):
+        """
+        :param counter: String, name of the counter
+        :param amount: int or float, amount to add to the counter
+
+        Adds an amount to one of the event counters of the current year.
+        """
+        self._current[counter] += amount
+
+    def end_year(self):
+        """
+        Stores the record of the current year and writes it to the stats
+        file and the log if these are enabled.
+        """
+        record = self._current
+        self.records.append(record)
+        self._current = None
+        if self._stats_file is not None:
+            with open(self._stats_file, "a") as file:
+                file.write(",".join(str(record[column])
+                                    for column in self._columns()) + "\n")
+        if self._log:
+            logger.info("year %(year)d: births=%(births)d "
+                        "natural_deaths=%(natural_deaths)d kills=%(kills)d "
+                        "migrations=%(migrations)d "
+                        "fodder_consumed=%(fodder_consumed).1f", record)
+
+    def total_phase_times(self):
+        """
+        :return: dictionary {phase: total wall time in seconds}
+
+        Sums the wall time of each phase over all recorded years.
+        """
+        return {phase: sum(record[f"time_{phase}"]
+                           for record in self.records)
+                for phase in self.phases}
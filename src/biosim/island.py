@@ -3,19 +3,75 @@
 __author__ = "Kåre Johnsen & Anders Karlsen"
 __email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
 
-from biosim.cell_topography import Jungle, Ocean, Savanna, Mountain, Desert
-from biosim.animals import Herbivores, Carnivores, Animals
-import pandas as pd
+from biosim.cell_topography import (LANDSCAPES, LANDSCAPES_BY_CODE, Ocean,
+                                    hunt_in_cells)
+from biosim.animals import SPECIES, SPECIES_BY_CODE, Animals
+from biosim.instrumentation import CycleStatistics
+from biosim.event_log import EventLog
+from biosim.fodder import FodderStore
+from biosim.lineage import Lineage
 import numpy as np
+import itertools
+
+
+class YearSnapshot:
+    """
+    Lightweight summary of the island after a simulated year, made from the
+    density grids and the fodder array without visiting any animal
+    """
+    __slots__ = ("year", "num_animals_per_species", "total_fodder",
+                 "statistics")
+
+    def __init__(self, year, num_animals_per_species, total_fodder,
+                 statistics=None):
+        """
+        :param year: int, the number of years simulated on the island
+        :param num_animals_per_species: dict {species: individuals}
+        :param total_fodder: float, the fodder left on the island
+        :param statistics: dict with the phase timings and event counters of
+            the year, or None if the island is not instrumented
+
+        Constructor for the YearSnapshot class
+        """
+        self.year = year
+        self.num_animals_per_species = num_animals_per_species
+        self.total_fodder = total_fodder
+        self.statistics = statistics
+
+    @property
+    def num_animals(self):
+        """Total number of animals on the island"""
+        return sum(self.num_animals_per_species.values())
+
+    def __repr__(self):
+        return (f"YearSnapshot(year={self.year}, "
+                f"num_animals_per_species={self.num_animals_per_species}, "
+                f"total_fodder={self.total_fodder})")
 
 
 class Island:
     """This is the overall class for the global events on Rossumøya"""
+    age_group_edges = (2, 5, 10, 15)
+
+    # The phases of the annual cycle in order, as pairs of the name of its
+    # timing in CycleStatistics and the method running it
+    phases = [("fodder", "_increase_fodder_all_cells"),
+              ("feeding", "_feed_all_animals"),
+              ("breeding", "_breed_in_all_cells"),
+              ("migration", "_migrate_all_cells"),
+              ("aging", "_age_all_animals"),
+              ("metabolism", "_metabolism_all_animals"),
+              ("death", "_annual_death_all_cells"),
+              ("census", "_update_density_grids")]
 
     def __init__(self, island_map):
         """Constructor for the Island class"""
         self.raster_model = self.create_map(island_map)
+        self._index_cells()
         self.current_year = 0
+        self.statistics = None
+        self.event_log = None
+        self.lineage = Lineage()
 
     def create_map(self, island_map):
         """
@@ -31,28 +87,147 @@ class Island:
         previous_y_max = None
         for number, landscape_code in enumerate(island_map_no_spaces):
             y += 1
-            if landscape_code == "D":
-                raster_model[(x, y)] = Desert()
-            elif landscape_code == "J":
-                raster_model[(x, y)] = Jungle()
-            elif landscape_code == "S":
-                raster_model[(x, y)] = Savanna()
-            elif landscape_code == "O":
-                raster_model[(x, y)] = Ocean()
-            elif landscape_code == "M":
-                raster_model[(x, y)] = Mountain()
+            if landscape_code in LANDSCAPES:
+                raster_model[(x, y)] = LANDSCAPES[landscape_code]()
             elif landscape_code == "\n":
                 if x != 0 and y != previous_y_max:
                     raise ValueError("The board needs to be uniform.")
                 previous_y_max = y
                 y = -1
                 x += 1
-            if landscape_code not in ["O", "M", "J", "S", "D", "\n"]:
+            else:
                 raise ValueError("The tiles need to be one of the"
-                                 "predetermined tiles: O, M, J, S or D")
+                                 "predetermined tiles: "
+                                 f"{', '.join(LANDSCAPES)}")
         self.check_borders_ocean(raster_model)
         return raster_model
 
+    def _index_cells(self):
+        """
+        Groups the cells of the raster model once, so the phases of the
+        annual cycle only visit the cells relevant to them. Creates
+        cell_types, an array with the landscape type code of every cell, the
+        cells of each landscape type in cells_by_type, and the accessible
+        and the fodder producing cells in map order.
+
+        The accessible cells are bound to the island, so they report when
+        they get animals to the set of active cells, and the fodder of the
+        fodder producing cells is kept in one FodderStore.
+        """
+        self.shape = tuple(coordinate + 1 for coordinate
+                           in max(self.raster_model.keys()))
+        self.cell_types = np.empty(self.shape, dtype=int)
+        self.cells_by_type = [[] for _ in LANDSCAPES_BY_CODE]
+        self._accessible_cells = []
+        self._fodder_cells = []
+        self._active_cells = set()
+        self._active_order = []
+        self._accessible_mask = np.zeros(self.shape, dtype=bool)
+        for location, cell in self.raster_model.items():
+            self.cell_types[location] = cell.type_code
+            self.cells_by_type[cell.type_code].append(cell)
+            if cell.is_accessible:
+                self._accessible_cells.append((location, cell))
+                self._accessible_mask[location] = True
+            if cell.produces_fodder:
+                self._fodder_cells.append(cell)
+        self._fodder_store = FodderStore(
+            [type(cell) for cell in self._fodder_cells])
+        self._density = np.zeros((len(SPECIES_BY_CODE),) + self.shape,
+                                 dtype=int)
+        self._density_stale = False
+        self._density_views = []
+        for grid in self._density:
+            view = grid.view()
+            view.flags.writeable = False
+            self._density_views.append(view)
+        self._dataframe_cache = {}
+        fodder_index = {id(cell): index
+                        for index, cell in enumerate(self._fodder_cells)}
+        for location, cell in self._accessible_cells:
+            counts = self._density[(slice(None),) + location]
+            if id(cell) in fodder_index:
+                cell.bind_to_island(location, self._active_cells,
+                                    self._fodder_store,
+                                    fodder_index[id(cell)], counts,
+                                    self._dataframe_cache)
+            else:
+                cell.bind_to_island(location, self._active_cells,
+                                    counts=counts,
+                                    dataframe_cache=self._dataframe_cache)
+
+    @property
+    def _fodder(self):
+        """Numpy array with the fodder of the fodder producing cells, with
+        the regrowth owed to them done. Reading it catches up every cell,
+        so it is only used by the array engines."""
+        return self._fodder_store.array()
+
+    def _update_density_grids(self):
+        """
+        Writes the number of animals of each species in every cell into the
+        density grids. Only the populated cells need to be visited, as the
+        grids are cleared first. Dataframes made from the old counts are
+        dropped from the cache.
+
+        The cells keep the grids up to date as animals are added and
+        removed, so this census only catches animal lists changed in place.
+        """
+        self._density_stale = False
+        self._dataframe_cache.clear()
+        self._density.fill(0)
+        for location, cell in self._populated_cells():
+            for species_code, animals in enumerate(cell.animal_lists):
+                self._density[(species_code,) + location] = len(animals)
+
+    def _refresh_density_grids(self):
+        """
+        Counts the animals again if a phase of the vectorized engines has
+        changed them since the last census, so the grids and dataframes
+        read between annual cycles are current.
+        """
+        if self._density_stale:
+            self._update_density_grids()
+
+    def density_grid(self, species):
+        """
+        :param species: String, name of the species, e.g. 'Herbivore'
+        :return: read-only numpy array with the number of animals of the
+            species in each cell, where [row][col] corresponds to the
+            islands x,y
+
+        The grid is a view which the island updates in place as animals
+        are added and removed, so it can be kept and reused instead of being
+        fetched again. The vectorized engines update it after every annual
+        cycle, and when it is fetched after a single phase.
+        """
+        self._refresh_density_grids()
+        return self._density_views[SPECIES[species].species_code]
+
+    def _populated_cells(self):
+        """
+        :return: list of tuples (location, cell) with the cells which have
+            animals, in map order
+
+        Goes through the active cells, and drops the cells which have lost
+        all their animals since the last time. The cells only add their
+        locations to the set of active cells, so the sorted list of active
+        locations kept from the last call is only sorted again when the set
+        has grown, which is about once a year after the migration.
+        """
+        if len(self._active_order) != len(self._active_cells):
+            self._active_order = sorted(self._active_cells)
+        populated_cells = []
+        for location in self._active_order:
+            cell = self.raster_model[location]
+            if cell.has_animals():
+                populated_cells.append((location, cell))
+            else:
+                self._active_cells.discard(location)
+        if len(populated_cells) != len(self._active_order):
+            self._active_order = [location for location, _ in populated_cells]
+        return populated_cells
+
     @staticmethod
     def check_borders_ocean(raster_model):
         """
@@ -64,11 +239,11 @@ class Island:
         max_coordinates = max(raster_model.keys())
         for coordinate, cell_class in raster_model.items():
             if coordinate[0] in [0, max_coordinates[0]]:
-                if cell_class.__class__.__name__ != "Ocean":
+                if not isinstance(cell_class, Ocean):
                     raise ValueError("The border of the map needs to "
                                      "consist solely of ocean tiles")
             elif coordinate[1] in [0, max_coordinates[1]]:
-                if cell_class.__class__.__name__ != "Ocean":
+                if not isinstance(cell_class, Ocean):
                     raise ValueError("The border of the map needs to "
                                      "consist solely of ocean tiles")
 
@@ -79,6 +254,31 @@ class Island:
         Populates an specific accessible cell on the island with instances
         of an animal-class.
         """
+        self._activate_lineage()
+        for location, species, age, weight in self._new_animals(
+                population_list):
+            self.raster_model[location].add_animal(
+                species(age=age, weight=weight))
+        self._update_density_grids()
+
+    def _activate_lineage(self):
+        """
+        Makes the island's own lineage the one new animals are registered
+        in, so every island numbers its animals from 0 and the family tree
+        of one simulation does not grow with the animals of another.
+        """
+        Animals.lineage = self.lineage
+
+    def _new_animals(self, population_list):
+        """
+        :param population_list: list of dictionary {(x,y): instance}
+        :return: generator yielding tuples (location, species class, age,
+            weight) for every animal of a known species in the population
+
+        Checks the population while going through it, raising ValueError
+        for animals placed outside the map or in inaccessible cells, or with
+        unacceptable age or weight.
+        """
         for pop_dict in population_list:
             self._check_new_population_age_and_weight(pop_dict)
             if pop_dict["loc"] not in self.raster_model.keys():
@@ -86,14 +286,10 @@ class Island:
                                  " coordinate system.")
             if self.raster_model[pop_dict["loc"]].is_accessible:
                 for population in pop_dict["pop"]:
-                    if population["species"] == "Herbivore":
-                        self.raster_model[pop_dict["loc"]].add_animal(
-                            Herbivores(age=population["age"],
-                                       weight=population["weight"]))
-                    elif population["species"] == "Carnivore":
-                        self.raster_model[pop_dict["loc"]].add_animal(
-                            Carnivores(age=population["age"],
-                                       weight=population["weight"]))
+                    species = SPECIES.get(population["species"])
+                    if species is not None:
+                        yield (pop_dict["loc"], species, population["age"],
+                               population["weight"])
             else:
                 raise ValueError(
                     f"An animal cannot be placed in a "
@@ -116,115 +312,288 @@ class Island:
 
     def _migrate_all_cells(self):
         """
-        Makes all instances in all cell on the island try to migrate.
-        """
-        carnivore_ek, herbivore_ek = self._generate_ek_for_board()
-        for location, cell in self.raster_model.items():
-            if cell.is_accessible:
-                cell.migrate_all_animals_in_cell(self, location, carnivore_ek,
-                                                 herbivore_ek)
-        Animals.reset_migration_attempt()
-
-    def _generate_ek_for_board(self):
-        """
+        :return: int, the number of animals which moved to another cell
+
+        Makes all instances in all cell on the island try to migrate. The
+        residents of every cell are listed before anyone moves, so each
+        animal tries to migrate at most once a year.
+        """
+        populated_cells = self._populated_cells()
+        carnivore_ek, herbivore_ek = self._generate_ek_for_board(
+            populated_cells)
+        residents = [(location, cell, list(cell.herbivore_list),
+                      list(cell.carnivore_list))
+                     for location, cell in populated_cells]
+        migrations = 0
+        for location, cell, herbivores, carnivores in residents:
+            migrations += cell.migrate_all_animals_in_cell(
+                self, location, carnivore_ek, herbivore_ek, herbivores,
+                carnivores)
+        return migrations
+
+    def _generate_ek_for_board(self, populated_cells):
+        """
+        :param populated_cells: list of tuples (location, cell) with the
+            cells which have animals
         :return: floats, carnivore_ek and herbivore_ek
 
-        Generates carnivore and herbivore ek for all accessible cells on the
-        island
+        Generates carnivore and herbivore ek for the accessible cells the
+        animals in the populated cells can migrate to
         """
+        carnivores = SPECIES["Carnivore"]
+        herbivores = SPECIES["Herbivore"]
         carnivore_ek = {}
         herbivore_ek = {}
-        for location, cell in self.raster_model.items():
-            if cell.is_accessible:
-                carnivore_ek[location] = cell.ek_for_cell("Carnivores")
-                herbivore_ek[location] = cell.ek_for_cell("Herbivores")
+        for location, _ in populated_cells:
+            for neighbour in Animals._find_neighbouring_cells(location):
+                if neighbour in herbivore_ek:
+                    continue
+                cell = self.raster_model.get(neighbour)
+                if cell is not None and cell.is_accessible:
+                    carnivore_ek[neighbour] = cell.ek_for_cell(carnivores)
+                    herbivore_ek[neighbour] = cell.ek_for_cell(herbivores)
         return carnivore_ek, herbivore_ek
 
     def _feed_all_animals(self):
         """
-        Makes all animals in all accessible cells try to eat
-        """
-        for cell in self.raster_model.values():
-            if cell.__class__.__name__ == "Jungle" \
-                    or cell.__class__.__name__ == "Savanna":
-                cell.feed_herbivores_in_cell()
-        for cell in self.raster_model.values():
-            if cell.is_accessible:
-                cell.feed_carnivores_in_cell()
+        Makes all animals in all populated cells try to eat. The grazing
+        species only find fodder in the fodder producing cells. Then the
+        hunters of every hunting species in all the cells with their prey
+        hunt in one island wide pass, which reuses the prey fitness left by
+        the grazing.
+        """
+        populated_cells = self._populated_cells()
+        fitness = {}
+        for species in SPECIES_BY_CODE:
+            if species.prey is not None:
+                continue
+            code = species.species_code
+            for location, cell in populated_cells:
+                if cell.produces_fodder and cell.animal_lists[code]:
+                    fitness[code, location] = cell.graze_in_cell(species)
+        for species in SPECIES_BY_CODE:
+            if species.prey is None:
+                continue
+            code = species.species_code
+            prey_code = SPECIES[species.prey].species_code
+            hunting_cells = [(location, cell)
+                             for location, cell in populated_cells
+                             if cell.animal_lists[code] and
+                             cell.animal_lists[prey_code]]
+            hunt_in_cells(
+                [cell for _, cell in hunting_cells], species,
+                [fitness.get((prey_code, location))
+                 for location, _ in hunting_cells])
 
     def _increase_fodder_all_cells(self):
         """
-        Increase fodder in all primary producing cells
+        Lets a year of regrowth pass for all primary producing cells. The
+        fodder of a cell is regrown when it is next read, so cells nobody
+        eats from cost nothing from year to year.
         """
-        for cell in self.raster_model.values():
-            if cell.__class__.__name__ == "Jungle" \
-                    or cell.__class__.__name__ == "Savanna":
-                cell.increase_fodder()
+        self._fodder_store.regrow()
 
     def _annual_death_all_cells(self):
         """
-        Runs the annual_death method for all animals in all accessible cells
+        Runs the annual_death method for all animals in all populated cells
         """
-        for cell in self.raster_model.values():
-            if cell.is_accessible:
-                cell.natural_death_all_animals_in_cell()
+        for _, cell in self._populated_cells():
+            cell.natural_death_all_animals_in_cell()
 
     def _breed_in_all_cells(self):
         """
-        Runs the breeding method for all animals in all accessible cells
+        Runs the breeding method for all animals in all populated cells
         """
-        for cell in self.raster_model.values():
-            if cell.is_accessible:
-                cell.breed_all_animals_in_cell()
+        for _, cell in self._populated_cells():
+            cell.breed_all_animals_in_cell()
+
+    def snapshot(self):
+        """
+        :return: YearSnapshot of the current state of the island
+
+        Summarises the island from the density grids, the running fodder
+        total and the latest instrumentation record.
+        """
+        self._refresh_density_grids()
+        statistics = None
+        if self.statistics is not None and self.statistics.records:
+            statistics = self.statistics.records[-1]
+        return YearSnapshot(
+            year=self.current_year,
+            num_animals_per_species={
+                species.species_name: int(self._density[species_code].sum())
+                for species_code, species in enumerate(SPECIES_BY_CODE)},
+            total_fodder=self._fodder_store.total(),
+            statistics=statistics)
+
+    def iter_cycles(self, num_years=None):
+        """
+        :param num_years: int, number of years to simulate, or None to go on
+            until the caller stops
+        :return: generator yielding a YearSnapshot after every annual cycle
+
+        Simulates one year for every snapshot requested, so the caller can
+        stop at any time, e.g. when a species has died out.
+        """
+        years = itertools.count() if num_years is None else range(num_years)
+        for _ in years:
+            self.annual_cycle()
+            yield self.snapshot()
 
     def annual_cycle(self):
         """
-        Runs all the components of the annual cycle in the correct order
+        Runs all the components of the annual cycle in the correct order.
+        With instrumentation enabled every phase is timed, see
+        _run_timed_phase.
+        """
+        self._activate_lineage()
+        if self.event_log is not None:
+            self.event_log.year = self.current_year
+        stats = self.statistics
+        if stats is not None:
+            stats.start_year(self.current_year)
+        for name, method in self.phases:
+            if stats is None:
+                getattr(self, method)()
+            else:
+                self._run_timed_phase(stats, name, getattr(self, method))
+        if stats is not None:
+            stats.end_year()
+        self.current_year += 1
+
+    @staticmethod
+    def _age_all_animals():
+        """
+        Increases the age of all animals by one year
         """
-        self._increase_fodder_all_cells()
-        self._feed_all_animals()
-        self._breed_in_all_cells()
-        self._migrate_all_cells()
         Animals.age_up()
+
+    @staticmethod
+    def _metabolism_all_animals():
+        """
+        Decreases the weight of all animals by their annual metabolism
+        """
         Animals.annual_metabolism()
-        self._annual_death_all_cells()
 
-    def per_cell_count_pandas_dataframe(self):
+    @staticmethod
+    def _num_animals():
         """
-        :return: pandas dataframe with cell info about the amount of animals
+        :return: int, the number of living animals, used for the event
+            counters of the instrumentation
+        """
+        return len(Animals.instances)
 
-        Counts the number of herbivores and carnivores in every cell
+    def _run_timed_phase(self, stats, name, run_phase):
         """
-        pdlist = []
-        for coordinate, cell in self.raster_model.items():
-            if cell.is_accessible:
-                herb_amount = len(cell.herbivore_list)
-                carn_amount = len(cell.carnivore_list)
+        :param stats: CycleStatistics of the island
+        :param name: String, name of the phase in the statistics
+        :param run_phase: the method running the phase
+
+        Runs one phase of the annual cycle while recording its wall time,
+        and adds the event counters the phase changes to the statistics.
+        """
+        animals_before = self._num_animals()
+        if name == "feeding":
+            fodder_before_feeding = self._fodder_store.total()
+        with stats.phase(name):
+            result = run_phase()
+        if name == "feeding":
+            stats.count("fodder_consumed", fodder_before_feeding -
+                        self._fodder_store.total())
+            stats.count("kills", animals_before - self._num_animals())
+        elif name == "breeding":
+            stats.count("births", self._num_animals() - animals_before)
+        elif name == "migration":
+            stats.count("migrations", result)
+        elif name == "death":
+            stats.count("natural_deaths",
+                        animals_before - self._num_animals())
+
+    def enable_instrumentation(self, stats_file=None, log=False):
+        """
+        :param stats_file: String, path of a csv file for the yearly records,
+            or None for no file
+        :param log: boolean, if True the yearly records are logged
+
+        Starts recording phase timings and event counters for every
+        following annual cycle.
+        """
+        self.statistics = CycleStatistics(stats_file=stats_file, log=log)
+
+    def disable_instrumentation(self):
+        """
+        Stops recording phase timings and event counters
+        """
+        self.statistics = None
+
+    def enable_event_log(self, path=None, buffer_size=65536):
+        """
+        :param path: String, path of the binary file for the records, or
+            None to keep them in memory
+        :param buffer_size: int, number of records buffered before writing
+        :return: the EventLog recording the events
+
+        Starts recording every birth, natural death, kill and migration on
+        the island. The log is handed to the cells, which only look at it
+        when an event happens.
+        """
+        self.disable_event_log()
+        self.event_log = EventLog(path=path, buffer_size=buffer_size)
+        self.event_log.year = self.current_year
+        for cell in self.raster_model.values():
+            cell.event_log = self.event_log
+        return self.event_log
+
+    def disable_event_log(self):
+        """
+        Stops recording events, writing the remaining records of the log
+        """
+        if self.event_log is None:
+            return
+        self.event_log.close()
+        self.event_log = None
+        for cell in self.raster_model.values():
+            cell.event_log = None
+
+    def per_cell_count_pandas_dataframe(self, cells="all"):
+        """
+        :param cells: String, which cells to include: 'all', 'accessible'
+            or 'populated' for only the cells with animals
+        :return: pandas dataframe with cell info about the amount of animals
+
+        Lists the number of herbivores and carnivores in every cell, taken
+        from the density grids. The dataframe is made once and cached until
+        the number of animals in a cell changes; a shallow copy is returned
+        so changes made by the caller stay out of the cache. Pandas is first
+        imported here, keeping it out of the import of the island.
+        """
+        self._refresh_density_grids()
+        if cells not in self._dataframe_cache:
+            import pandas as pd
+            if cells == "all":
+                mask = np.ones(self.shape, dtype=bool)
+            elif cells == "accessible":
+                mask = self._accessible_mask
+            elif cells == "populated":
+                mask = self._density.sum(axis=0) > 0
             else:
-                herb_amount = 0
-                carn_amount = 0
-            pdlist.append(
-                [coordinate[0], coordinate[1], herb_amount, carn_amount])
-        dataframe = pd.DataFrame(
-            pdlist, columns=['Row', 'Col', 'Herbivore', 'Carnivore'])
-        return dataframe
+                raise ValueError(f"{cells} is not an accepted cell selection,"
+                                 f" use 'all', 'accessible' or 'populated'")
+            rows, cols = np.nonzero(mask)
+            self._dataframe_cache[cells] = pd.DataFrame(
+                {'Row': rows, 'Col': cols,
+                 'Herbivore': self.density_grid('Herbivore')[mask],
+                 'Carnivore': self.density_grid('Carnivore')[mask]})
+        return self._dataframe_cache[cells].copy(deep=False)
 
     def arrays_for_heatmap(self):
         """
         :return: numpy arrays with info about numbers of animals in a cell
 
-        Counts the number of herbivores and carnivores in every cell and
-        places them in a numpy array where [row][col] corresponds to the
-        islands x,y
+        Returns the read-only density grids of herbivores and carnivores,
+        where [row][col] corresponds to the islands x,y
         """
-        maxcord = max(self.raster_model.keys())
-        herb_array = np.zeros(maxcord)
-        carn_array = np.zeros(maxcord)
-        for (row, col), instance in self.raster_model.items():
-            if instance.is_accessible:
-                herb_array[row][col] = len(instance.herbivore_list)
-                carn_array[row][col] = len(instance.carnivore_list)
-        return herb_array, carn_array
+        return self.density_grid('Herbivore'), self.density_grid('Carnivore')
 
     def total_number_per_species(self):
         """
@@ -234,71 +603,91 @@ class Island:
         """
         total_herb = 0
         total_carn = 0
-        for cell in self.raster_model.values():
-            if cell.is_accessible:
-                total_carn += len(cell.carnivore_list)
-                total_herb += len(cell.herbivore_list)
+        for _, cell in self._populated_cells():
+            total_carn += len(cell.carnivore_list)
+            total_herb += len(cell.herbivore_list)
         return {'Herbivore': total_herb, 'Carnivore': total_carn}
 
+    def _species_age_and_weight(self, species_code):
+        """
+        :param species_code: int, the species code of the animals
+        :return: two numpy arrays with the ages and weights of all animals of
+            the species on the island
+        """
+        population = [animal for _, cell in self._populated_cells()
+                      for animal in cell.animal_lists[species_code]]
+        ages = np.fromiter((animal.age for animal in population),
+                           dtype=int, count=len(population))
+        weights = np.fromiter((animal.weight for animal in population),
+                              dtype=float, count=len(population))
+        return ages, weights
+
+    def age_group_statistics(self, species, edges=None):
+        """
+        :param species: String, name of the species, e.g. 'Herbivore'
+        :param edges: increasing sequence of ages where a new age group
+            starts, defaults to age_group_edges
+        :return: two numpy arrays with the number of animals and their total
+            biomass in each age group
+
+        Sorts the animals of a species into the age groups given by the
+        edges, where the first group starts at age 0 and the last group has
+        no upper limit.
+        """
+        if edges is None:
+            edges = self.age_group_edges
+        ages, weights = self._species_age_and_weight(
+            SPECIES[species].species_code)
+        groups = np.digitize(ages, edges)
+        numbers = np.bincount(groups, minlength=len(edges) + 1)
+        biomass = np.bincount(groups, weights=weights,
+                              minlength=len(edges) + 1)
+        return numbers, biomass
+
     def herbivore_biomass_age_groups(self):
         """
-        :return: two lists with biomass and population size per
+        :return: two numpy arrays with population size and biomass per
             age group for herbivores
 
-        Makes lists of herbivores individuals and the total biomass within the
-        age groups 0-1, 2-5, 5-10, 10-15 and 15 +.
+        Counts the herbivore individuals and the total biomass within the
+        age groups 0-1, 2-4, 5-9, 10-14 and 15 +.
         """
-        herbivore_age_numbers = [0, 0, 0, 0, 0]
-        herbivore_biomass = [0, 0, 0, 0, 0]
-        for cell in self.raster_model.values():
-            if cell.is_accessible:
-                for herbivore in cell.herbivore_list:
-                    if herbivore.age <= 1:
-                        herbivore_age_numbers[0] += 1
-                        herbivore_biomass[0] += herbivore.weight
-                    elif 1 < herbivore.age < 5:
-                        herbivore_age_numbers[1] += 1
-                        herbivore_biomass[1] += herbivore.weight
-                    elif 5 <= herbivore.age < 10:
-                        herbivore_age_numbers[2] += 1
-                        herbivore_biomass[2] += herbivore.weight
-                    elif 10 <= herbivore.age < 15:
-                        herbivore_age_numbers[3] += 1
-                        herbivore_biomass[3] += herbivore.weight
-                    elif herbivore.age >= 15:
-                        herbivore_age_numbers[4] += 1
-                        herbivore_biomass[4] += herbivore.weight
-        return herbivore_age_numbers, herbivore_biomass
+        return self.age_group_statistics("Herbivore")
 
     def carnivore_biomass_age_groups(self):
         """
-        :return: two lists with biomass and population size per
+        :return: two numpy arrays with population size and biomass per
             age group for carnivores
 
-        Makes lists of carnivores individuals and the total biomass within the
-        age groups 0-1, 2-5, 5-10, 10-15 and 15 +.
+        Counts the carnivore individuals and the total biomass within the
+        age groups 0-1, 2-4, 5-9, 10-14 and 15 +.
         """
-        carnivore_age_numbers = [0, 0, 0, 0, 0]
-        carnivore_biomass = [0, 0, 0, 0, 0]
-        for cell in self.raster_model.values():
-            if cell.is_accessible:
-                for carnivore in cell.carnivore_list:
-                    if carnivore.age <= 1:
-                        carnivore_age_numbers[0] -= 1
-                        carnivore_biomass[0] += carnivore.weight
-                    elif 1 < carnivore.age < 5:
-                        carnivore_age_numbers[1] -= 1
-                        carnivore_biomass[1] += carnivore.weight
-                    elif 5 <= carnivore.age < 10:
-                        carnivore_age_numbers[2] -= 1
-                        carnivore_biomass[2] += carnivore.weight
-                    elif 10 <= carnivore.age < 15:
-                        carnivore_age_numbers[3] -= 1
-                        carnivore_biomass[3] += carnivore.weight
-                    elif carnivore.age >= 15:
-                        carnivore_age_numbers[4] -= 1
-                        carnivore_biomass[4] += carnivore.weight
-        return carnivore_age_numbers, carnivore_biomass
+        return self.age_group_statistics("Carnivore")
+
+    @staticmethod
+    def mirrored_pyramid(herbivore_numbers, herbivore_biomass,
+                         carnivore_numbers, carnivore_biomass):
+        """
+        :param herbivore_numbers: herbivore population size per age group
+        :param herbivore_biomass: herbivore biomass per age group
+        :param carnivore_numbers: carnivore population size per age group
+        :param carnivore_biomass: carnivore biomass per age group
+        :return: two lists for each species with population size and average
+            weight for each age group
+
+        Prepares the age group statistics for the population pyramid, where
+        the herbivores are drawn to the right and the carnivores to the left
+        of zero. The carnivore numbers and weights are therefore negated.
+        Age groups without animals get an average weight of 0.
+        """
+        herb_mean_w = np.divide(
+            herbivore_biomass, herbivore_numbers,
+            out=np.zeros(len(herbivore_numbers)), where=herbivore_numbers > 0)
+        carn_mean_w = np.divide(
+            carnivore_biomass, carnivore_numbers,
+            out=np.zeros(len(carnivore_numbers)), where=carnivore_numbers > 0)
+        return list(herbivore_numbers), list(-carnivore_numbers), \
+            list(herb_mean_w), list(-carn_mean_w)
 
     def population_biomass_age_groups(self):
         """
@@ -306,26 +695,23 @@ class Island:
             size for each age group
 
         Uses biomass and age group numbers information to calculate the mean
-        weight within a age group.
-        """
-        herbivore_age_numbers, herbivore_biomass =\
-            self.herbivore_biomass_age_groups()
-        carnivore_age_numbers, carnivore_biomass = \
-            self.carnivore_biomass_age_groups()
-        herb_mean_w_list = []
-        carn_mean_w_list = []
-        for biomass, age in zip(herbivore_biomass, herbivore_age_numbers):
-            if age > 0:
-                herb_mean_w_list.append(biomass / age)
-            else:
-                herb_mean_w_list.append(0)
-        for biomass, age in zip(carnivore_biomass, carnivore_age_numbers):
-            if age < 0:
-                carn_mean_w_list.append(biomass / age)
-            else:
-                carn_mean_w_list.append(0)
-        return herbivore_age_numbers, carnivore_age_numbers,\
-            herb_mean_w_list, carn_mean_w_list
+        weight within a age group, mirrored for the population pyramid.
+        """
+        return self.mirrored_pyramid(*self.herbivore_biomass_age_groups(),
+                                     *self.carnivore_biomass_age_groups())
+
+    @classmethod
+    def age_group_labels(cls, edges=None):
+        """
+        :param edges: increasing sequence of ages where a new age group
+            starts, defaults to age_group_edges
+        :return: list of strings naming the age groups, e.g. '2-4'
+        """
+        if edges is None:
+            edges = cls.age_group_edges
+        starts = [0] + list(edges)
+        labels = [f"{start}-{end - 1}" for start, end in zip(starts, edges)]
+        return labels + [f"{starts[-1]}+"]
 
     def biomass_food_chain(self):
         """
@@ -334,15 +720,26 @@ class Island:
         Calculates the total amount of fodder and the total biomass for the
         herbivores and carnivores.
         """
-        biomass_fodder = 0
-        biomass_herbs = 0
-        biomass_carnivores = 0
-        for cell in self.raster_model.values():
-            if cell.is_accessible:
-                biomass_fodder += cell.fodder
-                biomass_herbs += cell.biomass_herbivores()
-                biomass_carnivores += cell.biomass_carnivores()
-        biomass_dict = {"biomass_fodder": biomass_fodder,
-                        "biomass_herbs": biomass_herbs,
-                        "biomass_carnivores": biomass_carnivores}
+        biomass = self.species_biomass()
+        biomass_dict = {"biomass_fodder": self._fodder_store.total(),
+                        "biomass_herbs":
+                            biomass[SPECIES["Herbivore"].species_code],
+                        "biomass_carnivores":
+                            biomass[SPECIES["Carnivore"].species_code]}
         return biomass_dict
+
+    def species_biomass(self):
+        """
+        :return: list with the total weight of the animals of every species,
+            indexed by species code
+
+        Sums the weights cell by cell in one pass over the populated cells.
+        """
+        biomass = [0] * len(SPECIES_BY_CODE)
+        for _, cell in self._populated_cells():
+            for species_code, animal_list in enumerate(cell.animal_lists):
+                weight_sum = 0
+                for animal in animal_list:
+                    weight_sum += animal.weight
+                biomass[species_code] += weight_sum
+        return biomass
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compiled loops for the phases of the array engine.
+
+Grazing, predation, breeding, death and migration all have to go through
+the animals one at a time in a given order, which is awkward to write with
+whole-array NumPy operations. The loops are compiled with numba when it is
+installed, and run as plain Python otherwise, which is slow but gives the
+same results for the same seed. Compiled functions are cached on disk, so
+only the first process pays for the compilation.
+
+Compiled kernels draw their random numbers from np.random, which numba
+replaces with its own generator inside compiled code. The plain Python
+kernels draw from a private RandomState instead, so running them leaves the
+global NumPy generator alone. Seed either with seed().
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import math
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+JIT_AVAILABLE = numba is not None
+_random = np.random if JIT_AVAILABLE else np.random.RandomState()
+
+
+def jit(function):
+    """
+    :param function: the function to compile
+    :return: the compiled function, or the function itself when numba is
+        not installed
+    """
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@jit
+def seed(value):
+    """
+    :param value: int, the seed
+
+    Seeds the random numbers used by the kernels.
+    """
+    _random.seed(value)
+
+
+@jit
+def normal(mean, sigma, out):
+    """
+    :param mean: array with the mean of every draw
+    :param sigma: array with the standard deviation of every draw
+    :param out: array set to the draws
+
+    Draws normally distributed numbers from the random numbers of the
+    kernels, so they follow the seed of the engine.
+    """
+    for index in range(len(out)):
+        out[index] = _random.normal(mean[index], sigma[index])
+
+
+@jit
+def binomial(count, probability, out):
+    """
+    :param count: int array with the number of trials of every draw
+    :param probability: array with the success probability of every draw
+    :param out: int array set to the number of successes
+
+    Draws binomially distributed numbers from the random numbers of the
+    kernels, so they follow the seed of the engine.
+    """
+    for index in range(len(out)):
+        out[index] = _random.binomial(count[index], probability[index])
+
+
+@jit
+def fitness_value(age, weight, phi_age, a_half, phi_weight, w_half):
+    """
+    :return: float, the fitness of an animal of the given age and weight,
+        0 if it has no weight
+    """
+    if weight <= 0:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(phi_age * (age - a_half))) / \
+        (1.0 + math.exp(-phi_weight * (weight - w_half)))
+
+
+@jit
+def counting_sort(keys, offsets):
+    """
+    :param keys: array with the group of every row
+    :param offsets: array with the first position of every group in the
+        sorted order, and the number of rows at the end
+    :return: array with the rows ordered by group, in their original order
+        within every group
+
+    Sorts the rows by group in linear time.
+    """
+    position = offsets[:-1].copy()
+    order = np.empty(len(keys), dtype=np.int64)
+    for row in range(len(keys)):
+        group = keys[row]
+        order[position[group]] = row
+        position[group] += 1
+    return order
+
+
+@jit
+def graze(order, cells, weight, fodder, fodder_index, appetite, beta):
+    """
+    :param order: array with the herbivores in grazing order, the fittest
+        first within every cell
+    :param cells: array with the cell of every animal
+    :param weight: array with the weight of every animal, updated in place
+    :param fodder: array with the fodder of the fodder producing cells,
+        updated in place
+    :param fodder_index: array with the index in fodder of every cell
+    :param appetite: float, the herbivore 'F'
+    :param beta: float, the herbivore 'beta'
+
+    Lets every herbivore eat its appetite, or what is left in its cell.
+    """
+    for animal in order:
+        index = fodder_index[cells[animal]]
+        available = fodder[index]
+        if available <= 0:
+            continue
+        eaten = min(appetite, available)
+        fodder[index] = available - eaten
+        weight[animal] += beta * eaten
+
+
+@jit
+def hunt(herbivores, herbivore_fitness, herbivore_start, herbivore_stop,
+         carnivores, carnivore_start, carnivore_stop, age, weight, killer,
+         appetite, beta, delta_phi_max, phi_age, a_half, phi_weight, w_half):
+    """
+    :param herbivores: array with the herbivores of the hunting cells,
+        ordered by cell and increasing fitness
+    :param herbivore_fitness: array with the fitness of those herbivores
+    :param herbivore_start: array with the first position of every cell
+        in herbivores
+    :param herbivore_stop: array with the position after the last
+    :param carnivores: array with the carnivores of the hunting cells,
+        ordered by cell and decreasing fitness
+    :param carnivore_start: array with the first position of every cell
+        in carnivores
+    :param carnivore_stop: array with the position after the last
+    :param age: array with the age of every animal
+    :param weight: array with the weight of every animal, updated in place
+    :param killer: integer array, -1 for the animals not killed, set to the
+        row of its killer for every herbivore killed
+    :param appetite: float, the carnivore 'F'
+    :param beta: float, the carnivore 'beta'
+    :param delta_phi_max: float, the carnivore 'DeltaPhiMax'
+    :return: int, the number of herbivores killed
+
+    The carnivores of a cell hunt in turn, the fittest first, trying the
+    weakest herbivore first until they have eaten their appetite. The
+    carnivore's fitness is updated after every kill. Since the herbivores
+    are ordered by fitness, a carnivore stops at the first herbivore fitter
+    than itself.
+    """
+    kills = 0
+    for segment in range(len(herbivore_start)):
+        for position in range(carnivore_start[segment],
+                              carnivore_stop[segment]):
+            carnivore = carnivores[position]
+            carnivore_fitness = fitness_value(
+                age[carnivore], weight[carnivore], phi_age, a_half,
+                phi_weight, w_half)
+            eaten = 0.0
+            for prey in range(herbivore_start[segment],
+                              herbivore_stop[segment]):
+                if eaten >= appetite:
+                    break
+                herbivore = herbivores[prey]
+                if killer[herbivore] >= 0:
+                    continue
+                difference = carnivore_fitness - herbivore_fitness[prey]
+                if difference < 0:
+                    break
+                if difference < delta_phi_max and \
+                        _random.random() >= difference / delta_phi_max:
+                    continue
+                killer[herbivore] = carnivore
+                kills += 1
+                weight[carnivore] += beta * weight[herbivore]
+                eaten += weight[herbivore]
+                carnivore_fitness = fitness_value(
+                    age[carnivore], weight[carnivore], phi_age, a_half,
+                    phi_weight, w_half)
+    return kills
+
+
+@jit
+def breed(species, alive, weight, fitness, cell_population, gamma,
+          breeding_threshold, w_birth, sigma_birth, xi, birth_weight):
+    """
+    :param species: array with the species code of every animal
+    :param alive: boolean array, False for the dead rows to pass over
+    :param weight: array with the weight of every animal, updated in place
+    :param fitness: array with the fitness of every animal
+    :param cell_population: array with the number of animals of the same
+        species in the cell of every animal
+    :param gamma, breeding_threshold, w_birth, sigma_birth, xi: arrays with
+        the parameter or derived constant of every species
+    :param birth_weight: array set to the weight of the newborn of every
+        animal giving birth, left as it is for the others
+    :return: int, the number of births
+
+    Lets every animal try to give birth once, by the rules of
+    Animals.breed.
+    """
+    births = 0
+    for animal in range(len(species)):
+        if not alive[animal]:
+            continue
+        code = species[animal]
+        if weight[animal] < breeding_threshold[code]:
+            continue
+        probability = min(1.0, gamma[code] * fitness[animal] *
+                          (cell_population[animal] - 1))
+        if _random.random() > probability:
+            continue
+        newborn_weight = _random.normal(w_birth[code], sigma_birth[code])
+        if xi[code] * newborn_weight > weight[animal]:
+            continue
+        weight[animal] -= xi[code] * newborn_weight
+        birth_weight[animal] = newborn_weight
+        births += 1
+    return births
+
+
+@jit
+def die(species, alive, fitness, omega, dead):
+    """
+    :param species: array with the species code of every animal
+    :param alive: boolean array, False for the dead rows to pass over
+    :param fitness: array with the fitness of every animal
+    :param omega: array with the 'omega' of every species
+    :param dead: boolean array, set for every animal dying
+    :return: int, the number of deaths
+
+    Decides which animals die a natural death, by the rules of
+    Animals.will_die_natural_death.
+    """
+    deaths = 0
+    for animal in range(len(species)):
+        if not alive[animal]:
+            continue
+        if fitness[animal] == 0 or \
+                _random.random() < omega[species[animal]] * \
+                (1 - fitness[animal]):
+            dead[animal] = True
+            deaths += 1
+    return deaths
+
+
+@jit
+def migrate(species, alive, cells, fitness, mu, ek, accessible, neighbours):
+    """
+    :param species: array with the species code of every animal
+    :param alive: boolean array, False for the dead rows to pass over
+    :param cells: array with the cell of every animal, updated in place
+    :param fitness: array with the fitness of every animal
+    :param mu: array with the 'mu' of every species
+    :param ek: 2D array with the relative abundance of food of every cell
+        for every species
+    :param accessible: boolean array, True for the accessible cells
+    :param neighbours: array with the offsets from a cell to its neighbours
+    :return: int, the number of animals which moved
+
+    Moves the animals by the rules of Animals.what_cell_to_migrate_to, with
+    the accessible neighbours chosen with probabilities proportional to
+    their ek.
+    """
+    moves = 0
+    for animal in range(len(species)):
+        if not alive[animal]:
+            continue
+        code = species[animal]
+        if _random.random() >= mu[code] * fitness[animal]:
+            continue
+        cell = cells[animal]
+        total = 0.0
+        for offset in neighbours:
+            if accessible[cell + offset]:
+                total += ek[code, cell + offset]
+        if total == 0:
+            continue
+        threshold = _random.random() * total
+        cumulative = 0.0
+        for offset in neighbours:
+            if accessible[cell + offset]:
+                cumulative += ek[code, cell + offset]
+                if threshold < cumulative:
+                    cells[animal] = cell + offset
+                    moves += 1
+                    break
+    return moves
+
+
+@jit
+def hunt_cohorts(herbivores, herbivore_fitness, herbivore_start,
+                 herbivore_stop, carnivores, carnivore_start, carnivore_stop,
+                 age, weight, count, eaten, appetite, beta, delta_phi_max,
+                 phi_age, a_half, phi_weight, w_half):
+    """
+    :param herbivores: array with the herbivore cohorts of the hunting
+        cells, ordered by cell and increasing fitness
+    :param herbivore_fitness: array with the fitness of those cohorts
+    :param herbivore_start: array with the first position of every cell
+        in herbivores
+    :param herbivore_stop: array with the position after the last
+    :param carnivores: array with the carnivore cohorts of the hunting
+        cells, ordered by cell and decreasing fitness
+    :param carnivore_start: array with the first position of every cell
+        in carnivores
+    :param carnivore_stop: array with the position after the last
+    :param age: array with the age of every cohort
+    :param weight: array with the weight of every cohort, updated in place
+        with the mean gain of the carnivores
+    :param count: array with the number of animals in every cohort, updated
+        in place for the herbivores killed
+    :param eaten: array set to the total weight of the herbivores killed by
+        every carnivore cohort
+    :param appetite: float, the carnivore 'F'
+    :param beta: float, the carnivore 'beta'
+    :param delta_phi_max: float, the carnivore 'DeltaPhiMax'
+    :return: int, the number of herbivores killed
+
+    The carnivore cohorts of a cell hunt in turn, the fittest first, going
+    through the herbivore cohorts from the weakest, like the carnivores of
+    the hunt kernel. A herbivore is caught unless every carnivore of the
+    cohort fails to kill it, and no more herbivores are killed than the
+    cohort needs to eat its appetite. The fitness of the cohort is updated
+    with the mean gain of its carnivores.
+    """
+    kills = 0
+    for segment in range(len(herbivore_start)):
+        for position in range(carnivore_start[segment],
+                              carnivore_stop[segment]):
+            carnivore = carnivores[position]
+            num_carnivores = count[carnivore]
+            carnivore_fitness = fitness_value(
+                age[carnivore], weight[carnivore], phi_age, a_half,
+                phi_weight, w_half)
+            demand = appetite * num_carnivores
+            for prey in range(herbivore_start[segment],
+                              herbivore_stop[segment]):
+                if eaten[carnivore] >= demand:
+                    break
+                herbivore = herbivores[prey]
+                if count[herbivore] == 0:
+                    continue
+                difference = carnivore_fitness - herbivore_fitness[prey]
+                if difference < 0:
+                    break
+                probability = 1.0
+                if difference < delta_phi_max:
+                    probability = difference / delta_phi_max
+                caught = 1.0 - (1.0 - probability) ** num_carnivores
+                needed = math.ceil((demand - eaten[carnivore]) /
+                                   weight[herbivore])
+                killed = min(_random.binomial(count[herbivore], caught),
+                             needed)
+                if killed == 0:
+                    continue
+                count[herbivore] -= killed
+                kills += killed
+                eaten[carnivore] += killed * weight[herbivore]
+                weight[carnivore] += beta * killed * weight[herbivore] / \
+                    num_carnivores
+                carnivore_fitness = fitness_value(
+                    age[carnivore], weight[carnivore], phi_age, a_half,
+                    phi_weight, w_half)
+    return kills
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+import numpy as np
+
+
+class Lineage:
+    """
+    Hands out the animal ids and stores the id of every animal's parent in
+    a numpy array indexed by id, so family relations can be found long after
+    the animals have died without keeping them alive. Ids are given out in
+    increasing order, so a parent always has a smaller id than its children.
+    Animals placed on the island have no parent, stored as -1.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        :param capacity: int, the number of animals there is room for before
+            the array has to grow
+
+        Constructor for the Lineage class
+        """
+        self._parents = np.full(capacity, -1, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def parents(self):
+        """Read-only array with the parent id of every animal, indexed by
+        id."""
+        view = self._parents[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def register(self, parent_id=-1):
+        """
+        :param parent_id: int, id of the parent, or -1 for no parent
+        :return: int, the id of the new animal
+
+        Gives out the next id and stores the parent of the animal, doubling
+        the array when it is full.
+        """
+        animal_id = self._size
+        if animal_id == len(self._parents):
+            self._parents = np.concatenate(
+                [self._parents, np.full(len(self._parents), -1,
+                                        dtype=np.int64)])
+        self._parents[animal_id] = parent_id
+        self._size += 1
+        return animal_id
+
+    def register_many(self, parent_ids):
+        """
+        :param parent_ids: numpy array with the id of the parent of every
+            new animal, -1 for no parent
+        :return: numpy array with the ids of the new animals
+
+        Gives out consecutive ids for a batch of animals, growing the array
+        at most once.
+        """
+        first_id = self._size
+        self._size += len(parent_ids)
+        if self._size > len(self._parents):
+            capacity = max(self._size, 2 * len(self._parents))
+            self._parents = np.concatenate(
+                [self._parents, np.full(capacity - len(self._parents), -1,
+                                        dtype=np.int64)])
+        self._parents[first_id:self._size] = parent_ids
+        return np.arange(first_id, self._size, dtype=np.int64)
+
+    def parent(self, animal_id):
+        """
+        :param animal_id: int, id of an animal
+        :return: int, id of the parent, or -1 if the animal has none
+        """
+        return int(self._parents[animal_id])
+
+    def children(self, animal_id):
+        """
+        :param animal_id: int, id of an animal
+        :return: numpy array with the ids of the animal's children
+        """
+        parents = self._parents[animal_id + 1:self._size]
+        return np.flatnonzero(parents == animal_id) + animal_id + 1
+
+    def generations(self):
+        """
+        :return: numpy array with the number of ancestors of every animal,
+            indexed by id
+
+        Found by pointer jumping, so the number of array passes grows with
+        the logarithm of the number of generations.
+        """
+        parents = self._parents[:self._size]
+        depth = (parents >= 0).astype(np.int64)
+        ancestor = parents.copy()
+        has_ancestor = ancestor >= 0
+        while has_ancestor.any():
+            jumping = np.flatnonzero(has_ancestor)
+            depth[jumping] += depth[ancestor[jumping]]
+            ancestor[jumping] = ancestor[ancestor[jumping]]
+            has_ancestor = ancestor >= 0
+        return depth
+
+    def descendant_counts(self):
+        """
+        :return: numpy array with the number of descendants of every animal,
+            indexed by id
+
+        The counts are passed up one generation at a time, starting from
+        the youngest generation.
+        """
+        parents = self._parents[:self._size]
+        depth = self.generations()
+        counts = np.zeros(self._size, dtype=np.int64)
+        order = np.argsort(depth, kind="stable")
+        boundaries = np.searchsorted(depth[order],
+                                     np.arange(depth.max(initial=0) + 2))
+        for generation in range(len(boundaries) - 2, 0, -1):
+            members = order[boundaries[generation]:boundaries[generation + 1]]
+            np.add.at(counts, parents[members], counts[members] + 1)
+        return counts
+
+    def family_tree(self, founder_id):
+        """
+        :param founder_id: int, id of the animal at the root of the tree
+        :return: tuple (ids, parent ids) of numpy arrays with the founder
+            and all its descendants in increasing id order, where every
+            animal but the founder is listed with its parent
+
+        The family is found one generation at a time, looking only at the
+        ids after the founder since children have larger ids than their
+        parents.
+        """
+        parents = self._parents[founder_id:self._size]
+        in_family = np.zeros(len(parents), dtype=bool)
+        in_family[0] = True
+        frontier = np.array([0])
+        offset_parents = parents - founder_id
+        while len(frontier):
+            children = np.flatnonzero(np.isin(offset_parents, frontier) &
+                                      ~in_family)
+            in_family[children] = True
+            frontier = children
+        ids = np.flatnonzero(in_family) + founder_id
+        return ids, self._parents[ids]
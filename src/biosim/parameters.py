@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parameter dictionaries with cached derived constants.
+
+The parameters of a species or landscape stay a dictionary, so they can be
+read and set by name as before, but they also keep an immutable record of
+their values together with constants derived from them, e.g. the breeding
+weight threshold of a species. The hot methods read the record instead of
+looking up and combining several dictionary values on every call. The
+record is a plain attribute, rebuilt on every change, so reading it costs
+no more than a dictionary lookup.
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from collections import namedtuple
+from functools import lru_cache
+import keyword
+
+
+@lru_cache(maxsize=None)
+def _record_type(fields):
+    """
+    :param fields: tuple with the field names of the record
+    :return: namedtuple class with the fields
+    """
+    return namedtuple("Constants", fields)
+
+
+def constants_record(parameters, **derived):
+    """
+    :param parameters: dictionary with the parameters
+    :param derived: the derived constants
+    :return: immutable record with the parameters and the derived constants
+        as attributes, where parameter names which are Python keywords get a
+        trailing underscore, e.g. lambda_
+    """
+    values = {(f"{name}_" if keyword.iskeyword(name) else name): value
+              for name, value in parameters.items()}
+    values.update(derived)
+    return _record_type(tuple(values))(**values)
+
+
+class Parameters(dict):
+    """
+    Dictionary of parameters which keeps a record of its values and the
+    constants derived from them in the attribute constants.
+    """
+
+    def __init__(self, values, derive=constants_record, before_change=None):
+        """
+        :param values: dictionary with the initial parameters
+        :param derive: function making the record of constants from the
+            parameters
+        :param before_change: function called before every change, or None
+
+        Constructor for the Parameters class
+        """
+        super().__init__(values)
+        self._derive = derive
+        self._before_change = before_change
+        self.constants = derive(self)
+        self.version = 0
+
+    def __reduce__(self):
+        return (self.__class__,
+                (dict(self), self._derive, self._before_change))
+
+    def _changing(self):
+        """
+        Runs the before_change function
+        """
+        if self._before_change is not None:
+            self._before_change()
+
+    def _changed(self):
+        """
+        Rebuilds the record of constants and counts the change
+        """
+        self.constants = self._derive(self)
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        self._changing()
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        self._changing()
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        self._changing()
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self, *args):
+        self._changing()
+        value = super().pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        self._changing()
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def clear(self):
+        self._changing()
+        super().clear()
+        self._changed()
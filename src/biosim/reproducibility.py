@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reproducibility harness for the simulation engine.
+
+A set of fixed scenarios is run for a number of years with fixed seeds,
+recording the yearly number of animals per species and the biomass of the
+food chain. The trajectories of the reference engine are stored as golden
+files, together with the parameters they were made with, and must be
+reproduced exactly. Engines that draw their random numbers differently are
+instead compared with the reference engine over many seeds, year by year,
+with two-sample Kolmogorov-Smirnov tests.
+
+The golden files of the test suite are regenerated with::
+
+    python -m biosim.reproducibility tests/golden
+"""
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.animals import SPECIES, Animals
+from biosim.cell_topography import LANDSCAPES
+from biosim.simulation import BioSim
+from contextlib import contextmanager
+import json
+import math
+import os
+import sys
+import textwrap
+import numpy as np
+
+TRAJECTORY_COLUMNS = ["Herbivore", "Carnivore", "biomass_herbs",
+                      "biomass_carnivores", "biomass_fodder"]
+BIOMASS_DECIMALS = 9
+
+
+def _population(location, species, num_animals, age=5, weight=20):
+    """
+    :return: population list for populate_island with num_animals equal
+        animals of a species in one cell
+    """
+    return [{"loc": location,
+             "pop": [{"species": species, "age": age, "weight": weight}
+                     for _ in range(num_animals)]}]
+
+
+GOLDEN_SCENARIOS = {
+    "check_sim": {
+        "island_map": textwrap.dedent("""\
+            OOOOOOOOOOOOOOOOOOOOO
+            OOOOOOOOSMMMMJJJJJJJO
+            OSSSSSJJJJMMJJJJJJJOO
+            OSSSSSSSSSMMJJJJJJOOO
+            OSSSSSJJJJJJJJJJJJOOO
+            OSSSSSJJJDDJJJSJJJOOO
+            OSSJJJJJDDDJJJSSSSOOO
+            OOSSSSJJJDDJJJSOOOOOO
+            OSSSJJJJJDDJJJJJJJOOO
+            OSSSSJJJJDDJJJJOOOOOO
+            OOSSSSJJJJJJJJOOOOOOO
+            OOOSSSSJJJJJJJOOOOOOO
+            OOOOOOOOOOOOOOOOOOOOO"""),
+        "ini_pop": _population((10, 10), "Herbivore", 150),
+        "added_pop": {10: _population((10, 10), "Carnivore", 40)},
+        "seed": 123,
+        "num_years": 25,
+    },
+    "small_mixed": {
+        "island_map": "OOOOO\nOJJSO\nOJSDO\nOOOOO",
+        "ini_pop": _population((1, 1), "Herbivore", 50) +
+        _population((1, 1), "Carnivore", 10),
+        "added_pop": {},
+        "seed": 7,
+        "num_years": 40,
+    },
+}
+
+
+def current_parameters():
+    """
+    :return: dictionary with a copy of the parameters of every species and
+        landscape
+    """
+    return {"animals": {name: dict(species.parameters)
+                        for name, species in SPECIES.items()},
+            "landscapes": {code: dict(landscape.parameters)
+                           for code, landscape in LANDSCAPES.items()
+                           if landscape.parameters is not None}}
+
+
+@contextmanager
+def pinned_parameters(parameters):
+    """
+    :param parameters: dictionary as returned by current_parameters
+
+    Context manager running its body with the given parameters, restoring
+    the parameters in use afterwards.
+    """
+    classes = [(SPECIES[name], values)
+               for name, values in parameters["animals"].items()] + \
+        [(LANDSCAPES[code], values)
+         for code, values in parameters["landscapes"].items()]
+    saved = [(cls, dict(cls.parameters)) for cls, _ in classes]
+    try:
+        for cls, values in classes:
+            for key, value in values.items():
+                cls.parameters[key] = value
+        yield
+    finally:
+        for cls, values in saved:
+            for key, value in values.items():
+                cls.parameters[key] = value
+
+
+def run_trajectory(scenario, seed=None, num_years=None, **sim_kwargs):
+    """
+    :param scenario: dictionary describing the scenario, see
+        GOLDEN_SCENARIOS
+    :param seed: int, seed of the simulation, defaults to the scenario seed
+    :param num_years: int, number of years, defaults to the scenario's
+    :param sim_kwargs: further keyword arguments for BioSim
+    :return: numpy array with one row per year and the TRAJECTORY_COLUMNS
+        as columns
+
+    Runs the scenario from a clean animal registry, adding the scenario's
+    extra populations at the start of their years.
+    """
+    seed = scenario["seed"] if seed is None else seed
+    num_years = scenario["num_years"] if num_years is None else num_years
+    Animals.instances.clear()
+    sim = BioSim(scenario["island_map"], scenario["ini_pop"], seed,
+                 **sim_kwargs)
+    trajectory = np.zeros((num_years, len(TRAJECTORY_COLUMNS)))
+    for year in range(num_years):
+        if year in scenario["added_pop"]:
+            sim.add_population(scenario["added_pop"][year])
+        counts = sim.step().num_animals_per_species
+        biomass = sim.island.biomass_food_chain()
+        trajectory[year] = [counts["Herbivore"], counts["Carnivore"],
+                            biomass["biomass_herbs"],
+                            biomass["biomass_carnivores"],
+                            biomass["biomass_fodder"]]
+    Animals.instances.clear()
+    return trajectory
+
+
+def write_golden(directory, scenarios=None):
+    """
+    :param directory: String, directory to write the golden files to
+    :param scenarios: dictionary {name: scenario}, defaults to
+        GOLDEN_SCENARIOS
+
+    Runs every scenario with the current parameters and writes its
+    trajectory to '<name>.json' in the directory.
+    """
+    scenarios = GOLDEN_SCENARIOS if scenarios is None else scenarios
+    os.makedirs(directory, exist_ok=True)
+    for name, scenario in scenarios.items():
+        golden = {"scenario": name,
+                  "seed": scenario["seed"],
+                  "num_years": scenario["num_years"],
+                  "columns": TRAJECTORY_COLUMNS,
+                  "parameters": current_parameters(),
+                  "trajectory": run_trajectory(scenario).tolist()}
+        with open(os.path.join(directory, f"{name}.json"), "w") as file:
+            json.dump(golden, file, indent=1)
+
+
+def load_golden(path):
+    """
+    :param path: String, path of a golden file
+    :return: dictionary with the content of the file, the trajectory as a
+        numpy array
+    """
+    with open(path) as file:
+        golden = json.load(file)
+    golden["trajectory"] = np.array(golden["trajectory"])
+    return golden
+
+
+def compare_exact(reference, candidate, rtol=1e-9):
+    """
+    :param reference: numpy array, trajectory of the reference engine
+    :param candidate: numpy array, trajectory to check
+    :param rtol: float, relative tolerance for the biomass columns, which
+        covers the last bits of floating point sums on other platforms
+    :return: list of messages, empty if the trajectories are the same
+
+    The animal counts must be identical every year.
+    """
+    if reference.shape != candidate.shape:
+        return [f"shape {candidate.shape} differs from {reference.shape}"]
+    messages = []
+    for column, name in enumerate(TRAJECTORY_COLUMNS):
+        if name in SPECIES:
+            same = reference[:, column] == candidate[:, column]
+        else:
+            same = np.isclose(candidate[:, column], reference[:, column],
+                              rtol=rtol, atol=0)
+        if not same.all():
+            year = int(np.argmin(same))
+            messages.append(f"{name} differs from year {year}: "
+                            f"{candidate[year, column]} != "
+                            f"{reference[year, column]}")
+    return messages
+
+
+def ks_statistic(sample_a, sample_b):
+    """
+    :param sample_a: 1D numpy array
+    :param sample_b: 1D numpy array
+    :return: float, the two-sample Kolmogorov-Smirnov statistic, the
+        largest distance between the empirical distribution functions
+    """
+    sample_a = np.sort(sample_a)
+    sample_b = np.sort(sample_b)
+    values = np.concatenate([sample_a, sample_b])
+    cdf_a = np.searchsorted(sample_a, values, side="right") / len(sample_a)
+    cdf_b = np.searchsorted(sample_b, values, side="right") / len(sample_b)
+    return float(np.abs(cdf_a - cdf_b).max())
+
+
+def compare_statistically(reference_runs, candidate_runs, alpha=0.01,
+                          years=None):
+    """
+    :param reference_runs: numpy array (runs, years, columns) with the
+        trajectories of the reference engine for different seeds
+    :param candidate_runs: numpy array (runs, years, columns) with the
+        trajectories of the engine to check
+    :param alpha: float, the probability of a false alarm over all tests
+    :param years: sequence with the years to test, defaults to all
+    :return: list of messages, empty if no distribution differs
+
+    Tests, for every year and column, whether the two engines give the same
+    distribution of results, with a Bonferroni corrected significance level
+    so alpha holds for the comparison as a whole. The biomass is rounded to
+    micrograms first, so sums which only differ in their last bits, e.g. a
+    running total and the sum of an array, count as equal.
+    """
+    years = range(reference_runs.shape[1]) if years is None else years
+    num_tests = len(years) * len(TRAJECTORY_COLUMNS)
+    num_ref, num_cand = len(reference_runs), len(candidate_runs)
+    critical = math.sqrt(-math.log(alpha / num_tests / 2) / 2) * \
+        math.sqrt((num_ref + num_cand) / (num_ref * num_cand))
+    messages = []
+    for year in years:
+        for column, name in enumerate(TRAJECTORY_COLUMNS):
+            reference = reference_runs[:, year, column]
+            candidate = candidate_runs[:, year, column]
+            if name not in SPECIES:
+                reference = np.round(reference, BIOMASS_DECIMALS)
+                candidate = np.round(candidate, BIOMASS_DECIMALS)
+            statistic = ks_statistic(reference, candidate)
+            if statistic > critical:
+                messages.append(f"{name} in year {year}: KS statistic "
+                                f"{statistic:.3f} > {critical:.3f}")
+    return messages
+
+
+def run_ensemble(scenario, seeds, num_years=None, **sim_kwargs):
+    """
+    :param scenario: dictionary describing the scenario
+    :param seeds: sequence with one seed per run
+    :param num_years: int, number of years, defaults to the scenario's
+    :param sim_kwargs: further keyword arguments for BioSim
+    :return: numpy array (runs, years, columns) with the trajectories
+    """
+    return np.array([run_trajectory(scenario, seed=seed,
+                                    num_years=num_years, **sim_kwargs)
+                     for seed in seeds])
+
+
+if __name__ == "__main__":
+    write_golden(sys.argv[1] if len(sys.argv) > 1 else "golden")
@@ -3,20 +3,34 @@
 __author__ = "Kåre Johnsen & Anders Karlsen"
 __email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
 
-
-import matplotlib.pyplot as plt
 from biosim.island import Island
-from biosim.animals import Herbivores, Carnivores
-from biosim.cell_topography import Jungle, Savanna
-import numpy as np
+from biosim.animals import SPECIES
+from biosim.cell_topography import LANDSCAPES
+from biosim.stop_conditions import StopCondition, Callback
+from biosim.history import HistoryStore
 import random
 import subprocess
+import warnings
 
 # replace this with the ffmpeg directory
 _FFMPEG_BINARY = 'C:/Users/ander/OneDrive/Pictures/simtest/ffmpeeg/ffmpeg.exe'
 
 
+def _pyplot():
+    """
+    :return: the matplotlib.pyplot module
+
+    Imports pyplot on first use, so simulations without graphics never pay
+    for loading matplotlib.
+    """
+    import matplotlib.pyplot as plt
+    return plt
+
+
 class BioSim:
+    history_series = ["Herbivore", "Carnivore", "biomass_carnivores",
+                      "biomass_herbs", "biomass_fodder"]
+
     def __init__(
         self,
         island_map,
@@ -26,6 +40,7 @@ class BioSim:
         cmax_animals=None,
         img_base=None,
         img_fmt="png",
+        engine="object",
     ):
         """
         :param island_map: Multi-line string specifying island geography
@@ -38,6 +53,12 @@ class BioSim:
         :param img_base: String with beginning of file name for figures,
             including path
         :param img_fmt: String with file type for figures, e.g. 'png'
+        :param engine: String, the engine running the island: 'object' for
+            the reference engine with one Python object per animal,
+            'array' for the array engine, 'compact' for the array engine
+            with 32 bit weights and fitness, 'numba' for the array engine
+            compiled with numba, or 'cohort' for the approximate cohort
+            engine for very large populations
 
         If ymax_animals is None, the y-axis limit will be adjusted dynamically.
 
@@ -52,9 +73,15 @@ class BioSim:
 
         where img_no are consecutive image numbers starting from 0.
         img_base should contain a path and beginning of a file name.
+
+        The 'numba' engine falls back to the object engine with a warning
+        when numba is not installed. The array engines follow the same rules
+        as the object engine, but draw their random numbers differently. The
+        cohort engine approximates the rules, following groups of similar
+        animals instead of individuals.
         """
-        self.island = Island(island_map)
         random.seed(seed)
+        self.island = self._island_class(engine)(island_map)
         self.add_population(ini_pop)
         self._current_year = 0
         self._final_year = None
@@ -84,10 +111,40 @@ class BioSim:
         self._carn_cbar_ax = None
         self.rgb_map = self._create_color_map(island_map)
 
-        # Data variables for plots to be updated continuously
-        self.y_stack = None
-        self.herb_y = []
-        self.carn_y = []
+        # Conditions ending a simulation early
+        self.stop_conditions = []
+        self.stop_reason = None
+
+        # Memory bounded history of the yearly totals, used by the plots
+        self.history = HistoryStore(self.history_series)
+        self._pop_plot_lines = None
+
+    @staticmethod
+    def _island_class(engine):
+        """
+        :param engine: String, name of the engine
+        :return: the island class of the engine
+
+        The array engine is imported only when chosen, since importing
+        numba is slow.
+        """
+        if engine == "object":
+            return Island
+        if engine in ("array", "numba"):
+            from biosim.array_engine import ArrayIsland
+            from biosim.kernels import JIT_AVAILABLE
+            if engine == "numba" and not JIT_AVAILABLE:
+                warnings.warn("numba is not installed, the object engine is "
+                              "used instead")
+                return Island
+            return ArrayIsland
+        if engine == "compact":
+            from biosim.array_engine import CompactArrayIsland
+            return CompactArrayIsland
+        if engine == "cohort":
+            from biosim.cohort_engine import CohortIsland
+            return CohortIsland
+        raise ValueError(f"{engine} is not an available engine")
 
     def _setup_sim_window(self):
         """
@@ -95,6 +152,7 @@ class BioSim:
         different plots and heatmaps. Also does some setup regarding the
         subplot parameters.
         """
+        plt = _pyplot()
         plt.ion()
         # setup main window figure
         if self._sim_window_fig is None:
@@ -178,55 +236,78 @@ class BioSim:
 
     def _update_population_plot(self):
         """
-        Takes the total number of animal per species for the year it is called
-        and appends them to the population plot y values, then plots the plot.
-        if ymax is not set it adjusts the ymax the biggest value plotted + 500
-        """
-        carn_count, herb_count = self.island.total_number_per_species(
-                                                                    ).values()
-        self.carn_y.append(carn_count)
-        self.herb_y.append(herb_count)
-        self._pop_plot_ax.plot(range(0, self._current_year + 1),
-                               self.herb_y, 'red', self.carn_y, 'lawngreen'
-                               )
+        Plots the total number of animals per species from the history. The
+        lines are created the first time and get new data for subsequent
+        calls. If ymax is not set it adjusts the ymax to the biggest value
+        recorded + 500
+        """
+        years, _, herb_y, _ = self.history.aggregates('Herbivore')
+        _, _, carn_y, _ = self.history.aggregates('Carnivore')
+        if self._pop_plot_lines is None:
+            self._pop_plot_lines = self._pop_plot_ax.plot(
+                years, herb_y, 'red', years, carn_y, 'lawngreen')
+        else:
+            herb_line, carn_line = self._pop_plot_lines
+            herb_line.set_data(years, herb_y)
+            carn_line.set_data(years, carn_y)
         if self.ymax_animals is None:
+            summary = self.history.summary()
             self._pop_plot_ax.set_ylim(
-                0, max(max(self.herb_y), max(self.carn_y)) + 500)
+                0, max(summary['Herbivore']['max'],
+                       summary['Carnivore']['max']) + 500)
 
     def _instantiate_stacked_area(self):
         """
-        Starts the stacked area plot "y" with nan values for the for length of
-        num_years (in simulate(num_years)) when simulate is first called
-        and appends to the existing "y" when called subsequently. When
-        first instantiated it also sets some parameters for the plot,
-        and adds a legend.
+        Creates the stacked area plot with a legend when simulate is first
+        called, and extends the x-axis to the final year of the current
+        simulation.
         """
         if self._stack_area_obj is None:
-            nanstack = np.full(self._final_year, np.nan)
-            self.y_stack = np.vstack([nanstack, nanstack, nanstack])
             self._stack_area_obj = self._stack_area_ax.stackplot(
-                np.arange(0, self._final_year), self.y_stack,
+                *self._biomass_history(),
                 colors=['red', 'lawngreen', 'green'],
                 labels=["Carnivores", "Herbivores", "Fodder"]
             )
             self._stack_area_ax.legend(fontsize='small', borderpad=0.1, loc=2)
-        else:
-            nanstack = np.full(self._final_year-self._current_year, np.nan)
-            new_empty_values = np.vstack([nanstack, nanstack, nanstack])
-            self.y_stack = np.append(self.y_stack, new_empty_values, axis=1)
+        self._stack_area_ax.set_xlim(0, self._final_year)
+
+    def _biomass_history(self):
+        """
+        :return: tuple (years, carnivore biomass, herbivore biomass, fodder)
+            with the yearly means from the history
+        """
+        years, _, carn_biomass, _ = self.history.aggregates(
+            'biomass_carnivores')
+        _, _, herb_biomass, _ = self.history.aggregates('biomass_herbs')
+        _, _, fodder, _ = self.history.aggregates('biomass_fodder')
+        return years, carn_biomass, herb_biomass, fodder
 
     def _update_stacked_area(self):
         """
-        Gets the current years biomass in a dictionary from
-        "biomass_food_chain()" and updates the values form the stacked plot
+        Replaces the stacked area plot with the biomass history
+        """
+        for collection in self._stack_area_obj:
+            collection.remove()
+        self._stack_area_obj = self._stack_area_ax.stackplot(
+            *self._biomass_history(), colors=['red', 'lawngreen', 'green'])
+
+    def _record_history(self, snapshot):
+        """
+        :param snapshot: YearSnapshot of the island after the year
+
+        Adds the number of animals per species and the biomass of the food
+        chain of the year just simulated to the history. The numbers of
+        animals and the fodder are taken from the snapshot, made from the
+        density grids and the running fodder total, so only the weights of
+        the animals are summed.
         """
-        biomassdict = self.island.biomass_food_chain()
-        self.y_stack[0][self._current_year] = biomassdict["biomass_carnivores"]
-        self.y_stack[1][self._current_year] = biomassdict["biomass_herbs"]
-        self.y_stack[2][self._current_year] = biomassdict["biomass_fodder"]
-        self._stack_area_ax.stackplot(np.arange(0, self._final_year),
-                                      self.y_stack,
-                                      colors=['red', 'lawngreen', 'green'])
+        counts = snapshot.num_animals_per_species
+        biomass = self.island.species_biomass()
+        self.history.append(self.island.current_year,
+                            [counts['Herbivore'], counts['Carnivore'],
+                             biomass[SPECIES['Carnivore'].species_code],
+                             biomass[SPECIES['Herbivore'].species_code],
+                             snapshot.total_fodder])
 
     def _update_heatmap_herb(self, array):
         """
@@ -242,7 +323,7 @@ class BioSim:
             self._heat_herb_obj = self._heat_herb_ax.imshow(
                 array, interpolation='nearest', vmax=200, cmap='inferno'
             )
-            herb_cbar = plt.colorbar(
+            herb_cbar = _pyplot().colorbar(
                 self._heat_herb_obj, cax=self._herb_cbar_ax,
                 shrink=0.5, orientation='horizontal'
             )
@@ -267,7 +348,7 @@ class BioSim:
             self._heat_carn_obj = self._heat_carn_ax.imshow(
                 array, interpolation='nearest', vmax=200, cmap='inferno'
             )
-            carn_cbar = plt.colorbar(
+            carn_cbar = _pyplot().colorbar(
                 self._heat_carn_obj, cax=self._carn_cbar_ax,
                 shrink=0.5, orientation='horizontal'
             )
@@ -287,7 +368,7 @@ class BioSim:
         """
         herb_pop_per_age, carn_pop_per_age, herb_mean_w, carn_mean_w = \
             self.island.population_biomass_age_groups()
-        age = ["0-1", "2-5", "5-10", "10-15", "15+"]
+        age = self.island.age_group_labels()
         [rectangle.remove() for rectangle in reversed(
                                                 self._pop_pyram_obj.patches)]
         self._pop_pyram_ax.cla()
@@ -308,8 +389,10 @@ class BioSim:
             rectangle.set_x(rectangle.get_width() + 1)
             rectangle.set_width(1)
 
-    def _update_sim_window(self):
+    def _update_sim_window(self, year):
         """
+        :param year: int, the year shown in the year counter
+
         This updates the main figure window the current years data.
         """
         herb_array, carn_array = self.island.arrays_for_heatmap()
@@ -318,8 +401,8 @@ class BioSim:
         self._update_heatmap_carn(carn_array)
         self._update_population_plot()
         self._update_stacked_area()
-        self._year_ax.set_text(f'Year {self._current_year}')
-        plt.pause(1e-6)
+        self._year_ax.set_text(f'Year {year}')
+        _pyplot().pause(1e-6)
 
     @staticmethod
     def _create_color_map(island_map_string):
@@ -348,12 +431,9 @@ class BioSim:
 
         Set parameters for animal species.
         """
-        if species == "Herbivore":
-            Herbivores.set_parameters(params)
-        elif species == "Carnivore":
-            Carnivores.set_parameters(params)
-        else:
+        if species not in SPECIES:
             raise ValueError(f"{species} is not a species in this simulation")
+        SPECIES[species].set_parameters(params)
 
     @staticmethod
     def set_landscape_parameters(landscape, params):
@@ -363,14 +443,12 @@ class BioSim:
 
         Set parameters for landscape type.
         """
-        if landscape == "J":
-            Jungle.set_parameters(params)
-        elif landscape == "S":
-            Savanna.set_parameters(params)
-        else:
+        if landscape not in LANDSCAPES or \
+                LANDSCAPES[landscape].parameters is None:
             raise ValueError(
                 f"{landscape} is not an acceptable"
                 f" landscape code for setting parameters")
+        LANDSCAPES[landscape].set_parameters(params)
 
     def simulate(self, num_years, vis_years=1, img_years=None):
         """
@@ -381,19 +459,116 @@ class BioSim:
 
         Run simulation while visualizing the result.
         Image files will be numbered consecutively.
+
+        The simulation ends before num_years if one of the stop conditions
+        is met, the condition is then found in stop_reason.
         """
         if img_years is None:
             img_years = vis_years
         self._final_year = self._current_year + num_years
         self._setup_sim_window()
-        while self._current_year < self._final_year:
-            self.island.annual_cycle()
-            if self._current_year % vis_years == 0:
-                self._update_sim_window()
+        self._reset_stop_conditions()
+        for year, _ in self._iter_years(num_years):
+            if year % vis_years == 0:
+                self._update_sim_window(year)
             self._sim_window_fig.canvas.draw()
-            if self._current_year % img_years == 0:
+            if year % img_years == 0:
                 self._save_graphics()
+
+    def _iter_years(self, num_years=None):
+        """
+        :param num_years: number of years to simulate, or None to go on
+            until the caller stops
+        :return: generator yielding the number of the year before it was
+            simulated and the YearSnapshot after it
+
+        Runs the annual cycles of the island through Island.iter_cycles,
+        and keeps the books of every year for simulate, step and stream:
+        the year is counted and added to the history before it is handed
+        over, and the years end after the one where a stop condition is met.
+        """
+        for snapshot in self.island.iter_cycles(num_years):
+            year = self._current_year
             self._current_year += 1
+            self._record_history(snapshot)
+            yield year, snapshot
+            if self.stop_conditions and self._stop_condition_met(snapshot):
+                return
+
+    def add_stop_condition(self, condition):
+        """
+        :param condition: StopCondition, or a callable taking a YearSnapshot
+            and returning True when the simulation should stop
+
+        Adds a condition which is checked after every simulated year by
+        simulate, step and stream.
+        """
+        if not isinstance(condition, StopCondition):
+            if not callable(condition):
+                raise ValueError(
+                    "A stop condition must be a StopCondition or callable")
+            condition = Callback(condition)
+        self.stop_conditions.append(condition)
+
+    def clear_stop_conditions(self):
+        """Removes all stop conditions."""
+        self.stop_conditions = []
+
+    def _reset_stop_conditions(self):
+        """
+        Resets the stop conditions and the stop reason before a simulation.
+        """
+        self.stop_reason = None
+        for condition in self.stop_conditions:
+            condition.reset()
+
+    def _stop_condition_met(self, snapshot):
+        """
+        :param snapshot: YearSnapshot of the island after the year
+        :return: boolean, True if one of the stop conditions is met
+
+        The first condition met is stored in stop_reason.
+        """
+        for condition in self.stop_conditions:
+            if condition.is_met(snapshot):
+                self.stop_reason = condition
+                return True
+        return False
+
+    def step(self):
+        """
+        :return: YearSnapshot with the state of the island after the year
+
+        Simulates a single year without any visualization. The year is
+        added to the history as in simulate, and the stop conditions are
+        checked after it, so a condition met is found in stop_reason. The
+        conditions are not reset, so they keep counting over several steps.
+        """
+        for _, snapshot in self._iter_years(1):
+            pass
+        return snapshot
+
+    def stream(self, num_years=None):
+        """
+        :param num_years: number of years to simulate, or None to go on
+            until the caller stops
+        :return: generator yielding a YearSnapshot for every simulated year
+
+        Simulates year by year without visualization, handing over a small
+        snapshot after each year. The years are added to the fixed size
+        history as in simulate, and the caller decides what else to store
+        and can stop early by breaking out of the loop, e.g.::
+
+            for snapshot in sim.stream():
+                if snapshot.num_animals_per_species['Carnivore'] == 0:
+                    break
+
+        The stream also ends after the year where one of the stop conditions
+        is met.
+        """
+        self._reset_stop_conditions()
+        for _, snapshot in self._iter_years(num_years):
+            yield snapshot
 
     def add_population(self, population):
         """
@@ -424,6 +599,73 @@ class BioSim:
          for each cell on island."""
         return self.island.per_cell_count_pandas_dataframe()
 
+    def get_animal_distribution(self, cells="all"):
+        """
+        :param cells: String, which cells to include: 'all', 'accessible'
+            or 'populated' for only the cells with animals
+        :return: Pandas DataFrame with animal count per species for the
+            selected cells
+
+        Like animal_distribution, but for a selection of the cells. The
+        DataFrame is cached until the next simulated year or added
+        population.
+        """
+        return self.island.per_cell_count_pandas_dataframe(cells)
+
+    def enable_instrumentation(self, stats_file=None, log=False):
+        """
+        :param stats_file: String, path of a csv file for the yearly records,
+            or None for no file
+        :param log: boolean, if True the yearly records are emitted to the
+            'biosim.instrumentation' logger
+
+        Starts recording the wall time of every phase of the annual cycle
+        along with yearly counters of births, natural deaths, kills,
+        migrations and fodder consumed.
+        """
+        self.island.enable_instrumentation(stats_file=stats_file, log=log)
+
+    def disable_instrumentation(self):
+        """Stops recording phase timings and event counters."""
+        self.island.disable_instrumentation()
+
+    def enable_event_log(self, path=None, buffer_size=65536):
+        """
+        :param path: String, path of the binary file for the records, or
+            None to keep them in memory
+        :param buffer_size: int, number of records buffered before writing
+        :return: the EventLog recording the events
+
+        Starts recording every birth, natural death, kill and migration as
+        fixed width records, see biosim.event_log. The cohort engine does
+        not follow individual animals and raises ValueError.
+        """
+        return self.island.enable_event_log(path=path,
+                                            buffer_size=buffer_size)
+
+    def disable_event_log(self):
+        """Stops recording events and writes the remaining records."""
+        self.island.disable_event_log()
+
+    @property
+    def event_log(self):
+        """The EventLog recording the events, or None if disabled."""
+        return self.island.event_log
+
+    @property
+    def lineage(self):
+        """The Lineage with the parent of every animal of this simulation,
+        for family queries."""
+        return self.island.lineage
+
+    @property
+    def cycle_statistics(self):
+        """List with one dictionary of phase timings and event counters per
+        instrumented year."""
+        if self.island.statistics is None:
+            return []
+        return self.island.statistics.records
+
     def make_movie(self):
         """Create MPEG4 movie from visualization images saved."""
         if self._img_base is None:
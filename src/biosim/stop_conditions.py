@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from abc import ABC, abstractmethod
+
+
+class StopCondition(ABC):
+    """
+    Abstract superclass for the conditions that end a simulation before the
+    requested number of years. A condition is checked once a year against
+    the YearSnapshot of the island, so it only looks at the yearly totals.
+    Subclasses implement is_met.
+    """
+
+    def reset(self):
+        """
+        Forgets what the condition has seen, called when a new simulation
+        starts.
+        """
+        pass
+
+    @abstractmethod
+    def is_met(self, snapshot):
+        """
+        :param snapshot: YearSnapshot of the island after the year
+        :return: boolean, True if the simulation should stop
+        """
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class Extinction(StopCondition):
+    """
+    Stops the simulation when one of the given species has died out.
+    """
+
+    def __init__(self, species=None):
+        """
+        :param species: list with the names of the species to watch, or
+            None to stop only when there are no animals left at all
+
+        Constructor for the Extinction class
+        """
+        self.species = species
+
+    def is_met(self, snapshot):
+        """
+        :param snapshot: YearSnapshot of the island after the year
+        :return: boolean, True if a watched species has no animals left
+        """
+        counts = snapshot.num_animals_per_species
+        if self.species is None:
+            return sum(counts.values()) == 0
+        return any(counts[species] == 0 for species in self.species)
+
+    def __repr__(self):
+        return f"Extinction(species={self.species})"
+
+
+class SteadyState(StopCondition):
+    """
+    Stops the simulation when the population of every watched species has
+    stayed within a tolerance band for a number of consecutive years. Years
+    without any animals of the watched species are not counted as steady,
+    so use Extinction to stop when they have died out.
+    """
+
+    def __init__(self, tolerance=0.05, years=10, species=None):
+        """
+        :param tolerance: float, relative width of the band around the
+            population at the start of the stable period
+        :param years: int, number of years the populations must stay in the
+            band
+        :param species: list with the names of the species to watch, or
+            None for every species
+
+        Constructor for the SteadyState class
+        """
+        if tolerance < 0:
+            raise ValueError("The tolerance cannot be negative")
+        if years < 1:
+            raise ValueError("The number of years must be at least 1")
+        self.tolerance = tolerance
+        self.years = years
+        self.species = species
+        self._reference = None
+        self._stable_years = 0
+
+    def reset(self):
+        """
+        Forgets the reference populations and the stable years counted.
+        """
+        self._reference = None
+        self._stable_years = 0
+
+    def _counts(self, snapshot):
+        """
+        :param snapshot: YearSnapshot of the island after the year
+        :return: dictionary {species: individuals} of the watched species
+        """
+        counts = snapshot.num_animals_per_species
+        if self.species is None:
+            return counts
+        return {species: counts[species] for species in self.species}
+
+    def _within_band(self, counts):
+        """
+        :param counts: dictionary {species: individuals}
+        :return: boolean, True if all counts are within the band around the
+            reference populations
+        """
+        return all(abs(count - self._reference[species])
+                   <= self.tolerance * self._reference[species]
+                   for species, count in counts.items())
+
+    def is_met(self, snapshot):
+        """
+        :param snapshot: YearSnapshot of the island after the year
+        :return: boolean, True if the populations have been within the band
+            for the given number of years
+
+        A population leaving the band starts a new stable period with the
+        current populations as reference, and a year without animals starts
+        over without reference.
+        """
+        counts = self._counts(snapshot)
+        if sum(counts.values()) == 0:
+            self.reset()
+            return False
+        if self._reference is None or not self._within_band(counts):
+            self._reference = counts
+            self._stable_years = 0
+            return False
+        self._stable_years += 1
+        return self._stable_years >= self.years
+
+    def __repr__(self):
+        return (f"SteadyState(tolerance={self.tolerance}, "
+                f"years={self.years}, species={self.species})")
+
+
+class Callback(StopCondition):
+    """
+    Stops the simulation when a user supplied function returns True.
+    """
+
+    def __init__(self, function):
+        """
+        :param function: callable taking a YearSnapshot and returning True
+            when the simulation should stop
+
+        Constructor for the Callback class
+        """
+        self.function = function
+
+    def is_met(self, snapshot):
+        """
+        :param snapshot: YearSnapshot of the island after the year
+        :return: boolean, the result of the user function
+        """
+        return bool(self.function(snapshot))
+
+    def __repr__(self):
+        return f"Callback({self.function!r})"
@@ -82,23 +82,20 @@ def test_natural_death(strong_vs_weak):
 def test_fit_carnivore_kills_unfit_herbivore(strong_vs_weak):
     """
     Test that a carnivore can only kill a certain amount of herbivores per
-    year, gains the expected amount of weight, can reset its eaten_this_year-
-    variable and checks that the carnivore always eat when the 'DeltaPhiMax'-
-    parameter is set to 0
+    year, gains the expected amount of weight and checks that the carnivore
+    always eat when the 'DeltaPhiMax'-parameter is set to 0
     """
-    assert strong_vs_weak[1].eaten_this_year == 0
     n = 1000
-    kill_rate = [strong_vs_weak[1].kills_herbivore(strong_vs_weak[0]) for _ in
-                 range(n)]
-    amount = kill_rate.count(True)
+    eaten_this_year = 0
+    amount = 0
+    for _ in range(n):
+        if strong_vs_weak[1].kills_herbivore(strong_vs_weak[0],
+                                             eaten_this_year):
+            eaten_this_year += strong_vs_weak[0].weight
+            amount += 1
     assert amount == 50
-    assert strong_vs_weak[1].eaten_this_year == 50
+    assert eaten_this_year == 50
     assert strong_vs_weak[1].weight == 15 + (amount * 1 * 0.75)
-    # Resets the amount_eaten_this_year to 0, and check if the carnivore's
-    # eaten_this_year == 0 and that the weight not are effected by this.
-    strong_vs_weak[1].reset_amount_eaten_this_year()
-    assert strong_vs_weak[1].eaten_this_year == 0
-    assert strong_vs_weak[1].weight == 15 + (amount*1*0.75)
     # Test when carnivore.fitness - herbivore.fitness) >
     # self.parameters["DeltaPhiMax"]
     strong_vs_weak[1].weight = 10
@@ -253,9 +250,6 @@ def test_what_cell_one_option(certain_migration_prob_herb, mock_ek):
     chosen_cell = certain_migration_prob_herb.what_cell_to_migrate_to((10, 10),
                                                                       mock_ek)
     assert chosen_cell == (11, 10)
-    assert certain_migration_prob_herb.has_tried_migration_this_year
-    ani.Animals.reset_migration_attempt()
-    assert certain_migration_prob_herb.has_tried_migration_this_year is False
 
 
 def test_what_cell_no_options(certain_migration_prob_herb):
@@ -287,6 +281,12 @@ def test_what_cell_two_options_equal_probability():
     times_11_10_chosen = decisionlist.count((11, 10))
     assert 490 < times_11_10_chosen < 510
 
+
+def test_animals_have_no_instance_dict():
+    """Tests that the animals are stored compactly in slots"""
+    assert not hasattr(ani.Herbivores(), "__dict__")
+    assert not hasattr(ani.Carnivores(), "__dict__")
+
 # Annual weight decrease, age up
 
 
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.array_engine import (ArrayIsland, CompactArrayIsland,
+                                 PopulationStore)
+from biosim.island import Island
+from biosim.simulation import BioSim
+from biosim.reproducibility import (GOLDEN_SCENARIOS, load_golden,
+                                    pinned_parameters, run_ensemble,
+                                    compare_statistically)
+from biosim import kernels
+import biosim.animals as ani
+import numpy as np
+import os
+import pytest
+
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(__file__), "golden")
+
+
+@pytest.fixture
+def array_island():
+    """An array island with herbivores and carnivores in two cells"""
+    island = ArrayIsland("OOOOO\nOJSMO\nOJDOO\nOOOOO", seed=1)
+    island.populate_island(
+        [{'loc': (1, 1),
+          'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 40}
+                  for _ in range(30)] +
+                 [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                  for _ in range(5)]},
+         {'loc': (2, 2),
+          'pop': [{'species': 'Herbivore', 'age': 1, 'weight': None}
+                  for _ in range(10)]}])
+    return island
+
+
+def test_populate_array_island(array_island):
+    """Tests that the animals are stored with their cells and counted in
+    the density grids"""
+    assert len(array_island.store) == 45
+    assert array_island.total_number_per_species() == {'Herbivore': 40,
+                                                       'Carnivore': 5}
+    assert array_island.density_grid('Herbivore')[2, 2] == 10
+    assert array_island.raster_model[(1, 1)].herbivore_list == []
+    assert np.all(array_island.store.weight > 0)
+    with pytest.raises(ValueError):
+        array_island.populate_island(
+            [{'loc': (1, 3), 'pop': [{'species': 'Herbivore', 'age': 1,
+                                      'weight': 10}]}])
+
+
+def test_missing_weights_follow_the_engine_seed(monkeypatch):
+    """Tests that the weights drawn for animals without weight come from
+    the seeded random numbers of the engine"""
+    monkeypatch.setitem(ani.Herbivores.parameters, "w_birth", 8.0)
+    monkeypatch.setitem(ani.Herbivores.parameters, "sigma_birth", 1.5)
+    population = [{'loc': (1, 1),
+                   'pop': [{'species': 'Herbivore', 'age': 1, 'weight': None}
+                           for _ in range(10)]}]
+    weights = []
+    for seed in (4, 4, 5):
+        island = ArrayIsland("OOO\nOJO\nOOO", seed=seed)
+        island.populate_island(population)
+        weights.append(island.store.weight[island.store.alive].copy())
+    np.testing.assert_array_equal(weights[0], weights[1])
+    assert not np.array_equal(weights[0], weights[2])
+
+
+@pytest.mark.skipif(kernels.JIT_AVAILABLE,
+                    reason="compiled kernels use the generator of numba")
+def test_array_island_leaves_global_random_state_alone(array_island):
+    """Tests that seeding and running the array engine does not touch the
+    global NumPy generator"""
+    np.random.seed(7)
+    expected = np.random.random()
+    np.random.seed(7)
+    ArrayIsland("OOO\nOJO\nOOO", seed=3)
+    array_island.annual_cycle()
+    assert np.random.random() == expected
+
+
+def test_graze_fittest_first():
+    """Tests that the herbivores eat in the given order until the fodder
+    is gone"""
+    weight = np.array([10.0, 10.0, 10.0])
+    fodder = np.array([15.0])
+    kernels.graze(np.array([2, 0, 1]), np.zeros(3, dtype=np.int64), weight,
+                  fodder, np.array([0]), 10.0, 0.5)
+    np.testing.assert_array_equal(weight, [12.5, 10, 15])
+    assert fodder[0] == 0
+
+
+def test_hunt_until_appetite_is_met():
+    """Tests that a much fitter carnivore kills the weakest herbivores until
+    it has eaten its appetite"""
+    age = np.array([5, 5, 5, 5])
+    weight = np.array([30.0, 30.0, 30.0, 60.0])
+    killer = np.full(4, -1)
+    kills = kernels.hunt(np.array([0, 1, 2]), np.array([0.1, 0.2, 0.3]),
+                         np.array([0]), np.array([3]), np.array([3]),
+                         np.array([0]), np.array([1]), age, weight, killer,
+                         50.0, 0.75, 0.0001, 0.4, 60.0, 0.4, 4.0)
+    assert kills == 2
+    np.testing.assert_array_equal(killer, [3, 3, -1, -1])
+    assert weight[3] == 60 + 0.75 * 60
+
+
+def test_engines_kill_the_same_herbivores(monkeypatch):
+    """Tests that a carnivore certain to kill takes the same herbivores in
+    the object and the array engine, also the one right after a kill"""
+    monkeypatch.setitem(ani.Carnivores.parameters, "DeltaPhiMax", 0.0001)
+    monkeypatch.setitem(ani.Carnivores.parameters, "F", 4.0)
+    population = [{'loc': (1, 1),
+                   'pop': [{'species': 'Herbivore', 'age': 5, 'weight': w}
+                           for w in (3.0, 1.0, 4.0, 2.0)] +
+                          [{'species': 'Carnivore', 'age': 5, 'weight': 60}]}]
+    survivors = []
+    for island in (Island("OOO\nODO\nOOO"),
+                   ArrayIsland("OOO\nODO\nOOO", seed=1)):
+        island.populate_island(population)
+        island._feed_all_animals()
+        _, weights = island._species_age_and_weight(
+            ani.Herbivores.species_code)
+        survivors.append(sorted(weights))
+    assert survivors[0] == survivors[1] == [4.0]
+
+
+def test_die_without_fitness():
+    """Tests that animals without fitness always die, and that dead rows
+    are passed over"""
+    dead = np.zeros(4, dtype=bool)
+    kernels.die(np.zeros(4, dtype=np.int64),
+                np.array([True, True, True, False]),
+                np.array([0.0, 1.0, 0.0, 0.0]), np.array([0.4]), dead)
+    np.testing.assert_array_equal(dead, [True, False, True, False])
+
+
+def test_migrate_to_only_accessible_neighbour():
+    """Tests that migrating animals move to the accessible neighbour with
+    food"""
+    accessible = np.zeros(9, dtype=bool)
+    accessible[[4, 5]] = True
+    ek = np.ones((1, 9))
+    cells = np.array([4, 4])
+    moves = kernels.migrate(np.zeros(2, dtype=np.int64),
+                            np.ones(2, dtype=bool), cells,
+                            np.array([1.0, 0.0]), np.array([10.0]), ek,
+                            accessible, np.array([3, -3, 1, -1]))
+    assert moves == 1
+    np.testing.assert_array_equal(cells, [5, 4])
+
+
+def test_array_island_annual_cycle_counters(array_island):
+    """Tests that the instrumented cycle of the array engine counts the
+    events, and the reporting methods follow the store"""
+    array_island.enable_instrumentation()
+    before = len(array_island.store)
+    array_island.annual_cycle()
+    record = array_island.statistics.records[0]
+    assert before + record["births"] - record["kills"] - \
+        record["natural_deaths"] == len(array_island.store)
+    assert array_island.snapshot().num_animals == len(array_island.store)
+    numbers, _ = array_island.age_group_statistics('Herbivore')
+    assert numbers.sum() == \
+        array_island.total_number_per_species()['Herbivore']
+    assert array_island.per_cell_count_pandas_dataframe()[
+        ["Herbivore", "Carnivore"]].to_numpy().sum() == len(
+        array_island.store)
+
+
+def test_newborns_registered_with_parents(array_island):
+    """Tests that the newborns of the array engine get their mothers as
+    parents in the lineage"""
+    ids_before = set(array_island.store.id)
+    array_island._breed_in_all_cells()
+    newborns = [animal_id for animal_id in array_island.store.id
+                if animal_id not in ids_before]
+    assert newborns
+    assert all(ani.Animals.lineage.parent(animal_id) in ids_before
+               for animal_id in newborns)
+
+
+def test_density_grids_follow_single_phases(array_island):
+    """Tests that the density grids read between the phases of the annual
+    cycle count the animals as they are"""
+    herb_grid = array_island.density_grid('Herbivore')
+    array_island._breed_in_all_cells()
+    array_island._migrate_all_cells()
+    assert array_island.per_cell_count_pandas_dataframe().Herbivore.sum() == \
+        array_island.total_number_per_species()['Herbivore']
+    np.testing.assert_array_equal(
+        herb_grid.ravel(),
+        array_island.store.cell_counts()[ani.Herbivores.species_code])
+
+
+def test_store_grouped_by_cell(array_island):
+    """Tests that the store keeps the animals grouped by species and cell,
+    with the offsets following removals, and groups them again after a
+    migration"""
+    store = array_island.store
+    assert store.grouped
+    keys = store.species * store.num_cells + store.cell
+    assert np.all(np.diff(keys) >= 0)
+    np.testing.assert_array_equal(
+        store.cell_counts().ravel(),
+        np.bincount(keys, minlength=len(store.offsets) - 1))
+    store.remove(np.arange(len(store)) % 3 == 0)
+    np.testing.assert_array_equal(
+        np.diff(store.offsets),
+        np.bincount(store.species * store.num_cells + store.cell,
+                    minlength=len(store.offsets) - 1))
+    herbivores = store.of_species(ani.Herbivores.species_code)
+    assert np.all(store.species[herbivores] ==
+                  ani.Herbivores.species_code)
+    store.cell[:2] = 3
+    store.cells_changed()
+    assert not store.grouped
+    counts = store.cell_counts()
+    array_island._update_density_grids()
+    assert store.grouped
+    np.testing.assert_array_equal(store.cell_counts(), counts)
+    assert np.all(np.diff(store.species * store.num_cells + store.cell) >= 0)
+
+
+def test_store_reuses_dead_rows():
+    """Tests that the store reuses the rows of removed animals, grows its
+    capacity geometrically and compacts only when many rows are dead"""
+    store = PopulationStore(num_cells=4)
+
+    def add(num_animals):
+        store.add(np.zeros(num_animals, dtype=np.int64),
+                  np.ones(num_animals), np.full(num_animals, 10.0),
+                  np.arange(num_animals) % 4)
+
+    add(10)
+    assert store.metrics()["capacity"] == PopulationStore.initial_capacity
+    store.remove(np.arange(10) < 2)
+    assert len(store) == 8 and store.num_rows == 10
+    assert store.metrics()["free"] == 2
+    add(3)
+    assert len(store) == 11 and store.num_rows == 11
+    assert store.alive.all() and store.metrics()["compactions"] == 0
+    store.remove(np.arange(11) % 2 == 0)
+    metrics = store.metrics()
+    assert metrics["compactions"] == 1 and metrics["free"] == 0
+    assert store.num_rows == len(store) == 5
+    add(200)
+    metrics = store.metrics()
+    assert metrics["capacity"] == 4 * PopulationStore.initial_capacity
+    assert metrics["live"] == 205 and metrics["growths"] == 2
+    np.testing.assert_array_equal(store.cell_counts()[0],
+                                  np.bincount(store.cell, minlength=4))
+
+
+def test_counting_sort_is_stable():
+    """Tests that the counting sort kernel orders the rows like a stable
+    sort"""
+    keys = np.random.default_rng(2).integers(0, 7, 200)
+    offsets = np.zeros(8, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=7), out=offsets[1:])
+    np.testing.assert_array_equal(kernels.counting_sort(keys, offsets),
+                                  np.argsort(keys, kind="stable"))
+
+
+def test_array_engine_agrees_with_reference_engine():
+    """Tests that the array engine gives the same distribution of yearly
+    counts and biomass as the object engine"""
+    golden = load_golden(os.path.join(GOLDEN_DIRECTORY, "small_mixed.json"))
+    scenario = GOLDEN_SCENARIOS["small_mixed"]
+    with pinned_parameters(golden["parameters"]):
+        reference = run_ensemble(scenario, range(15), num_years=12)
+        candidate = run_ensemble(scenario, range(15), num_years=12,
+                                 engine="array")
+    assert compare_statistically(reference, candidate) == []
+
+
+def test_compact_engine_agrees_with_array_engine():
+    """Tests that the compact dtypes are used, and that the compact engine
+    gives the same distribution of yearly counts and biomass as the array
+    engine with the default dtypes"""
+    island = CompactArrayIsland("OOO\nOJO\nOOO", seed=1)
+    island.populate_island([{'loc': (1, 1), 'pop': [
+        {'species': 'Herbivore', 'age': 3, 'weight': 17.3}]}])
+    assert island.store.weight.dtype == np.float32
+    assert island.store.age.dtype == np.uint16
+    assert island.store.cell.dtype == np.uint32
+    assert island._fitness().dtype == np.float32
+    golden = load_golden(os.path.join(GOLDEN_DIRECTORY, "small_mixed.json"))
+    scenario = GOLDEN_SCENARIOS["small_mixed"]
+    with pinned_parameters(golden["parameters"]):
+        reference = run_ensemble(scenario, range(15), num_years=12,
+                                 engine="array")
+        candidate = run_ensemble(scenario, range(100, 115), num_years=12,
+                                 engine="compact")
+    assert compare_statistically(reference, candidate) == []
+
+
+def test_engine_selection():
+    """Tests that BioSim builds the island of the chosen engine, and that
+    the numba engine falls back to the object engine without numba"""
+    assert type(BioSim("OOO\nOJO\nOOO", [], seed=1).island) is Island
+    assert type(BioSim("OOO\nOJO\nOOO", [], seed=1,
+                       engine="array").island) is ArrayIsland
+    assert type(BioSim("OOO\nOJO\nOOO", [], seed=1,
+                       engine="compact").island) is CompactArrayIsland
+    if not kernels.JIT_AVAILABLE:
+        with pytest.warns(UserWarning):
+            sim = BioSim("OOO\nOJO\nOOO", [], seed=1, engine="numba")
+        assert type(sim.island) is Island
+    with pytest.raises(ValueError):
+        BioSim("OOO\nOJO\nOOO", [], seed=1, engine="quantum")
@@ -106,6 +106,16 @@ def test_set_param_landscape(lscape, params):
     )
 
 
+@pytest.mark.parametrize("lscape", ["D", "M", "O", "X"])
+def test_set_param_landscape_without_parameters(lscape):
+    """Landscapes without parameters are rejected"""
+
+    with pytest.raises(ValueError):
+        BioSim(island_map="O", ini_pop=[], seed=1).set_landscape_parameters(
+            lscape, {"f_max": 100.0}
+        )
+
+
 def test_initial_population():
     """Test that population can be placed on construction"""
 
@@ -182,6 +192,21 @@ def test_get_years(plain_sim):
     assert plain_sim.year == 5
 
 
+def test_step_and_stream(plain_sim):
+    """Test that the simulation can be advanced year by year"""
+
+    snapshot = plain_sim.step()
+    assert snapshot.year == 1
+    assert plain_sim.year == 1
+    for snapshot in plain_sim.stream():
+        if snapshot.year == 4:
+            break
+    assert plain_sim.year == 4
+    assert [s.year for s in plain_sim.stream(2)] == [5, 6]
+    assert snapshot.num_animals_per_species == \
+        plain_sim.num_animals_per_species
+
+
 def test_get_num_animals(plain_sim):
     """Test that total number of animals is available"""
 
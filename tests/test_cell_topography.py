@@ -7,6 +7,7 @@ import biosim.cell_topography as topo
 import pytest
 import biosim.animals as animals
 import biosim.island as isle
+import random
 
 
 @pytest.fixture
@@ -74,6 +75,18 @@ def test_topo_remove_carnivore():
     assert testcarni not in cell.herbivore_list
 
 
+def test_topo_remove_animal_not_in_cell():
+    """Tests that removing an animal which is not in the cell leaves the
+    animal lists as they were"""
+    cell = topo.Topography()
+    resident = animals.Herbivores()
+    cell.add_animal(resident)
+    cell.remove_animal(animals.Herbivores())
+    cell.remove_animal(animals.Carnivores())
+    assert cell.herbivore_list == [resident]
+    assert cell.carnivore_list == []
+
+
 def test_topo_add_herbviore():
     """Tests that an immigrating animal can be added to the new cells
      animal list"""
@@ -212,6 +225,8 @@ def test_ek_for_cell_9_herbs_carns_100_fodder(basic_jungle):
     ek_carnivores = basic_jungle.ek_for_cell("Carnivores")
     assert ek_herbivores == 1
     assert ek_carnivores == 0.18
+    assert basic_jungle.ek_for_cell("Carnivore") == ek_carnivores
+    assert basic_jungle.ek_for_cell(animals.Herbivores) == ek_herbivores
 
 
 # natural death
@@ -316,3 +331,81 @@ def test_feeding_carnivores_in_a_cell():
     pre_feeding_herbi_biomass = jungle_cell.biomass_herbivores()
     jungle_cell.feed_carnivores_in_cell()
     assert pre_feeding_herbi_biomass > jungle_cell.biomass_herbivores()
+
+
+def test_feeding_herbivores_returns_fitness():
+    """Tests that the grazing returns the fitness of every herbivore after
+    it has eaten, in the order of the herbivore list"""
+    jungle_cell = topo.Jungle()
+    [jungle_cell.add_animal(animals.Herbivores(age=age, weight=10 + age))
+     for age in range(5)]
+    fitness = jungle_cell.feed_herbivores_in_cell()
+    assert fitness == [herbivore.fitness
+                       for herbivore in jungle_cell.herbivore_list]
+
+
+def test_feeding_carnivores_reuses_herbivore_fitness():
+    """Tests that the carnivores kill the same herbivores whether the
+    fitness of the herbivores is passed on or computed again"""
+    killed = []
+    for passed_on in [False, True]:
+        random.seed(5)
+        jungle_cell = topo.Jungle()
+        herbivores = [animals.Herbivores(age=age, weight=5 + age)
+                      for age in range(20)]
+        [jungle_cell.add_animal(herbivore) for herbivore in herbivores]
+        [jungle_cell.add_animal(animals.Carnivores(age=3, weight=40))
+         for _ in range(3)]
+        fitness = jungle_cell.feed_herbivores_in_cell()
+        jungle_cell.feed_carnivores_in_cell(fitness if passed_on else None)
+        killed.append([herbivores.index(herbivore) for herbivore in herbivores
+                       if herbivore not in jungle_cell.herbivore_list])
+        for animal in jungle_cell.herbivore_list + \
+                jungle_cell.carnivore_list:
+            animals.Animals.instances.remove(animal)
+    assert killed[0] == killed[1]
+    assert len(killed[0]) > 0
+
+
+def test_feeding_carnivores_in_all_cells_at_once():
+    """Tests that one hunt over several cells kills the same herbivores as
+    a hunt in every cell by itself"""
+    killed = []
+    for together in [False, True]:
+        random.seed(9)
+        cells = [topo.Jungle(), topo.Savanna(), topo.Desert()]
+        herbivores = []
+        for cell_number, cell in enumerate(cells):
+            for age in range(8 * cell_number):
+                herbivore = animals.Herbivores(age=age, weight=5 + age)
+                herbivores.append(herbivore)
+                cell.add_animal(herbivore)
+            [cell.add_animal(animals.Carnivores(age=3, weight=40))
+             for _ in range(2)]
+        if together:
+            topo.feed_carnivores_in_cells(cells)
+        else:
+            [cell.feed_carnivores_in_cell() for cell in cells]
+        killed.append([herbivore in animals.Animals.instances
+                       for herbivore in herbivores])
+        for cell in cells:
+            for animal in cell.herbivore_list + cell.carnivore_list:
+                animals.Animals.instances.remove(animal)
+    assert killed[0] == killed[1]
+    assert not all(killed[0])
+
+
+def test_carnivore_kills_herbivores_in_a_row(monkeypatch):
+    """Tests that a carnivore certain to kill tries every herbivore in
+    order, also the one right after a kill, until it has eaten its
+    appetite"""
+    monkeypatch.setitem(animals.Carnivores.parameters, "DeltaPhiMax", 0.0001)
+    monkeypatch.setitem(animals.Carnivores.parameters, "F", 50.0)
+    jungle_cell = topo.Jungle()
+    herbivores = [animals.Herbivores(age=5, weight=weight)
+                  for weight in (1.0, 2.0, 3.0, 4.0)]
+    for herbivore in herbivores:
+        jungle_cell.add_animal(herbivore)
+    jungle_cell.add_animal(animals.Carnivores(age=5, weight=60))
+    jungle_cell.feed_carnivores_in_cell()
+    assert jungle_cell.herbivore_list == []
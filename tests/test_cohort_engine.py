@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.cohort_engine import CohortIsland
+from biosim.simulation import BioSim
+from biosim.reproducibility import (GOLDEN_SCENARIOS, load_golden,
+                                    pinned_parameters, run_ensemble,
+                                    compare_statistically)
+import biosim.animals as ani
+import numpy as np
+import os
+import pytest
+
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(__file__), "golden")
+
+
+@pytest.fixture
+def cohort_island():
+    """A cohort island with herbivores and carnivores in two cells"""
+    island = CohortIsland("OOOOO\nOJSMO\nOJDOO\nOOOOO", seed=1)
+    island.populate_island(
+        [{'loc': (1, 1),
+          'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 40}
+                  for _ in range(30)] +
+                 [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                  for _ in range(5)]},
+         {'loc': (2, 2),
+          'pop': [{'species': 'Herbivore', 'age': 1, 'weight': 10}
+                  for _ in range(10)]}])
+    return island
+
+
+def test_populate_merges_equal_animals(cohort_island):
+    """Tests that equal animals in a cell are kept as one cohort, and are
+    counted one by one in the reports"""
+    assert len(cohort_island.store) == 3
+    assert cohort_island.store.num_animals == 45
+    assert cohort_island.total_number_per_species() == {'Herbivore': 40,
+                                                        'Carnivore': 5}
+    assert cohort_island.density_grid('Herbivore')[1, 1] == 30
+    assert cohort_island.biomass_food_chain()["biomass_herbs"] == \
+        pytest.approx(30 * 40 + 10 * 10)
+    numbers, biomass = cohort_island.age_group_statistics('Herbivore')
+    np.testing.assert_array_equal(numbers, [10, 0, 30, 0, 0])
+    ages, weights = cohort_island._species_age_and_weight(
+        ani.Herbivores.species_code)
+    assert len(ages) == 40 and weights.sum() == pytest.approx(biomass.sum())
+
+
+def test_merge_keeps_count_and_biomass():
+    """Tests that cohorts in the same weight bin are merged with their mean
+    weight, and cohorts in other bins are kept apart"""
+    island = CohortIsland("OOO\nOJO\nOOO", seed=1)
+    island.store.add(np.zeros(3, dtype=np.int64), np.array([2, 2, 2]),
+                     np.array([20.0, 20.2, 30.0]), np.array([4, 4, 4]),
+                     np.array([3, 1, 2]))
+    island.store.merge(island.weight_resolution)
+    np.testing.assert_array_equal(island.store.count, [4, 2])
+    np.testing.assert_allclose(island.store.weight, [20.05, 30.0])
+
+
+def test_share_food_as_if_one_at_a_time():
+    """Tests that a cohort only partly fed is split into fed, partly fed and
+    hungry animals"""
+    island = CohortIsland("OOO\nOJO\nOOO", seed=1)
+    island.store.add(np.zeros(1, dtype=np.int64), np.array([2]),
+                     np.array([20.0]), np.array([4]), np.array([5]))
+    island._share_food(np.array([0]), np.array([25.0]), 10.0, 0.5)
+    store = island.store
+    assert sorted(zip(store.weight, store.count)) == [(20.0, 2), (22.5, 1),
+                                                      (25.0, 2)]
+
+
+def test_cost_follows_cohorts():
+    """Tests that a very large population in a few cohorts runs a year and
+    stays in a few cohorts"""
+    island = CohortIsland("OOOO\nOJJO\nOOOO", seed=1)
+    island.store.add(np.array([0, 1]), np.array([5, 5]),
+                     np.array([30.0, 40.0]), np.array([5, 5]),
+                     np.array([10 ** 7, 10 ** 5]))
+    island.annual_cycle()
+    assert len(island.store) < 1000
+    assert island.snapshot().num_animals == island.store.num_animals
+    assert 0 < island.total_number_per_species()['Herbivore'] < 10 ** 7
+
+
+def test_cohort_runs_follow_the_engine_seed():
+    """Tests that two cohort islands with the same seed give the same
+    years, whatever is done with the global NumPy generator"""
+    counts = []
+    for global_seed in (1, 2):
+        island = CohortIsland("OOOO\nOJSO\nOOOO", seed=3)
+        island.store.add(np.array([0, 1]), np.array([5, 5]),
+                         np.array([30.0, 40.0]), np.array([5, 5]),
+                         np.array([1000, 50]))
+        np.random.seed(global_seed)
+        for _ in range(3):
+            island.annual_cycle()
+            np.random.random()
+        counts.append(island.store.count.copy())
+    np.testing.assert_array_equal(counts[0], counts[1])
+
+
+def test_cohort_engine_agrees_with_reference_engine():
+    """Tests that the cohort engine gives the same distribution of yearly
+    counts and biomass as the object engine"""
+    golden = load_golden(os.path.join(GOLDEN_DIRECTORY, "small_mixed.json"))
+    scenario = GOLDEN_SCENARIOS["small_mixed"]
+    with pinned_parameters(golden["parameters"]):
+        reference = run_ensemble(scenario, range(15), num_years=12)
+        candidate = run_ensemble(scenario, range(15), num_years=12,
+                                 engine="cohort")
+    assert compare_statistically(reference, candidate) == []
+
+
+def test_cohort_engine_selection():
+    """Tests that BioSim builds a cohort island for the cohort engine"""
+    sim = BioSim("OOO\nOJO\nOOO", [{'loc': (1, 1), 'pop': [
+        {'species': 'Herbivore', 'age': 5, 'weight': 20}]}], seed=1,
+        engine="cohort")
+    assert type(sim.island) is CohortIsland
+    assert sim.num_animals == 1
+
+
+def test_cohort_engine_refuses_event_log(cohort_island):
+    """Tests that the cohort engine, without individual animals, refuses
+    to record events"""
+    with pytest.raises(ValueError):
+        cohort_island.enable_event_log()
+    assert cohort_island.event_log is None
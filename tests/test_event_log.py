@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.island import Island
+from biosim.array_engine import ArrayIsland
+from biosim.event_log import (EventLog, read_event_log, EVENT_DTYPE, BIRTH,
+                              NATURAL_DEATH, KILL, MIGRATION)
+import biosim.animals as ani
+import biosim.cell_topography as topo
+import numpy as np
+import random
+import pytest
+
+
+@pytest.fixture
+def logged_island():
+    """An island with herbivores and carnivores recording its events"""
+    random.seed(5)
+    ani.Animals.instances.clear()
+    island = Island("OOOOO\nOJJSO\nOJSDO\nOOOOO")
+    island.populate_island(
+        [{'loc': (1, 1),
+          'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 30}
+                  for _ in range(50)] +
+                 [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+                  for _ in range(10)]}])
+    island.enable_instrumentation()
+    return island
+
+
+def test_events_match_the_yearly_counters(logged_island):
+    """Tests that every birth, death, kill and migration is recorded"""
+    log = logged_island.enable_event_log(buffer_size=7)
+    for _ in range(5):
+        logged_island.annual_cycle()
+    events = log.events()
+    assert events.dtype == EVENT_DTYPE
+    for year, record in enumerate(logged_island.statistics.records):
+        this_year = events[events["year"] == year]
+        for event, counter in [(BIRTH, "births"),
+                               (NATURAL_DEATH, "natural_deaths"),
+                               (KILL, "kills"),
+                               (MIGRATION, "migrations")]:
+            assert np.sum(this_year["event"] == event) == record[counter]
+    assert len(log) == len(events)
+
+
+def test_event_records_identify_the_animals(logged_island):
+    """Tests that births refer to the parent, kills to the victim and that
+    the animal ids are unique"""
+    log = logged_island.enable_event_log()
+    logged_island.annual_cycle()
+    events = log.events()
+    ids = [animal.id for animal in ani.Animals.instances]
+    assert len(set(ids)) == len(ids)
+    births = events[events["event"] == BIRTH]
+    assert np.all(births["other_id"] >= 0)
+    assert np.all(births["animal_id"] > births["other_id"])
+    kills = events[events["event"] == KILL]
+    assert np.all(kills["species"] == ani.Carnivores.species_code)
+    assert not set(kills["other_id"]) & set(ids)
+
+
+def test_event_log_written_to_file(logged_island, tmp_path):
+    """Tests that the records written to file can be read back"""
+    path = tmp_path / "events.bin"
+    log = logged_island.enable_event_log(path=str(path), buffer_size=3)
+    logged_island.annual_cycle()
+    in_log = log.events()
+    logged_island.disable_event_log()
+    assert logged_island.event_log is None
+    assert path.stat().st_size == len(in_log) * EVENT_DTYPE.itemsize
+    np.testing.assert_array_equal(read_event_log(str(path)), in_log)
+    assert all(cell.event_log is None
+               for cell in logged_island.raster_model.values())
+
+
+def test_length_of_closed_file_log(tmp_path):
+    """Tests that a file log still knows its number of records after it is
+    closed"""
+    log = EventLog(path=str(tmp_path / "events.bin"), buffer_size=3)
+    log.record_many(BIRTH, 0, np.zeros(5, dtype=np.int64),
+                    np.zeros(5, dtype=np.int64), np.arange(5), np.ones(5))
+    assert len(log) == 5
+    log.close()
+    assert len(log) == 5
+
+
+def test_event_log_disabled_by_default(logged_island):
+    """Tests that no events are recorded unless enabled"""
+    logged_island.annual_cycle()
+    assert logged_island.event_log is None
+
+
+def test_array_engine_events_match_the_yearly_counters():
+    """Tests that the array engine records every birth, death, kill and
+    migration with the ids of its lineage"""
+    island = ArrayIsland("OOOOO\nOJJSO\nOJSDO\nOOOOO", seed=5)
+    island.populate_island(
+        [{'loc': (1, 1),
+          'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 30}
+                  for _ in range(50)] +
+                 [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+                  for _ in range(10)]}])
+    island.enable_instrumentation()
+    log = island.enable_event_log(buffer_size=7)
+    for _ in range(5):
+        island.annual_cycle()
+    events = log.events()
+    for year, record in enumerate(island.statistics.records):
+        this_year = events[events["year"] == year]
+        for event, counter in [(BIRTH, "births"),
+                               (NATURAL_DEATH, "natural_deaths"),
+                               (KILL, "kills"),
+                               (MIGRATION, "migrations")]:
+            assert np.sum(this_year["event"] == event) == record[counter]
+    births = events[events["event"] == BIRTH]
+    assert [island.lineage.parent(animal_id)
+            for animal_id in births["animal_id"]] == list(births["other_id"])
+    kills = events[events["event"] == KILL]
+    assert np.all(kills["species"] == ani.Carnivores.species_code)
+    living = set(island.store.id[island.store.alive])
+    assert not set(kills["other_id"]) & living
+    assert np.all(island.cell_types[events["row"], events["col"]] !=
+                  topo.Ocean.type_code)
+
+
+def test_record_many_fills_the_buffer_in_turns():
+    """Tests that records added together are split over full buffers in
+    their order"""
+    log = EventLog(buffer_size=3)
+    log.record_many(BIRTH, np.zeros(5, dtype=int), np.arange(5),
+                    np.arange(5), np.arange(10, 15), np.full(5, 2.5),
+                    other_ids=np.arange(5))
+    log.record_many(KILL, np.ones(1, dtype=int), np.zeros(1), np.zeros(1),
+                    np.array([20]), np.array([4.0]))
+    events = log.events()
+    assert len(log) == 6
+    np.testing.assert_array_equal(events["animal_id"],
+                                  [10, 11, 12, 13, 14, 20])
+    np.testing.assert_array_equal(events["other_id"], [0, 1, 2, 3, 4, -1])
+    assert list(events["event"]) == [BIRTH] * 5 + [KILL]
+
+
+def test_event_log_invalid_buffer():
+    """Tests that an empty buffer raises ValueError"""
+    with pytest.raises(ValueError):
+        EventLog(buffer_size=0)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.fitness_table import FitnessTable
+from biosim.array_engine import ArrayIsland
+import biosim.animals as ani
+import numpy as np
+import pytest
+
+
+def exact_fitness(species, ages, weights):
+    """The fitness of Animals.fitness for arrays of ages and weights"""
+    return np.array([species(age=int(age), weight=float(weight),
+                             potential_newborn=True).fitness
+                     for age, weight in zip(ages, weights)])
+
+
+@pytest.mark.parametrize("species", [ani.Herbivores, ani.Carnivores])
+@pytest.mark.parametrize("tolerance", [1e-4, 1e-7])
+def test_error_within_bound(species, tolerance):
+    """Tests that the table fitness is within the error bound of the exact
+    fitness, also for ages and weights beyond the tables"""
+    table = FitnessTable(species, tolerance, max_age=50)
+    rng = np.random.default_rng(3)
+    ages = rng.integers(0, 80, 3000)
+    weights = np.concatenate([rng.uniform(0, 100, 2990),
+                              [0, -1, 1e4, 1e5, 450, 500, 1e-9, 1, 2, 3]])
+    exact = exact_fitness(species, ages, weights)
+    bound = table.error_bound + 1e-15
+    assert table.error_bound == pytest.approx(tolerance)
+    assert np.abs(table.evaluate(ages, weights) - exact).max() <= bound
+    assert max(abs(table.value(int(age), float(weight)) - fitness)
+               for age, weight, fitness in zip(ages, weights, exact)) <= bound
+
+
+def test_rebuilt_after_parameter_change():
+    """Tests that the tables follow a change of a fitness parameter"""
+    table = FitnessTable(ani.Herbivores)
+    w_half = ani.Herbivores.parameters["w_half"]
+    try:
+        ani.Herbivores.parameters["w_half"] = 30
+        assert table.value(5, 30) == pytest.approx(
+            exact_fitness(ani.Herbivores, [5], [30])[0], abs=1e-6)
+    finally:
+        ani.Herbivores.parameters["w_half"] = w_half
+    assert table.value(5, 30) == pytest.approx(
+        exact_fitness(ani.Herbivores, [5], [30])[0], abs=1e-6)
+
+
+def test_animals_use_fitness_table():
+    """Tests that a species can switch between the table and the exact
+    formula"""
+    herbivore = ani.Herbivores(age=3, weight=17.3, potential_newborn=True)
+    exact = herbivore.fitness
+    ani.Herbivores.use_fitness_table(1e-8)
+    try:
+        assert ani.Herbivores.fitness_table is not None
+        assert ani.Carnivores.fitness_table is None
+        assert herbivore.fitness == pytest.approx(exact, abs=1e-8)
+    finally:
+        ani.Herbivores.use_fitness_table(None)
+    assert herbivore.fitness == exact
+    with pytest.raises(ValueError):
+        ani.Herbivores.use_fitness_table(0)
+
+
+def test_array_engine_uses_tables():
+    """Tests that the array engine takes the fitness from the tables when
+    every species has one"""
+    island = ArrayIsland("OOO\nOJO\nOOO", seed=1)
+    island.populate_island([{'loc': (1, 1), 'pop': [
+        {'species': 'Herbivore', 'age': 3, 'weight': 17.3},
+        {'species': 'Carnivore', 'age': 70, 'weight': 9.1}]}])
+    exact = island._fitness()
+    for species in ani.SPECIES_BY_CODE:
+        species.use_fitness_table(1e-8)
+    try:
+        np.testing.assert_allclose(island._fitness(), exact, atol=1e-8)
+    finally:
+        for species in ani.SPECIES_BY_CODE:
+            species.use_fitness_table(None)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.fodder import FodderStore
+import biosim.cell_topography as topo
+import biosim.island as isle
+from biosim.simulation import BioSim
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def store():
+    """A fodder store with two savanna cells and a jungle cell"""
+    fodder_store = FodderStore([topo.Savanna, topo.Jungle, topo.Savanna])
+    for index, amount in enumerate([0.0, 10.0, 150.0]):
+        fodder_store.set(index, amount)
+    return fodder_store
+
+
+def test_lazy_regrowth_matches_yearly_regrowth(store):
+    """Tests that regrowth owed for several years gives the fodder of
+    regrowing every year"""
+    expected = np.array([0.0, 10.0, 150.0])
+    for _ in range(6):
+        store.regrow()
+        expected[[0, 2]] = topo.Savanna.regrow_fodder(expected[[0, 2]])
+        expected[1] = topo.Jungle.parameters["f_max"]
+    assert store.get(0) == pytest.approx(expected[0])
+    np.testing.assert_allclose(store.array(), expected)
+
+
+def test_only_read_cells_are_regrown(store):
+    """Tests that a year of regrowth visits no cell, and reading a cell only
+    regrows that cell"""
+    store.regrow()
+    store.regrow()
+    np.testing.assert_array_equal(store._values, [0.0, 10.0, 150.0])
+    assert store.get(1) == topo.Jungle.parameters["f_max"]
+    np.testing.assert_array_equal(store._updated, [0, 2, 0])
+
+
+def test_parameter_change_catches_up(store):
+    """Tests that the regrowth owed before a parameter change is done with
+    the old parameters"""
+    store.regrow()
+    alpha = topo.Savanna.parameters["alpha"]
+    try:
+        topo.Savanna.set_parameters({"alpha": 1})
+        assert store.get(0) == pytest.approx(alpha * 300)
+        store.regrow()
+        assert store.get(0) == 300
+    finally:
+        topo.Savanna.set_parameters({"alpha": alpha})
+
+
+def test_island_regrows_cells_when_read():
+    """Tests that the island only regrows a grazed cell when it is read,
+    and that its statistics see the regrown fodder"""
+    island = isle.Island("OOOO\nOSSO\nOOOO")
+    cell = island.raster_model[(1, 1)]
+    cell.fodder = 0
+    island._increase_fodder_all_cells()
+    assert island._fodder_store._values[0] == 0
+    assert cell.fodder == pytest.approx(topo.Savanna.parameters["alpha"] *
+                                        topo.Savanna.parameters["f_max"])
+    assert island.biomass_food_chain()["biomass_fodder"] == \
+        pytest.approx(cell.fodder + topo.Savanna.parameters["f_max"])
+
+
+def test_simulate_leaves_untouched_cells_stale():
+    """Tests that simulating only catches up the cells where animals eat or
+    look for food, while the yearly totals still count every cell"""
+    island_map = "\n".join(["O" * 20] + ["O" + "J" * 9 + "S" * 9 + "O"
+                                         for _ in range(20)] + ["O" * 20])
+    sim = BioSim(island_map, [{"loc": (2, 2), "pop": [
+        {"species": "Herbivore", "age": 5, "weight": 20}
+        for _ in range(10)]}], seed=1)
+    sim.simulate(num_years=5, vis_years=100, img_years=100)
+    store = sim.island._fodder_store
+    assert (store._updated < store.year).sum() > 300
+    total = store.total()
+    store.catch_up()
+    assert total == pytest.approx(store._values.sum(), rel=1e-12)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.history import HistoryStore
+from biosim.simulation import BioSim
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def long_history():
+    """A small history store filled with many more years than it holds"""
+    history = HistoryStore(["a", "b"], recent_years=10, buckets_per_level=4,
+                           levels=3)
+    for year in range(1000):
+        history.append(year, [year, -year])
+    return history
+
+
+def test_memory_is_fixed(long_history):
+    """Tests that the store does not grow with the number of years"""
+    empty = HistoryStore(["a", "b"], recent_years=10, buckets_per_level=4,
+                         levels=3)
+    assert long_history.nbytes == empty.nbytes
+    assert long_history.num_years == 1000
+
+
+def test_recent_years_at_full_resolution(long_history):
+    """Tests that the latest years are kept as they were recorded"""
+    years, values = long_history.recent("a")
+    assert len(years) >= 9
+    assert years[-1] == 999
+    np.testing.assert_array_equal(years, values)
+    assert long_history.latest() == {"a": 999.0, "b": -999.0}
+
+
+def test_older_years_downsampled(long_history):
+    """Tests that older years are aggregated into min/mean/max buckets
+    which cover the whole history in order"""
+    years, minimum, mean, maximum = long_history.aggregates("a")
+    assert np.all(np.diff(years) > 0)
+    assert minimum[0] == 0
+    assert np.all(minimum <= mean) and np.all(mean <= maximum)
+    assert len(years) < 30
+    np.testing.assert_allclose(mean, years)
+
+
+def test_summary_is_exact(long_history):
+    """Tests that the summary covers every recorded year"""
+    summary = long_history.summary()
+    assert summary["a"] == {"min": 0, "mean": 499.5, "max": 999}
+    assert summary["b"]["min"] == -999
+
+
+def test_invalid_sizes():
+    """Tests that a too small store raises ValueError"""
+    with pytest.raises(ValueError):
+        HistoryStore(["a"], recent_years=1)
+
+
+def test_simulate_records_history():
+    """Tests that every simulated year is added to the history"""
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO",
+                 ini_pop=[{'loc': (1, 1),
+                           'pop': [{'species': 'Herbivore', 'age': 5,
+                                    'weight': 20} for _ in range(10)]}],
+                 seed=1)
+    sim.simulate(num_years=5, vis_years=2)
+    years, herbivores = sim.history.recent("Herbivore")
+    assert list(years) == [1, 2, 3, 4, 5]
+    assert herbivores[-1] == sim.num_animals_per_species["Herbivore"]
+
+
+def test_step_and_stream_record_history():
+    """Tests that the years simulated by step and stream are added to the
+    history like the years of simulate"""
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO",
+                 ini_pop=[{'loc': (1, 1),
+                           'pop': [{'species': 'Herbivore', 'age': 5,
+                                    'weight': 20} for _ in range(10)]}],
+                 seed=1)
+    sim.step()
+    for snapshot in sim.stream(3):
+        pass
+    sim.simulate(num_years=2, vis_years=100, img_years=100)
+    years, herbivores = sim.history.recent("Herbivore")
+    assert list(years) == [1, 2, 3, 4, 5, 6]
+    assert herbivores[3] == snapshot.num_animals_per_species["Herbivore"]
+    assert sim.year == 6
+
+
+def test_history_recorded_from_kept_counts(monkeypatch):
+    """Tests that the history takes the counts and fodder from the island's
+    density grids and running fodder total, and agrees with a full count"""
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO",
+                 ini_pop=[{'loc': (1, 1),
+                           'pop': [{'species': 'Herbivore', 'age': 5,
+                                    'weight': 20} for _ in range(10)]}],
+                 seed=1)
+    island = sim.island
+    island.annual_cycle()
+    expected_counts = island.total_number_per_species()
+    expected_biomass = island.biomass_food_chain()
+    for method in ("total_number_per_species", "biomass_food_chain"):
+        monkeypatch.setattr(island, method, pytest.fail)
+    sim._record_history(island.snapshot())
+    recorded = [sim.history.recent(series)[1][-1]
+                for series in BioSim.history_series]
+    assert recorded == pytest.approx(
+        [expected_counts["Herbivore"], expected_counts["Carnivore"],
+         expected_biomass["biomass_carnivores"],
+         expected_biomass["biomass_herbs"],
+         expected_biomass["biomass_fodder"]])
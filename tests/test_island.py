@@ -1,7 +1,12 @@
 from biosim.island import Island
 import biosim.cell_topography as topo
 import biosim.animals as ani
+from biosim.instrumentation import CycleStatistics
+import numpy as np
 import pytest
+import random
+import subprocess
+import sys
 
 # Map generation
 @pytest.fixture
@@ -251,6 +256,21 @@ def test_population_age_groups(test_map):
     assert carn_mean_w_list == [-10, -10, -10, -10, -10]
 
 
+def test_age_group_statistics_plain_counts(test_map):
+    """Tests that the age group statistics are plain counts and biomass, and
+    that the age groups can be chosen"""
+    for age in [0, 1, 2, 7, 30]:
+        test_map.raster_model[(3, 4)].add_animal(
+            ani.Carnivores(age=age, weight=2))
+    numbers, biomass = test_map.carnivore_biomass_age_groups()
+    assert list(numbers) == [2, 1, 1, 0, 1]
+    assert list(biomass) == [4, 2, 2, 0, 2]
+    numbers, biomass = test_map.age_group_statistics("Carnivore",
+                                                     edges=[10])
+    assert list(numbers) == [4, 1]
+    assert test_map.age_group_labels([10]) == ["0-9", "10+"]
+
+
 def test_biomass_food_chain(test_map):
     """Tests that the method biomass_food_chain returns a dictionary with the
     correct islands total biomass of fodder, herbivores and carnivores"""
@@ -263,3 +283,209 @@ def test_biomass_food_chain(test_map):
     assert biomass_dict.get('biomass_fodder') == 0
     assert biomass_dict.get('biomass_herbs') == 10
     assert biomass_dict.get('biomass_carnivores') == 100
+
+
+# instrumentation
+
+
+def test_instrumentation_counts_events(small_island_map, tmp_path):
+    """Tests that an instrumented annual cycle records timings for every
+    phase and event counters which add up to the population change"""
+    stats_file = tmp_path / "stats.csv"
+    small_island_map.enable_instrumentation(stats_file=str(stats_file))
+    before = small_island_map.total_number_per_species()
+    small_island_map.annual_cycle()
+    after = small_island_map.total_number_per_species()
+    record = small_island_map.statistics.records[0]
+    assert record["year"] == 0
+    assert all(record[f"time_{phase}"] >= 0
+               for phase in small_island_map.statistics.phases)
+    assert record["kills"] == 1
+    assert sum(before.values()) + record["births"] - record["kills"] - \
+        record["natural_deaths"] == sum(after.values())
+    assert record["fodder_consumed"] > 0
+    assert len(stats_file.read_text().splitlines()) == 2
+
+
+def test_instrumented_cycle_runs_the_same_phases():
+    """Tests that the annual cycle times the phases named in the
+    statistics, and gives the same population with and without timing"""
+    assert [name for name, _ in Island.phases] == CycleStatistics.phases
+    grids = []
+    for instrumented in (False, True):
+        random.seed(3)
+        island = Island("OOOO\nOJSO\nOOOO")
+        island.populate_island(
+            [{'loc': (1, 1),
+              'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                      for _ in range(20)] +
+                     [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                      for _ in range(5)]}])
+        if instrumented:
+            island.enable_instrumentation()
+        for _ in range(5):
+            island.annual_cycle()
+        grids.append(island.density_grid('Herbivore').copy())
+    np.testing.assert_array_equal(grids[0], grids[1])
+
+
+def test_instrumentation_disabled_by_default(small_island_map):
+    """Tests that no statistics are recorded unless enabled"""
+    small_island_map.annual_cycle()
+    assert small_island_map.statistics is None
+    assert small_island_map.current_year == 1
+
+
+# streaming
+
+
+def test_iter_cycles_yields_a_snapshot_per_year(small_island_map):
+    """Tests that the island can be simulated year by year through a
+    generator, and that the caller can stop it early"""
+    snapshots = []
+    for snapshot in small_island_map.iter_cycles():
+        snapshots.append(snapshot)
+        if snapshot.num_animals_per_species['Herbivore'] == 0 or \
+                snapshot.year == 5:
+            break
+    assert [snapshot.year for snapshot in snapshots] == \
+        list(range(1, len(snapshots) + 1))
+    assert small_island_map.current_year == snapshots[-1].year
+    assert snapshots[-1].num_animals_per_species == \
+        small_island_map.total_number_per_species()
+    assert snapshots[-1].total_fodder == \
+        small_island_map.biomass_food_chain()['biomass_fodder']
+    assert snapshots[-1].statistics is None
+    assert len(list(small_island_map.iter_cycles(3))) == 3
+
+
+def test_snapshot_holds_instrumentation_record(small_island_map):
+    """Tests that the snapshot of an instrumented island carries the record
+    of the year"""
+    small_island_map.enable_instrumentation()
+    snapshot = next(small_island_map.iter_cycles())
+    assert snapshot.statistics is small_island_map.statistics.records[0]
+
+
+# cell grouping
+
+
+def test_cells_grouped_by_landscape_type():
+    """Tests that the island groups its cells by landscape type code"""
+    island = Island("OOOO\nOJSO\nOMDO\nOOOO")
+    assert island.cell_types.shape == (4, 4)
+    assert island.cell_types[1, 1] == topo.Jungle.type_code
+    assert island.cell_types[2, 2] == topo.Desert.type_code
+    assert island.cells_by_type[topo.Savanna.type_code] == [
+        island.raster_model[(1, 2)]]
+    assert len(island.cells_by_type[topo.Ocean.type_code]) == 12
+    assert island._fodder_cells == [island.raster_model[(1, 1)],
+                                    island.raster_model[(1, 2)]]
+
+
+# active cells
+
+
+def test_active_cells_follow_the_animals(small_island_map):
+    """Tests that only cells with animals are kept as active cells, and that
+    regrowth still reaches the fodder of all fodder producing cells"""
+    assert small_island_map._active_cells == {(1, 1), (1, 3), (3, 2)}
+    small_island_map._feed_all_animals()
+    assert [location for location, _ in
+            small_island_map._populated_cells()] == [(1, 1), (1, 3), (3, 2)]
+    small_island_map.raster_model[(3, 2)].carnivore_list = []
+    assert [location for location, _ in
+            small_island_map._populated_cells()] == [(1, 1), (1, 3)]
+    small_island_map.raster_model[(1, 1)].fodder = 0
+    small_island_map._increase_fodder_all_cells()
+    assert small_island_map.raster_model[(1, 1)].fodder == \
+        topo.Jungle.parameters["f_max"]
+
+
+def test_setting_animal_list_activates_cell(small_island_map):
+    """Tests that a cell given animals through its list setters becomes
+    active, in map order with the other active cells"""
+    cell = small_island_map.raster_model[(3, 2)]
+    cell.carnivore_list = []
+    cell.herbivore_list = []
+    assert [location for location, _ in
+            small_island_map._populated_cells()] == [(1, 1), (1, 3)]
+    cell.herbivore_list = [ani.Herbivores()]
+    assert [location for location, _ in
+            small_island_map._populated_cells()] == [(1, 1), (1, 3), (3, 2)]
+
+
+# density grids
+
+
+def test_density_grids_are_read_only_views_updated_in_place(
+        small_island_map):
+    """Tests that the density grids cannot be written to by the user and
+    follow the population through the annual cycle"""
+    herb_grid = small_island_map.density_grid('Herbivore')
+    assert herb_grid[1, 1] == 10
+    assert small_island_map.density_grid('Carnivore')[3, 2] == 100
+    with pytest.raises(ValueError):
+        herb_grid[1, 1] = 0
+    small_island_map.annual_cycle()
+    assert herb_grid.sum() == \
+        small_island_map.total_number_per_species()['Herbivore']
+    assert small_island_map.arrays_for_heatmap()[0] is herb_grid
+
+
+def test_cell_count_dataframe_cached_until_next_census(small_island_map):
+    """Tests that the per cell dataframe is cached per census, can be limited
+    to some of the cells and is renewed by the annual cycle"""
+    every_cell = small_island_map.per_cell_count_pandas_dataframe()
+    assert len(every_cell) == 25
+    assert len(small_island_map.per_cell_count_pandas_dataframe(
+        "accessible")) == 3
+    populated = small_island_map.per_cell_count_pandas_dataframe("populated")
+    assert list(zip(populated.Row, populated.Col)) == [(1, 1), (1, 3), (3, 2)]
+    every_cell.set_index(["Row", "Col"], inplace=True)
+    assert "Row" in small_island_map.per_cell_count_pandas_dataframe()
+    cached = small_island_map._dataframe_cache["all"]
+    small_island_map.annual_cycle()
+    assert "all" not in small_island_map._dataframe_cache
+    small_island_map.per_cell_count_pandas_dataframe()
+    assert small_island_map._dataframe_cache["all"] is not cached
+    with pytest.raises(ValueError):
+        small_island_map.per_cell_count_pandas_dataframe("ocean")
+
+
+def test_density_grids_follow_added_and_removed_animals(small_island_map):
+    """Tests that the density grids and dataframes follow animals added and
+    removed directly and the phases run one at a time"""
+    herb_grid = small_island_map.density_grid('Herbivore')
+    dataframe = small_island_map.per_cell_count_pandas_dataframe()
+    herbivore = ani.Herbivores()
+    cell = small_island_map.raster_model[(1, 3)]
+    cell.add_animal(herbivore)
+    assert herb_grid[1, 3] == 11
+    assert "all" not in small_island_map._dataframe_cache
+    cell.remove_animal(herbivore)
+    cell.remove_animal(herbivore)
+    assert herb_grid[1, 3] == 10
+    small_island_map.per_cell_count_pandas_dataframe()
+    small_island_map._feed_all_animals()
+    assert herb_grid[3, 2] == 0
+    assert small_island_map.per_cell_count_pandas_dataframe(
+        ).Herbivore.sum() == dataframe.Herbivore.sum() - 1
+    small_island_map._breed_in_all_cells()
+    small_island_map._migrate_all_cells()
+    assert herb_grid.sum() == \
+        small_island_map.total_number_per_species()['Herbivore']
+
+
+# imports
+
+
+def test_model_imports_without_pandas_and_matplotlib():
+    """Tests that the model and the simulation class can be imported without
+    loading pandas or matplotlib"""
+    script = ("import sys, biosim.island, biosim.simulation; "
+              "print(sorted(m for m in ('pandas', 'matplotlib') "
+              "if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", script],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
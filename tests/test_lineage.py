@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.lineage import Lineage
+from biosim.simulation import BioSim
+import biosim.animals as ani
+import biosim.cell_topography as topo
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def family():
+    """
+    Two founders, 0 and 1, where 0 has the children 2 and 3, 3 has the
+    child 4 and 1 has the child 5. The array starts small to make it grow.
+    """
+    lineage = Lineage(capacity=2)
+    for parent_id in [-1, -1, 0, 0, 3, 1]:
+        lineage.register(parent_id)
+    return lineage
+
+
+def test_ids_are_given_in_order(family):
+    """Tests that the ids are consecutive and the parents stored"""
+    assert len(family) == 6
+    assert family.register(5) == 6
+    np.testing.assert_array_equal(family.parents, [-1, -1, 0, 0, 3, 1, 5])
+    assert family.parent(4) == 3
+    with pytest.raises(ValueError):
+        family.parents[0] = 2
+
+
+def test_register_many(family):
+    """Tests that a batch of animals gets consecutive ids"""
+    ids = family.register_many(np.array([2, 2, -1, 4, 0]))
+    np.testing.assert_array_equal(ids, [6, 7, 8, 9, 10])
+    assert family.parent(9) == 4
+    assert len(family) == 11
+
+
+def test_children_and_generations(family):
+    """Tests the children of an animal and the number of ancestors"""
+    np.testing.assert_array_equal(family.children(0), [2, 3])
+    assert len(family.children(4)) == 0
+    np.testing.assert_array_equal(family.generations(), [0, 0, 1, 1, 2, 1])
+
+
+def test_descendant_counts(family):
+    """Tests that all descendants are counted, not just the children"""
+    np.testing.assert_array_equal(family.descendant_counts(),
+                                  [3, 1, 0, 1, 0, 0])
+
+
+def test_family_tree(family):
+    """Tests that the family tree of a founder holds all its descendants
+    with their parents"""
+    ids, parents = family.family_tree(0)
+    np.testing.assert_array_equal(ids, [0, 2, 3, 4])
+    np.testing.assert_array_equal(parents, [-1, 0, 0, 3])
+
+
+def test_newborn_gets_parent_id():
+    """Tests that a newborn is registered with its mother as parent"""
+    cell = topo.Jungle()
+    mother = ani.Herbivores(age=30, weight=80)
+    cell.add_animal(mother)
+    mother.breed(cell, 100)
+    newborn = cell.herbivore_list[-1]
+    assert newborn.id > mother.id
+    assert ani.Animals.lineage.parent(newborn.id) == mother.id
+    assert ani.Animals.lineage.parent(mother.id) == -1
+
+
+def test_simulations_in_a_row_have_their_own_lineage():
+    """Tests that every simulation numbers its animals from 0 in its own
+    lineage, which the following simulations leave alone"""
+    population = [{'loc': (1, 1),
+                   'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 40}
+                           for _ in range(20)]}]
+    first = BioSim(island_map="OOOO\nOJJO\nOOOO", ini_pop=population, seed=1)
+    for _ in first.stream(3):
+        pass
+    first_size = len(first.lineage)
+    second = BioSim(island_map="OOOO\nOJJO\nOOOO", ini_pop=population,
+                    seed=1)
+    assert second.lineage is not first.lineage
+    assert len(second.lineage) == 20
+    for _ in second.stream(3):
+        pass
+    assert len(first.lineage) == first_size
+    assert len(second.lineage) == first_size
+    assert np.all(second.lineage.parents < len(second.lineage))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.parameters import Parameters
+from biosim.fodder import FodderStore
+import biosim.animals as ani
+import biosim.cell_topography as topo
+import math
+import pytest
+
+
+@pytest.fixture
+def saved_herbivore_parameters():
+    """Restores the herbivore parameters after the test"""
+    saved = dict(ani.Herbivores.parameters)
+    yield
+    ani.Herbivores.parameters.update(saved)
+
+
+def test_constants_rebuilt_after_change(saved_herbivore_parameters):
+    """Tests that the derived constants follow the parameters, and are only
+    rebuilt after a change"""
+    parameters = ani.Herbivores.parameters
+    constants = parameters.constants
+    assert parameters.constants is constants
+    assert constants.breeding_threshold == pytest.approx(
+        parameters["zeta"] * (parameters["w_birth"] +
+                              parameters["sigma_birth"]))
+    assert constants.lambda_ == parameters["lambda"]
+    assert math.isnan(constants.inverse_delta_phi_max)
+    parameters["zeta"] = 1
+    assert parameters.constants is not constants
+    assert parameters.constants.breeding_threshold == pytest.approx(
+        parameters["w_birth"] + parameters["sigma_birth"])
+
+
+def test_constants_are_immutable():
+    """Tests that the record of constants cannot be changed"""
+    with pytest.raises(AttributeError):
+        ani.Carnivores.parameters.constants.F = 10
+    assert ani.Carnivores.parameters.constants.inverse_delta_phi_max == \
+        pytest.approx(1 / ani.Carnivores.parameters["DeltaPhiMax"])
+
+
+def test_set_parameters_checks_all_first(saved_herbivore_parameters):
+    """Tests that no parameter is set when one of them is invalid"""
+    gamma = ani.Herbivores.parameters["gamma"]
+    with pytest.raises(ValueError):
+        ani.Herbivores.set_parameters({"gamma": 0.5, "eta": 2})
+    assert ani.Herbivores.parameters["gamma"] == gamma
+
+
+def test_parameter_array_follows_changes(saved_herbivore_parameters):
+    """Tests that the species arrays are reused until a parameter changes"""
+    array = ani.parameter_array("omega")
+    assert ani.parameter_array("omega") is array
+    assert not array.flags.writeable
+    ani.Herbivores.parameters["omega"] = 0.1
+    assert ani.parameter_array("omega")[
+        ani.Herbivores.species_code] == 0.1
+
+
+def test_before_change_runs_first():
+    """Tests that the before_change function sees the old parameters"""
+    seen = []
+    parameters = Parameters({"a": 1},
+                            before_change=lambda: seen.append(
+                                dict(parameters)))
+    parameters["a"] = 2
+    parameters |= {"a": 3}
+    assert seen == [{"a": 1}, {"a": 2}]
+    assert parameters.constants.a == 3 and parameters.version == 2
+
+
+def test_landscape_change_catches_up_fodder():
+    """Tests that setting a landscape parameter directly catches up the
+    regrowth owed with the old parameters"""
+    store = FodderStore([topo.Jungle])
+    store.regrow()
+    f_max = topo.Jungle.parameters["f_max"]
+    try:
+        topo.Jungle.parameters["f_max"] = 100
+        assert store.get(0) == f_max
+    finally:
+        topo.Jungle.parameters["f_max"] = f_max
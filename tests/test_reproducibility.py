@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.reproducibility import (GOLDEN_SCENARIOS, load_golden,
+                                    current_parameters, pinned_parameters, run_trajectory,
+                                    run_ensemble, compare_exact,
+                                    compare_statistically, ks_statistic)
+import biosim.animals as ani
+import numpy as np
+import os
+import pytest
+
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(__file__), "golden")
+
+
+@pytest.mark.parametrize("name", sorted(GOLDEN_SCENARIOS))
+def test_reference_engine_reproduces_golden_trajectory(name):
+    """Tests that the reference engine gives exactly the stored yearly
+    counts and biomass for the fixed seed"""
+    golden = load_golden(os.path.join(GOLDEN_DIRECTORY, f"{name}.json"))
+    with pinned_parameters(golden["parameters"]):
+        trajectory = run_trajectory(GOLDEN_SCENARIOS[name])
+    assert compare_exact(golden["trajectory"], trajectory) == []
+
+
+def test_current_parameters_of_landscapes_with_parameters():
+    """Tests that only the landscapes with parameters are recorded"""
+    assert sorted(current_parameters()["landscapes"]) == ["J", "S"]
+
+
+def test_same_seed_same_trajectory():
+    """Tests that two runs with the same seed are identical"""
+    scenario = GOLDEN_SCENARIOS["small_mixed"]
+    first = run_trajectory(scenario, seed=3, num_years=10)
+    second = run_trajectory(scenario, seed=3, num_years=10)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_compare_exact_reports_first_difference():
+    """Tests that a changed count is reported with its year"""
+    reference = np.ones((5, 5))
+    candidate = reference.copy()
+    candidate[3, 0] = 2
+    messages = compare_exact(reference, candidate)
+    assert len(messages) == 1
+    assert "year 3" in messages[0]
+
+
+def test_ks_statistic():
+    """Tests the Kolmogorov-Smirnov statistic of equal and disjoint
+    samples"""
+    assert ks_statistic(np.arange(10), np.arange(10)) == 0
+    assert ks_statistic(np.arange(10), np.arange(10) + 100) == 1
+
+
+@pytest.fixture(scope="module")
+def golden_parameters():
+    """Parameters the golden trajectories were made with"""
+    return load_golden(os.path.join(GOLDEN_DIRECTORY,
+                                    "small_mixed.json"))["parameters"]
+
+
+@pytest.fixture(scope="module")
+def reference_ensemble(golden_parameters):
+    """Trajectories of the reference engine for a set of seeds"""
+    with pinned_parameters(golden_parameters):
+        return run_ensemble(GOLDEN_SCENARIOS["small_mixed"], range(12),
+                            num_years=12)
+
+
+def test_statistical_comparison_accepts_other_seeds(reference_ensemble,
+                                                    golden_parameters):
+    """Tests that the reference engine with other seeds is accepted"""
+    with pinned_parameters(golden_parameters):
+        candidate = run_ensemble(GOLDEN_SCENARIOS["small_mixed"],
+                                 range(100, 112), num_years=12)
+    assert compare_statistically(reference_ensemble, candidate) == []
+
+
+def test_statistical_comparison_detects_changed_model(reference_ensemble,
+                                                      golden_parameters):
+    """Tests that an engine where the herbivores do not breed is
+    rejected"""
+    with pinned_parameters(golden_parameters):
+        ani.Herbivores.parameters["gamma"] = 0
+        candidate = run_ensemble(GOLDEN_SCENARIOS["small_mixed"],
+                                 range(100, 112), num_years=12)
+    assert compare_statistically(reference_ensemble, candidate) != []
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Kåre Johnsen & Anders Karlsen"
+__email__ = "kajohnse@nmbu.no & anderska@nmbu.no"
+
+from biosim.island import YearSnapshot
+from biosim.simulation import BioSim
+from biosim.stop_conditions import (StopCondition, Extinction, SteadyState,
+                                    Callback)
+import pytest
+
+
+def snapshot(year, herbivores, carnivores):
+    """Creates a snapshot with the given populations"""
+    return YearSnapshot(year, {'Herbivore': herbivores,
+                               'Carnivore': carnivores}, 0.0)
+
+
+def test_stop_condition_needs_is_met():
+    """Tests that only conditions implementing is_met can be created"""
+
+    class Unfinished(StopCondition):
+        pass
+
+    class Never(StopCondition):
+        def is_met(self, snapshot):
+            return False
+
+    with pytest.raises(TypeError):
+        StopCondition()
+    with pytest.raises(TypeError):
+        Unfinished()
+    assert not Never().is_met(snapshot(1, 10, 10))
+
+
+def test_extinction_of_any_animal():
+    """Tests that the default extinction condition waits for all animals
+    to die"""
+    condition = Extinction()
+    assert not condition.is_met(snapshot(1, 10, 0))
+    assert condition.is_met(snapshot(2, 0, 0))
+
+
+def test_extinction_of_a_species():
+    """Tests that the extinction condition can watch a single species"""
+    condition = Extinction(['Carnivore'])
+    assert not condition.is_met(snapshot(1, 0, 5))
+    assert condition.is_met(snapshot(2, 10, 0))
+
+
+def test_steady_state_needs_consecutive_years_in_band():
+    """Tests that the steady state condition is only met after the given
+    number of years within the tolerance band, and that leaving the band
+    starts over"""
+    condition = SteadyState(tolerance=0.1, years=2)
+    assert not condition.is_met(snapshot(1, 100, 10))
+    assert not condition.is_met(snapshot(2, 105, 10))
+    assert not condition.is_met(snapshot(3, 150, 10))
+    assert not condition.is_met(snapshot(4, 140, 11))
+    assert condition.is_met(snapshot(5, 155, 10))
+    condition.reset()
+    assert not condition.is_met(snapshot(6, 155, 10))
+
+
+def test_steady_state_not_met_by_extinction():
+    """Tests that years without animals are not a steady state, also when
+    they follow years within the band"""
+    condition = SteadyState(tolerance=0.1, years=2)
+    for year in range(1, 6):
+        assert not condition.is_met(snapshot(year, 0, 0))
+    assert not condition.is_met(snapshot(6, 100, 10))
+    assert not condition.is_met(snapshot(7, 100, 10))
+    assert not condition.is_met(snapshot(8, 0, 0))
+    assert not condition.is_met(snapshot(9, 0, 0))
+    herbivores = SteadyState(tolerance=0.1, years=1, species=['Herbivore'])
+    assert not herbivores.is_met(snapshot(1, 0, 10))
+    assert not herbivores.is_met(snapshot(2, 0, 10))
+
+
+def test_steady_state_invalid_arguments():
+    """Tests that a negative tolerance or no years raises ValueError"""
+    with pytest.raises(ValueError):
+        SteadyState(tolerance=-1)
+    with pytest.raises(ValueError):
+        SteadyState(years=0)
+
+
+@pytest.fixture
+def herbivore_sim():
+    """Simulation with herbivores starving in the desert"""
+    return BioSim(island_map="OOOO\nODDO\nOOOO",
+                  ini_pop=[{'loc': (1, 1),
+                            'pop': [{'species': 'Herbivore', 'age': 5,
+                                     'weight': 20} for _ in range(10)]}],
+                  seed=1)
+
+
+def test_simulate_stops_at_extinction(herbivore_sim):
+    """Tests that the simulation ends when all the animals are dead"""
+    condition = Extinction()
+    herbivore_sim.add_stop_condition(condition)
+    herbivore_sim.simulate(num_years=500, vis_years=1000)
+    assert herbivore_sim.num_animals == 0
+    assert herbivore_sim.year < 500
+    assert herbivore_sim.stop_reason is condition
+
+
+def test_callback_stops_stream(herbivore_sim):
+    """Tests that a plain function can be used as stop condition"""
+    herbivore_sim.add_stop_condition(lambda snap: snap.year == 3)
+    assert isinstance(herbivore_sim.stop_conditions[0], Callback)
+    assert [snap.year for snap in herbivore_sim.stream()] == [1, 2, 3]
+    herbivore_sim.clear_stop_conditions()
+    herbivore_sim.simulate(num_years=2, vis_years=1000)
+    assert herbivore_sim.year == 5
+    assert herbivore_sim.stop_reason is None
+    with pytest.raises(ValueError):
+        herbivore_sim.add_stop_condition(3)
+
+
+def test_step_checks_stop_conditions(herbivore_sim):
+    """Tests that step checks the stop conditions after its year"""
+    herbivore_sim.add_stop_condition(lambda snap: snap.year == 2)
+    herbivore_sim.step()
+    assert herbivore_sim.stop_reason is None
+    snapshot = herbivore_sim.step()
+    assert snapshot.year == 2
+    assert herbivore_sim.stop_reason is herbivore_sim.stop_conditions[0]